@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Бэктест стратегии по прошедшим событиям из data/tokens.json
+
+Свечи событий: data/klines/<SYMBOL>_<YYYYMMDDHHMM>.csv (время Result в UTC),
+формат Bybit kline: startTime(ms),open,high,low,close,...
+
+Использование:
+    cd /root/trade_bot
+    source .venv/bin/activate
+    pip install numpy
+    python3 scripts/backtest.py [--horizon 240] [--leverage 10] [--margin 20] [--fee 0.055] [--no-breakeven]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Определяем корневую директорию проекта
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from bytbit_trading_bot.backtest import load_events, run_backtest, KLINES_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бэктест стратегии Token Splash")
+    parser.add_argument("--klines-dir", default=KLINES_DIR)
+    parser.add_argument("--horizon", type=int, default=240, help="Свечей после Result")
+    parser.add_argument("--leverage", type=float, default=10)
+    parser.add_argument("--margin", type=float, default=20)
+    parser.add_argument("--fee", type=float, default=0.0, help="Комиссия за сделку, %%")
+    parser.add_argument("--no-breakeven", action="store_true", help="Не переносить стоп в безубыток после TP1")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    events = load_events(klines_dir=args.klines_dir)
+    loaded = time.perf_counter()
+    per_event, summary = run_backtest(events, args.horizon, args.leverage, args.margin, args.fee,
+                                      move_sl_to_entry=False if args.no_breakeven else None)
+    finished = time.perf_counter()
+
+    if not events:
+        print(f"❌ Нет прошедших событий со свечами в {args.klines_dir}")
+        return
+
+    for row in per_event:
+        tps = " ".join(f"TP{index}{'✅' if hit else '—'}" for index, hit in enumerate(row["tp_hits"], start=1))
+        sl = "SL✅" if row["sl_hit"] else "SL—"
+        print(f"{row['token_key']:<32} вход {row['entry']:.6f}  {tps} {sl}  PnL {row['pnl']:+.2f} USDT ({row['return_pct']:+.2f}%)")
+
+    print(
+        f"\n📊 Событий: {summary['events']}, итог {summary['total_pnl']:+.2f} USDT, "
+        f"в среднем {summary['mean_pnl']:+.2f} USDT, прибыльных {summary['win_rate'] * 100:.0f}%, "
+        f"SL {summary['sl_rate'] * 100:.0f}%"
+    )
+    print(f"⏱️ Загрузка {loaded - started:.2f} сек, симуляция {finished - loaded:.3f} сек")
+
+
+if __name__ == "__main__":
+    main()
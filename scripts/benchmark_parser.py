@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора анонсов на записанных сообщениях канала
+
+Сравнивает announcements.extract с прежним разбором (re.match/re.search по строке
+паттерна и lower() для каждого неподошедшего сообщения).
+
+Использование:
+    cd /root/trade_bot
+    source .venv/bin/activate
+    python3 scripts/benchmark_parser.py [--repeat 2000] [--corpus scripts/channel_messages.json]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+# Определяем корневую директорию проекта
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from bytbit_trading_bot.announcements import extract, mentions_result
+from bytbit_trading_bot.config import POST_REGEX
+
+
+def legacy_extract(message_text):
+    """Прежний разбор из parser.process_message"""
+    match = re.match(POST_REGEX, message_text, re.DOTALL | re.MULTILINE)
+    if not match:
+        match = re.search(POST_REGEX, message_text, re.DOTALL | re.MULTILINE)
+    if not match:
+        if "Result" in message_text or "result" in message_text.lower():
+            pass
+        return None
+    return {"token": match.group("token"), "result_date": match.group("result_date")}
+
+
+def current_extract(message_text):
+    """Разбор через announcements"""
+    announcement = extract(message_text)
+    if not announcement:
+        mentions_result(message_text)
+    return announcement
+
+
+def measure_speed(func, messages, repeat):
+    """Возвращает количество сообщений в секунду"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message_text in messages:
+            func(message_text)
+    elapsed = time.perf_counter() - started
+    return len(messages) * repeat / elapsed
+
+
+def measure_allocations(func, messages):
+    """Возвращает средний пик выделенной памяти (байт) на одно сообщение"""
+    total = 0
+    tracemalloc.start()
+    for message_text in messages:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(message_text)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора анонсов")
+    parser.add_argument("--corpus", default=os.path.join(script_dir, "channel_messages.json"))
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        messages = json.load(f)
+
+    # Оба варианта должны находить одни и те же анонсы
+    for message_text in messages:
+        expected = legacy_extract(message_text)
+        actual = current_extract(message_text)
+        if (expected is None) != (actual is None) or (expected and expected["token"] != actual["token"]):
+            print(f"❌ Расхождение разбора: {message_text[:80]!r}")
+            return
+
+    announcements = sum(1 for message_text in messages if current_extract(message_text))
+    print(f"📂 Корпус: {len(messages)} сообщений, анонсов: {announcements}, повторов: {args.repeat}")
+
+    for name, func in (("legacy", legacy_extract), ("announcements", current_extract)):
+        # Прогрев кэша re и байткода
+        measure_speed(func, messages, 10)
+        speed = measure_speed(func, messages, args.repeat)
+        allocated = measure_allocations(func, messages)
+        print(f"{name:>14}: {speed:>12,.0f} сообщений/сек, {allocated:>8.0f} байт/сообщение")
+
+
+if __name__ == "__main__":
+    main()
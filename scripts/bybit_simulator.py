@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Локальный симулятор Bybit v5 для нагрузочного тестирования торгового пути
+
+Реализует эндпоинты, которые использует бот: instruments-info, tickers, time,
+wallet-balance, set-leverage, order/create, order/create-batch, order/realtime,
+order/history, position/list. Повтор orderLinkId отклоняется кодом 110072, как на бирже,
+а запрос без обязательного параметра v5 (camelCase) - кодом 10001.
+Поддерживает задержку ответа, инъекцию ошибок (retCode и таймауты)
+и лимит запросов на API ключ (retCode 10006 с заголовками X-Bapi-Limit-*).
+Вместо приватного WebSocket BybitState.stream выдаёт поток в том же процессе:
+размещённые ордера порождают события order, execution и position
+(подключается к боту через fills.set_stream_factory).
+
+Использование:
+    python3 scripts/bybit_simulator.py --port 8765 --latency-ms 20 --error-rate 0.01
+
+    Бот направляется на симулятор переменной окружения:
+    BYBIT_ENDPOINT=http://127.0.0.1:8765
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+# Определяем корневую директорию проекта
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from bytbit_trading_bot.ratelimit import TokenBucket
+
+DEFAULT_SETTINGS = {
+    "latency_ms": 0.0,  # Базовая задержка ответа
+    "jitter_ms": 0.0,  # Случайная добавка к задержке (0..jitter)
+    "error_rate": 0.0,  # Доля ответов с retCode error_code
+    "error_code": 10001,
+    "timeout_rate": 0.0,  # Доля запросов, на которые ответ приходит через timeout_seconds
+    "timeout_seconds": 15.0,
+    "rate_limit": 0.0,  # Запросов в секунду на API ключ (0 - без лимита)
+    "rate_burst": 10.0,
+    "price": 1.0,  # Последняя цена всех символов
+    "balance": 1000.0,  # Баланс USDT каждого ключа
+}
+
+# Обязательные параметры v5: без них биржа отвечает retCode 10001 (params error)
+REQUIRED_PARAMS = {
+    "/v5/order/create": ("category", "symbol", "side", "orderType", "qty"),
+    "/v5/order/create-batch": ("category", "request"),
+    "/v5/position/set-leverage": ("category", "symbol", "buyLeverage", "sellLeverage"),
+}
+BATCH_ORDER_PARAMS = ("symbol", "side", "orderType", "qty")
+
+
+def _missing(params, required):
+    """Первый отсутствующий обязательный параметр или None"""
+    return next((name for name in required if params.get(name) in (None, "")), None)
+
+
+def _missing_order_param(order, required):
+    missing = _missing(order, required)
+    if missing is None and order.get("orderType") == "Limit" and order.get("price") in (None, ""):
+        missing = "price"
+    return missing
+
+
+class BybitState:
+    """Состояние симулятора: настройки, ордера, позиции и счётчики запросов"""
+
+    def __init__(self, **settings):
+        self.settings = {**DEFAULT_SETTINGS, **settings}
+        self.lock = threading.Lock()
+        self.orders = []
+        self.positions = {}  # (api_key, symbol) -> size
+        self.requests = {}  # path -> количество
+        self.buckets = {}
+        self.streams = {}  # api_key -> [SimulatorStream]
+
+    def stream(self, api_key, api_secret=None, testnet=False):
+        """Фабрика приватных потоков для fills.set_stream_factory"""
+        stream = SimulatorStream(self, api_key)
+        with self.lock:
+            self.streams.setdefault(api_key, []).append(stream)
+        return stream
+
+    def publish(self, api_key, topic, data):
+        """Рассылает событие потокам ключа из отдельного потока выполнения, как WebSocket"""
+        with self.lock:
+            callbacks = [stream.callbacks[topic] for stream in self.streams.get(api_key, []) if topic in stream.callbacks]
+        message = {"topic": topic, "creationTime": int(time.time() * 1000), "data": data}
+        for callback in callbacks:
+            threading.Thread(target=callback, args=(message,), daemon=True).start()
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def bucket(self, api_key):
+        with self.lock:
+            bucket = self.buckets.get(api_key)
+            if bucket is None:
+                bucket = self.buckets[api_key] = TokenBucket(self.settings["rate_limit"], self.settings["rate_burst"])
+            return bucket
+
+    def place(self, api_key, order):
+        """Возвращает orderId или None, если orderLinkId этого ключа уже занят"""
+        order_id = uuid.uuid4().hex
+        with self.lock:
+            link_id = order.get("orderLinkId")
+            if link_id and self.find(api_key, link_id) is not None:
+                return None
+            self.orders.append({**order, "orderId": order_id, "apiKey": api_key})
+            filled = order.get("side") == "Buy" and order.get("orderType") == "Market"
+            if filled:
+                key = (api_key, order.get("symbol"))
+                size = self.positions[key] = self.positions.get(key, 0.0) + float(order.get("qty", 0))
+
+        ids = {"orderId": order_id, "orderLinkId": order.get("orderLinkId", ""), "symbol": order.get("symbol")}
+        self.publish(api_key, "order", [{**ids, "orderStatus": "Filled" if filled else "New"}])
+        if filled:
+            price = str(self.settings["price"])
+            self.publish(api_key, "execution", [{**ids, "execQty": str(order.get("qty")), "leavesQty": "0",
+                                                 "execPrice": price, "stopOrderType": ""}])
+            self.publish(api_key, "position", [{"symbol": order.get("symbol"), "size": str(size), "avgPrice": price}])
+        return order_id
+
+    def find(self, api_key, link_id):
+        for order in self.orders:
+            if order["apiKey"] == api_key and order.get("orderLinkId") == link_id:
+                return order
+        return None
+
+
+class SimulatorStream:
+    """Приватный поток симулятора с интерфейсом pybit WebSocket"""
+
+    def __init__(self, state, api_key):
+        self.state = state
+        self.api_key = api_key
+        self.callbacks = {}
+
+    def order_stream(self, callback):
+        self.callbacks["order"] = callback
+
+    def execution_stream(self, callback):
+        self.callbacks["execution"] = callback
+
+    def position_stream(self, callback):
+        self.callbacks["position"] = callback
+
+    def wallet_stream(self, callback):
+        self.callbacks["wallet"] = callback
+
+    def exit(self):
+        with self.state.lock:
+            streams = self.state.streams.get(self.api_key, [])
+            if self in streams:
+                streams.remove(self)
+
+
+def _ok(result):
+    return {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": {}, "time": int(time.time() * 1000)}
+
+
+def _params_error(name):
+    return {"retCode": 10001, "retMsg": f"params error: {name} is required", "result": {}, "retExtInfo": {}}
+
+
+def _instrument(symbol):
+    return {
+        "symbol": symbol,
+        "status": "Trading",
+        "priceFilter": {"tickSize": "0.0001"},
+        "lotSizeFilter": {"qtyStep": "1", "minOrderQty": "1", "minQty": "1"},
+    }
+
+
+def handle(state, method, path, params, api_key):
+    """Возвращает ответ Bybit для запроса (без учёта задержек и ошибок)"""
+    settings = state.settings
+    symbol = params.get("symbol", "SIMUSDT")
+
+    missing = _missing(params, REQUIRED_PARAMS.get(path, ()))
+    if path == "/v5/order/create" and missing is None:
+        missing = _missing_order_param(params, REQUIRED_PARAMS[path])
+    if missing is not None:
+        return _params_error(missing)
+
+    if path == "/v5/market/time":
+        now = time.time()
+        return _ok({"timeSecond": str(int(now)), "timeNano": str(int(now * 1e9))})
+
+    if path == "/v5/market/instruments-info":
+        return _ok({"category": "linear", "list": [_instrument(symbol)], "nextPageCursor": ""})
+
+    if path == "/v5/market/tickers":
+        return _ok({"category": "linear", "list": [{"symbol": symbol, "lastPrice": str(settings["price"])}]})
+
+    if path == "/v5/account/wallet-balance":
+        balance = str(settings["balance"])
+        return _ok({"list": [{"accountType": "UNIFIED", "coin": [
+            {"coin": "USDT", "walletBalance": balance, "availableToWithdraw": balance, "locked": "0"}
+        ]}]})
+
+    if path == "/v5/position/set-leverage":
+        return _ok({})
+
+    if path == "/v5/order/create":
+        order_id = state.place(api_key, params)
+        if order_id is None:
+            return {"retCode": 110072, "retMsg": "OrderLinkedID is duplicate", "result": {}, "retExtInfo": {}}
+        return _ok({"orderId": order_id, "orderLinkId": params.get("orderLinkId", "")})
+
+    if path == "/v5/order/create-batch":
+        orders, statuses = [], []
+        for order in params["request"]:
+            missing = _missing_order_param(order, BATCH_ORDER_PARAMS)
+            order_id = None if missing else state.place(api_key, order)
+            orders.append({"orderId": order_id or "", "symbol": order.get("symbol"), "orderLinkId": order.get("orderLinkId", "")})
+            if missing:
+                statuses.append({"code": 10001, "msg": f"params error: {missing} is required"})
+            elif order_id is None:
+                statuses.append({"code": 110072, "msg": "OrderLinkedID is duplicate"})
+            else:
+                statuses.append({"code": 0, "msg": "OK"})
+        result = _ok({"list": orders})
+        result["retExtInfo"] = {"list": statuses}
+        return result
+
+    if path in ("/v5/order/realtime", "/v5/order/history"):
+        with state.lock:
+            order = state.find(api_key, params.get("orderLinkId"))
+        orders = [{"orderId": order["orderId"], "orderLinkId": order["orderLinkId"], "symbol": order.get("symbol"),
+                   "orderStatus": "Filled" if order.get("orderType") == "Market" else "New"}] if order else []
+        return _ok({"category": "linear", "list": orders, "nextPageCursor": ""})
+
+    if path == "/v5/position/list":
+        with state.lock:
+            size = state.positions.get((api_key, symbol), 0.0)
+        return _ok({"category": "linear", "list": [{"symbol": symbol, "side": "Buy" if size else "", "size": str(size)}]})
+
+    return None
+
+
+def make_handler(state):
+    """Создаёт обработчик HTTP запросов, привязанный к состоянию симулятора"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _process(self, method):
+            url = urlsplit(self.path)
+            if method == "GET":
+                params = dict(parse_qsl(url.query))
+            else:
+                length = int(self.headers.get("Content-Length") or 0)
+                params = json.loads(self.rfile.read(length) or b"{}")
+            api_key = self.headers.get("X-BAPI-API-KEY", "")
+            settings = state.settings
+            state.count(url.path)
+
+            delay = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+            if delay:
+                time.sleep(delay / 1000)
+
+            if settings["timeout_rate"] and random.random() < settings["timeout_rate"]:
+                time.sleep(settings["timeout_seconds"])
+
+            if api_key and settings["rate_limit"]:
+                if state.bucket(api_key).try_acquire() > 0:
+                    reset = int((time.time() + 1) * 1000)
+                    self._respond(200, {"retCode": 10006, "retMsg": "Too many visits!", "result": {}, "retExtInfo": {}},
+                                  {"X-Bapi-Limit": str(int(settings["rate_limit"])), "X-Bapi-Limit-Status": "0",
+                                   "X-Bapi-Limit-Reset-Timestamp": str(reset)})
+                    return
+
+            if settings["error_rate"] and random.random() < settings["error_rate"]:
+                self._respond(200, {"retCode": settings["error_code"], "retMsg": "Simulated error", "result": {}, "retExtInfo": {}})
+                return
+
+            response = handle(state, method, url.path, params, api_key)
+            if response is None:
+                self._respond(404, {"retCode": 404, "retMsg": "Not found", "result": {}})
+            else:
+                self._respond(200, response)
+
+        def do_GET(self):
+            self._process("GET")
+
+        def do_POST(self):
+            self._process("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, **settings):
+    """
+    Запускает симулятор в фоновом потоке
+
+    Returns:
+        (server, state, endpoint) - endpoint вида http://127.0.0.1:<port>
+    """
+    state = BybitState(**settings)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bybit-simulator", daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_arguments(parser):
+    """Аргументы командной строки для настроек симулятора"""
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_SETTINGS["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_SETTINGS["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_SETTINGS["error_rate"])
+    parser.add_argument("--error-code", type=int, default=DEFAULT_SETTINGS["error_code"])
+    parser.add_argument("--timeout-rate", type=float, default=DEFAULT_SETTINGS["timeout_rate"])
+    parser.add_argument("--timeout-seconds", type=float, default=DEFAULT_SETTINGS["timeout_seconds"])
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_SETTINGS["rate_limit"])
+    parser.add_argument("--rate-burst", type=float, default=DEFAULT_SETTINGS["rate_burst"])
+
+
+def settings_from_args(args):
+    return {key: getattr(args, key) for key in DEFAULT_SETTINGS if hasattr(args, key)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный симулятор Bybit v5")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, _, endpoint = start(args.port, **settings_from_args(args))
+    print(f"🧪 Симулятор Bybit запущен: {endpoint} (BYBIT_ENDPOINT={endpoint})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
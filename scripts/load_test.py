@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест торгового пути на локальном симуляторе Bybit
+
+Запускает scripts/bybit_simulator.py в этом же процессе, создаёт N синтетических
+пользователей и открывает для всех позиции одновременно через executor.run_for_users,
+как в момент Result. Реальные data/users.json и Telegram не используются.
+Приватные потоки бота подключаются к потокам симулятора (fills.set_stream_factory)
+и открываются до входа, как при подготовке планов, поэтому исполнение подтверждается
+событием; --no-streams проверяет путь с опросом позиции.
+
+Использование:
+    python3 scripts/load_test.py --users 1,10,100,1000 --latency-ms 20 --jitter-ms 30
+    python3 scripts/load_test.py --users 100 --error-rate 0.05 --rate-limit 10
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+# Определяем корневую директорию проекта
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, script_dir)
+
+import bybit_simulator
+
+
+class LoadTestBot:
+    """Бот-заглушка: считает сообщения вместо отправки в Telegram"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = 0
+
+    def send_message(self, chat_id, text, **kwargs):
+        with self.lock:
+            self.messages += 1
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run(users, max_workers, token, streams=True):
+    """Одновременный вход для users пользователей, возвращает отчёт"""
+    from bytbit_trading_bot import sessions, instruments, market_data, fills, positions
+    from bytbit_trading_bot.executor import run_for_users
+    from bytbit_trading_bot.trading import long_token
+
+    # Каждый прогон - с холодными кэшами, как при первом Result после запуска
+    sessions.clear()
+    instruments.clear()
+    market_data.clear()
+    fills.clear()
+    positions.clear()
+
+    bot = LoadTestBot()
+    user_ids = list(range(1, users + 1))
+    if streams:
+        for user_id in user_ids:
+            fills.open_stream(f"load-{user_id}", "secret")
+
+    started = time.monotonic()
+    results = run_for_users(long_token, token, user_ids, bot, max_workers=max_workers, trigger_time=started)
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(r["latency"] for r in results if r["latency"] is not None)
+    return {
+        "users": users,
+        "ok": sum(1 for r in results if r["ok"]),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1] if latencies else None,
+        "messages": bot.messages,
+    }
+
+
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест входа в позицию на симуляторе Bybit")
+    parser.add_argument("--users", default="1,10,100", help="Количества пользователей через запятую (1..1000)")
+    parser.add_argument("--workers", type=int, default=None, help="Параллельность (по умолчанию TRADE_MAX_WORKERS)")
+    parser.add_argument("--token", default="SIM")
+    parser.add_argument("--verbose", action="store_true", help="Показывать логи бота")
+    parser.add_argument("--no-streams", action="store_true", help="Без приватных потоков (подтверждение опросом позиции)")
+    bybit_simulator.add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    server, state, endpoint = bybit_simulator.start(**bybit_simulator.settings_from_args(args))
+
+    # Все сессии и приватные потоки бота направляются на симулятор
+    from bytbit_trading_bot import sessions, trading, fills
+    sessions.BYBIT_ENDPOINT = endpoint
+    fills.set_stream_factory(None if args.no_streams else state.stream)
+    trading.get_user_config = lambda user_id: {
+        "enabled": True, "api_key": f"load-{user_id}", "api_secret": "secret", "leverage": 10, "margin": 20
+    }
+
+    print(f"🧪 Симулятор: {endpoint}")
+    print(f"{'users':>6} {'ok':>6} {'elapsed,s':>10} {'buys/s':>8} {'p50,ms':>8} {'p95,ms':>8} {'p99,ms':>8} {'max,ms':>8}")
+    try:
+        for users in (int(value) for value in args.users.split(",")):
+            # Каждый прогон - новое событие: иначе повтор orderLinkId отклоняется как дубль
+            with state.lock:
+                state.orders.clear()
+                state.positions.clear()
+            report = run(max(1, min(users, 1000)), args.workers, args.token, streams=not args.no_streams)
+            print(
+                f"{report['users']:>6} {report['ok']:>6} {report['elapsed']:>10.2f} {report['throughput']:>8.1f} "
+                f"{_ms(report['p50']):>8} {_ms(report['p95']):>8} {_ms(report['p99']):>8} {_ms(report['max']):>8}"
+            )
+    finally:
+        server.shutdown()
+
+    print(f"📊 Запросов к симулятору: {sum(state.requests.values())} ({state.requests})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Скрипт переноса данных из data/users.json и data/tokens.json в SQLite
+Запустите один раз перед переключением на STORAGE_BACKEND=sqlite
+
+Использование:
+    cd /root/trade_bot
+    source .venv/bin/activate
+    python3 scripts/migrate_json_to_sqlite.py
+
+    После переноса запускайте бота с переменной окружения:
+    STORAGE_BACKEND=sqlite
+"""
+import sys
+import os
+
+# Определяем корневую директорию проекта
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from bytbit_trading_bot import storage
+from bytbit_trading_bot.config import STORAGE_BACKEND
+from bytbit_trading_bot.utils import load_json, load_tokens, USERS_FILE, TOKENS_FILE, DB_FILE
+
+
+def migrate():
+    """Переносит пользователей и токены из JSON файлов в SQLite"""
+    if STORAGE_BACKEND == "sqlite":
+        print("❌ Запустите перенос без STORAGE_BACKEND=sqlite: источником должны быть JSON файлы")
+        return
+
+    users = load_json(USERS_FILE)
+    # Токены читаются вместе с журналом tokens.jsonl
+    tokens = load_tokens()
+
+    print(f"📂 Пользователей в {USERS_FILE}: {len(users)}")
+    print(f"📂 Токенов в {TOKENS_FILE} и журнале: {len(tokens)}")
+
+    # Пользователи из JSON считаются актуальными и заменяют содержимое базы
+    storage.replace_users(DB_FILE, users)
+    added = storage.add_tokens(DB_FILE, tokens)
+
+    print(f"✅ Перенесено пользователей: {len(users)}")
+    print(f"✅ Добавлено токенов: {len(added)} (всего в базе: {storage.count_tokens(DB_FILE)})")
+    print(f"💾 База данных: {DB_FILE}")
+    print("Запускайте бота с STORAGE_BACKEND=sqlite")
+
+
+if __name__ == "__main__":
+    migrate()
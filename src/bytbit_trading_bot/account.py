@@ -0,0 +1,166 @@
+"""
+Кэш состояния счёта пользователей: баланс USDT и установленное плечо по символам
+
+Баланс обновляется в фоне (задача планировщика) и из приватного потока wallet,
+поэтому проверка баланса при входе и команда /balance читают его из памяти.
+Плечо отправляется на биржу только когда оно отличается от уже установленного.
+"""
+import logging
+import threading
+import time
+from .retry import exception_code
+from .sessions import get_session
+from .utils import get_user_config, get_enabled_user_ids
+from .config import ACCOUNT_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+LEVERAGE_NOT_MODIFIED = 110043  # Плечо уже установлено в это значение
+
+# api_key -> {"wallet": ответ get_wallet_balance, "updated": time.monotonic(), "leverage": {символ: (плечо, время)}}
+_accounts = {}
+_lock = threading.Lock()
+
+
+def _entry(api_key):
+    entry = _accounts.get(api_key)
+    if entry is None:
+        entry = _accounts[api_key] = {"wallet": None, "updated": 0.0, "leverage": {}}
+    return entry
+
+
+def refresh_wallet(api_key, session):
+    """
+    Запрашивает баланс USDT и сохраняет ответ в кэш
+
+    Returns:
+        Ответ get_wallet_balance (ошибки в кэш не попадают)
+    """
+    response = session.get_wallet_balance(
+        accountType="UNIFIED",
+        coin="USDT",
+    )
+    if response.get("retCode") == 0 and response.get("result", {}).get("list"):
+        with _lock:
+            entry = _entry(api_key)
+            entry["wallet"] = response
+            entry["updated"] = time.monotonic()
+    return response
+
+
+def get_wallet(api_key, session, max_age=None):
+    """
+    Возвращает баланс в формате ответа get_wallet_balance: из кэша или запросом к бирже
+
+    Args:
+        api_key: API ключ пользователя
+        session: Сессия для запроса, если кэш устарел
+        max_age: Допустимый возраст кэша в секундах (по умолчанию ACCOUNT_MAX_AGE)
+    """
+    max_age = ACCOUNT_MAX_AGE if max_age is None else max_age
+    with _lock:
+        entry = _accounts.get(api_key)
+        if entry is not None and entry["wallet"] is not None and time.monotonic() - entry["updated"] <= max_age:
+            return entry["wallet"]
+    return refresh_wallet(api_key, session)
+
+
+def handle_wallet_message(api_key, message):
+    """
+    Обновляет баланс из сообщения приватного потока wallet
+
+    В кэше хранятся только монеты, которые в нём уже есть (и USDT).
+    """
+    if message.get("topic") != "wallet":
+        return
+
+    for account in message.get("data", []):
+        if account.get("accountType", "UNIFIED") != "UNIFIED":
+            continue
+        updates = {coin.get("coin"): coin for coin in account.get("coin", [])}
+        with _lock:
+            entry = _entry(api_key)
+            cached = entry["wallet"]["result"]["list"][0].get("coin", []) if entry["wallet"] else []
+            previous = {coin.get("coin"): coin for coin in cached}
+            coins = [updates.get(name) or previous.get(name) for name in (list(previous) or ["USDT"])]
+            coins = [coin for coin in coins if coin]
+            if not coins:
+                continue
+            entry["wallet"] = {"retCode": 0, "retMsg": "OK", "result": {"list": [{**account, "coin": coins}]}}
+            entry["updated"] = time.monotonic()
+
+
+def ensure_leverage(api_key, session, symbol, leverage, max_age=None):
+    """
+    Устанавливает плечо, если оно отличается от уже установленного
+
+    Ответ 110043 (плечо не изменилось) считается успехом.
+
+    Returns:
+        Ответ в формате Bybit: retCode 0 - плечо установлено
+    """
+    max_age = ACCOUNT_MAX_AGE if max_age is None else max_age
+    leverage = str(int(leverage))
+
+    with _lock:
+        entry = _accounts.get(api_key)
+        cached = entry["leverage"].get(symbol) if entry is not None else None
+    if cached is not None and cached[0] == leverage and time.monotonic() - cached[1] <= max_age:
+        return {"retCode": 0, "retMsg": "OK", "result": {}}
+
+    try:
+        response = session.set_leverage(
+            category="linear",
+            symbol=symbol,
+            buyLeverage=leverage,
+            sellLeverage=leverage,
+        )
+    except Exception as e:
+        # pybit поднимает исключение на ненулевой retCode
+        if exception_code(e) != LEVERAGE_NOT_MODIFIED:
+            raise
+        response = {"retCode": LEVERAGE_NOT_MODIFIED, "retMsg": str(e), "result": {}}
+
+    if response.get("retCode") in (0, LEVERAGE_NOT_MODIFIED):
+        with _lock:
+            _entry(api_key)["leverage"][symbol] = (leverage, time.monotonic())
+        return {**response, "retCode": 0}
+    return response
+
+
+def refresh_users(user_ids=None):
+    """
+    Фоновое обновление балансов (задача планировщика): ошибки только логируются
+
+    Args:
+        user_ids: Список ID пользователей (по умолчанию все включенные)
+
+    Returns:
+        Количество обновлённых счетов
+    """
+    user_ids = get_enabled_user_ids() if user_ids is None else list(user_ids)
+    refreshed = 0
+    for user_id in user_ids:
+        user_config = get_user_config(user_id)
+        api_key, api_secret = user_config.get("api_key"), user_config.get("api_secret")
+        if not api_key or not api_secret:
+            continue
+        try:
+            if refresh_wallet(api_key, get_session(api_key, api_secret)).get("retCode") == 0:
+                refreshed += 1
+        except Exception as e:
+            logger.warning(f"[Account] Ошибка обновления баланса пользователя {user_id}: {e}")
+    logger.info(f"[Account] Обновлено балансов: {refreshed}/{len(user_ids)}")
+    return refreshed
+
+
+def invalidate(api_key):
+    """Удаляет состояние ключа (например, после смены ключей через /set_api)"""
+    with _lock:
+        _accounts.pop(api_key, None)
+
+
+def clear():
+    """Очищает кэш"""
+    with _lock:
+        _accounts.clear()
@@ -0,0 +1,82 @@
+"""
+Извлечение анонсов токенов из сообщений канала
+
+Паттерны компилируются один раз при регистрации формата. Перед регулярным
+выражением проверяется дешёвый литерал (например, "Result"): сообщения без него
+отбрасываются без работы с regex и без копирования текста.
+"""
+import re
+from .config import POST_REGEX
+
+# Формат по умолчанию - анонс Token Splash из config.POST_REGEX
+DEFAULT_FORMAT = "token_splash"
+
+# Зарегистрированные форматы в порядке проверки: {"name", "literal", "pattern"}
+_formats = []
+
+# Упоминание Result в любом регистре (для предупреждения о неразобранных анонсах)
+_mentions_result = re.compile("result", re.IGNORECASE).search
+
+
+def register_format(name, pattern, literal="Result", flags=re.DOTALL | re.MULTILINE):
+    """
+    Регистрирует формат анонса
+
+    Args:
+        name: Имя формата (повторная регистрация заменяет паттерн)
+        pattern: Регулярное выражение с группами token и result_date
+        literal: Подстрока, без которой сообщение точно не подходит (None - без префильтра)
+        flags: Флаги компиляции
+    """
+    compiled = re.compile(pattern, flags)
+    if not {"token", "result_date"} <= set(compiled.groupindex):
+        raise ValueError(f"Паттерн формата {name} должен содержать группы token и result_date")
+
+    entry = {"name": name, "literal": literal, "pattern": compiled}
+    for index, existing in enumerate(_formats):
+        if existing["name"] == name:
+            _formats[index] = entry
+            return
+    _formats.append(entry)
+
+
+def unregister_format(name):
+    """Удаляет формат анонса"""
+    _formats[:] = [entry for entry in _formats if entry["name"] != name]
+
+
+def get_formats():
+    """Возвращает имена зарегистрированных форматов в порядке проверки"""
+    return [entry["name"] for entry in _formats]
+
+
+def extract(message_text):
+    """
+    Находит анонс токена в сообщении
+
+    Returns:
+        Словарь {"token", "result_date", "format"} или None
+    """
+    if not message_text:
+        return None
+
+    for entry in _formats:
+        literal = entry["literal"]
+        if literal is not None and literal not in message_text:
+            continue
+        match = entry["pattern"].search(message_text)
+        if match:
+            return {
+                "token": match.group("token"),
+                "result_date": match.group("result_date"),
+                "format": entry["name"],
+            }
+    return None
+
+
+def mentions_result(message_text):
+    """Проверяет, упоминается ли Result (для предупреждения о неразобранных анонсах)"""
+    return _mentions_result(message_text) is not None
+
+
+register_format(DEFAULT_FORMAT, POST_REGEX)
@@ -0,0 +1,233 @@
+"""
+Бэктест стратегии Token Splash (покупка на Result, лестница TP и SL) на исторических свечах
+
+Свечи каждого прошедшего события лежат в data/klines/<SYMBOL>_<YYYYMMDDHHMM>.csv
+(UTC время Result) в формате Bybit kline: startTime(ms),open,high,low,close[,volume,...].
+Все события симулируются одновременно векторными операциями NumPy по матрице
+событие x свеча, поэтому сотни событий с минутными или секундными свечами
+считаются за секунды.
+
+NumPy нужен только для бэктеста: pip install numpy
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from .config import TP_LEVELS, STOP_LOSS_PCT, BUY_PCT, MOVE_SL_TO_ENTRY
+from .trading import to_symbol
+from .utils import DATA_DIR, load_tokens
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+KLINES_DIR = os.path.join(DATA_DIR, "klines")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для бэктеста нужен NumPy: pip install numpy")
+
+
+def _as_utc(value):
+    """Приводит время к UTC, время без часового пояса считается UTC (как в планировщике)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def kline_path(token, result_datetime, klines_dir=None):
+    """Путь к файлу свечей события"""
+    stamp = _as_utc(result_datetime).strftime("%Y%m%d%H%M")
+    return os.path.join(klines_dir or KLINES_DIR, f"{to_symbol(token)}_{stamp}.csv")
+
+
+def load_klines(file_path):
+    """
+    Загружает свечи из CSV
+
+    Returns:
+        Массив (N, 5): startTime(ms), open, high, low, close - отсортированный по времени
+    """
+    _require_numpy()
+    bars = np.loadtxt(file_path, delimiter=",", ndmin=2, usecols=(0, 1, 2, 3, 4))
+    return bars[np.argsort(bars[:, 0])]
+
+
+def load_events(tokens=None, klines_dir=None, now=None):
+    """
+    Собирает прошедшие события из хранилища токенов, для которых есть свечи
+
+    Returns:
+        Список событий {"token_key", "token", "result_datetime", "bars"}
+    """
+    _require_numpy()
+    tokens = load_tokens() if tokens is None else tokens
+    now = _as_utc(now) if now is not None else datetime.now(timezone.utc)
+
+    events = []
+    for token_key, token_data in sorted(tokens.items()):
+        try:
+            result_datetime = _as_utc(datetime.fromisoformat(token_data["result_datetime"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if result_datetime > now:
+            continue
+
+        file_path = kline_path(token_data.get("token", ""), result_datetime, klines_dir)
+        if not os.path.exists(file_path):
+            logger.debug(f"[Backtest] Нет свечей для {token_key}: {file_path}")
+            continue
+
+        bars = load_klines(file_path)
+        # Вход - первая свеча, открывшаяся не раньше Result
+        bars = bars[bars[:, 0] >= result_datetime.timestamp() * 1000]
+        if len(bars):
+            events.append({
+                "token_key": token_key,
+                "token": token_data.get("token"),
+                "result_datetime": result_datetime,
+                "bars": bars,
+            })
+    return events
+
+
+def _first_true(mask):
+    """Индекс первого True в каждой строке или число столбцов, если True нет"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), mask.shape[1])
+
+
+def simulate(open_, high, low, close, tp_levels=None, stop_loss_pct=None, move_sl_to_entry=None):
+    """
+    Векторно симулирует вход и лестницу TP/SL по всем событиям сразу
+
+    Вход - по open первой свечи. SL закрывает весь остаток позиции.
+    Если TP и SL достигнуты в одной свече, считается что первым сработал SL.
+    После TP1 стоп переносится в безубыток (как positions.py) со следующей свечи.
+    Остаток без TP и SL закрывается по close последней свечи.
+
+    Args:
+        open_, high, low, close: Матрицы (события x свечи), недостающие свечи - NaN
+        tp_levels: Список (процент TP, доля купленного объёма в %), по умолчанию TP_LEVELS
+        stop_loss_pct: Процент SL, по умолчанию STOP_LOSS_PCT
+        move_sl_to_entry: Переносить стоп на цену входа после TP1, по умолчанию MOVE_SL_TO_ENTRY
+
+    Returns:
+        Словарь массивов по событиям: entry, return_pct (доходность на купленный объём, %),
+        tp_hits (события x уровни), sl_hit, sl_index, breakeven (стоп сработал в безубытке)
+    """
+    _require_numpy()
+    tp_levels = TP_LEVELS if tp_levels is None else tp_levels
+    stop_loss_pct = STOP_LOSS_PCT if stop_loss_pct is None else stop_loss_pct
+    move_sl_to_entry = MOVE_SL_TO_ENTRY if move_sl_to_entry is None else move_sl_to_entry
+
+    entry = open_[:, 0]
+    bars = high.shape[1]
+    valid = ~np.isnan(close)
+    last_index = valid.sum(axis=1) - 1
+    last_close = close[np.arange(len(close)), last_index]
+
+    # NaN в сравнениях даёт False, поэтому недостающие свечи не срабатывают
+    sl_price = entry * (1 - stop_loss_pct / 100)
+    sl_index = _first_true(low <= sl_price[:, None])
+    stop_price = sl_price
+
+    breakeven = np.zeros(len(entry), dtype=bool)
+    if move_sl_to_entry and tp_levels:
+        # TP1 раньше исходного стопа - со следующей свечи стоп стоит на цене входа.
+        # Вход выше исходного стопа, поэтому безубыток срабатывает не позже него
+        tp1_index = _first_true(high >= (entry * (1 + tp_levels[0][0] / 100))[:, None])
+        moved = tp1_index < sl_index
+        after_tp1 = np.arange(bars)[None, :] > tp1_index[:, None]
+        be_index = _first_true((low <= entry[:, None]) & after_tp1)
+        sl_index = np.where(moved, be_index, sl_index)
+        stop_price = np.where(moved, entry, sl_price)
+        breakeven = moved & (be_index < bars)
+
+    sl_hit = sl_index < bars
+
+    returns = np.zeros(len(entry))
+    remaining = np.full(len(entry), 100.0)
+    tp_hits = np.zeros((len(entry), len(tp_levels)), dtype=bool)
+
+    for level, (tp_pct, share_pct) in enumerate(tp_levels):
+        tp_price = entry * (1 + tp_pct / 100)
+        tp_index = _first_true(high >= tp_price[:, None])
+        hit = tp_index < sl_index
+        tp_hits[:, level] = hit
+        returns += np.where(hit, share_pct * tp_pct / 100, 0.0)
+        remaining -= np.where(hit, share_pct, 0.0)
+
+    # Остаток закрывается по SL или по последней цене
+    exit_price = np.where(sl_hit, stop_price, last_close)
+    returns += remaining * (exit_price / entry - 1)
+
+    return {
+        "entry": entry,
+        "return_pct": returns,
+        "tp_hits": tp_hits,
+        "sl_hit": sl_hit,
+        "sl_index": sl_index,
+        "breakeven": breakeven,
+    }
+
+
+def _stack(events, column, bars):
+    """Матрица (события x bars) из столбца свечей, короткие ряды дополняются NaN"""
+    matrix = np.full((len(events), bars), np.nan)
+    for row, event in enumerate(events):
+        values = event["bars"][:bars, column]
+        matrix[row, :len(values)] = values
+    return matrix
+
+
+def run_backtest(events, horizon_bars=240, leverage=10, margin=20, fee_pct=0.0,
+                 tp_levels=None, stop_loss_pct=None, move_sl_to_entry=None):
+    """
+    Считает PnL стратегии по событиям
+
+    Args:
+        events: События из load_events
+        horizon_bars: Сколько свечей после Result держать позицию
+        leverage, margin: Плечо и маржа (как в настройках пользователя)
+        fee_pct: Комиссия за сделку в % от оборота (вход и выход)
+        move_sl_to_entry: Переносить стоп в безубыток после TP1, по умолчанию MOVE_SL_TO_ENTRY
+
+    Returns:
+        (по событиям, итог): список {"token_key", "entry", "pnl", "return_pct", "tp_hits", "sl_hit"}
+        и словарь {"events", "total_pnl", "mean_pnl", "win_rate", "sl_rate"}
+    """
+    _require_numpy()
+    if not events:
+        return [], {"events": 0, "total_pnl": 0.0, "mean_pnl": 0.0, "win_rate": 0.0, "sl_rate": 0.0}
+
+    bars = min(horizon_bars, max(len(event["bars"]) for event in events))
+    open_, high, low, close = (_stack(events, column, bars) for column in (1, 2, 3, 4))
+
+    result = simulate(open_, high, low, close, tp_levels, stop_loss_pct, move_sl_to_entry)
+
+    # Купленный объём в USDT: BUY_PCT от позиции leverage * margin
+    notional = leverage * margin * BUY_PCT / 100
+    pnl = notional * result["return_pct"] / 100 - 2 * notional * fee_pct / 100
+
+    per_event = [
+        {
+            "token_key": event["token_key"],
+            "entry": float(result["entry"][row]),
+            "pnl": float(pnl[row]),
+            "return_pct": float(result["return_pct"][row]),
+            "tp_hits": [bool(hit) for hit in result["tp_hits"][row]],
+            "sl_hit": bool(result["sl_hit"][row]),
+        }
+        for row, event in enumerate(events)
+    ]
+    summary = {
+        "events": len(events),
+        "total_pnl": float(pnl.sum()),
+        "mean_pnl": float(pnl.mean()),
+        "win_rate": float((pnl > 0).mean()),
+        "sl_rate": float(result["sl_hit"].mean()),
+    }
+    return per_event, summary
@@ -4,8 +4,12 @@ Telegram бот для управления
 import logging
 import os
 import telebot
-from .utils import save_user_config, get_user_config, is_user_enabled, load_json, TOKENS_FILE
+from .utils import save_user_config, get_user_config, get_upcoming_tokens, count_tokens
 from .config import TOKEN
+from .sessions import invalidate as invalidate_session
+from .fills import close_stream
+from .account import invalidate as invalidate_account
+from .prearm import drop_user_plans
 from datetime import datetime, timezone
 import pytz
 
@@ -115,6 +119,8 @@ def disable_bot(message):
     
     user_config["enabled"] = False
     save_user_config(user_id, user_config)
+    # Подготовленный план выключенного пользователя не должен исполниться в момент Result
+    drop_user_plans(user_id)
     bot.reply_to(message, "❌ Бот выключен")
 
 
@@ -145,9 +151,18 @@ def process_api_keys(message):
     api_secret = parts[1]
     
     user_config = get_user_config(user_id)
+    
+    # Старая сессия и поток ордеров с прежними ключами больше не нужны
+    if user_config.get("api_key"):
+        invalidate_session(user_config["api_key"])
+        close_stream(user_config["api_key"])
+        invalidate_account(user_config["api_key"])
+    
     user_config["api_key"] = api_key
     user_config["api_secret"] = api_secret
     save_user_config(user_id, user_config)
+    # Подготовленные планы держат сессию и параметры прежних ключей
+    drop_user_plans(user_id)
     
     bot.reply_to(message, "✅ API ключи сохранены")
 
@@ -172,6 +187,7 @@ def process_leverage(message):
         user_config = get_user_config(user_id)
         user_config["leverage"] = leverage
         save_user_config(user_id, user_config)
+        drop_user_plans(user_id)
         
         bot.reply_to(message, f"✅ Плечо установлено: {leverage}x")
     except ValueError:
@@ -182,9 +198,7 @@ def process_leverage(message):
 def list_tokens(message):
     """Показывает список запланированных токенов"""
     try:
-        tokens = load_json(TOKENS_FILE)
-        
-        if not tokens:
+        if not count_tokens():
             bot.reply_to(message, "📋 Нет запланированных токенов")
             return
         
@@ -195,39 +209,28 @@ def list_tokens(message):
         
         text = "📋 Запланированные токены:\n\n"
         
-        sorted_tokens = sorted(
-            tokens.items(),
-            key=lambda x: x[1].get("result_datetime", ""),
-            reverse=False
-        )
-        
         tz_moscow = pytz.timezone("Europe/Moscow")
-        now = datetime.now(tz_moscow)
         future_count = 0
         
-        for token_key, token_data in sorted_tokens:
+        # Только будущие токены, уже отсортированные по дате Result
+        for token_key, token_data in get_upcoming_tokens():
             token = token_data.get("token", "N/A")
-            result_datetime_str = token_data.get("result_datetime")
-            
-            is_scheduled = False
-            if result_datetime_str:
-                try:
-                    result_date = datetime.fromisoformat(result_datetime_str)
-                    if result_date.tzinfo is None:
-                        result_date = tz_moscow.localize(result_date)
-                    else:
-                        result_date = result_date.astimezone(tz_moscow)
-                    
-                    job_id = f"token_{token}_{result_date.isoformat()}"
-                    is_scheduled = job_id in scheduled_jobs
-                    
-                    if result_date > now:
-                        future_count += 1
-                        status = "✅" if is_scheduled else "⚠️"
-                        date_formatted = result_date.strftime("%d.%m.%Y %H:%M")
-                        text += f"{status} {token} - {date_formatted} MSK\n"
-                except Exception as e:
-                    logger.error(f"Error processing token {token}: {e}")
+            try:
+                result_date = datetime.fromisoformat(token_data["result_datetime"])
+                if result_date.tzinfo is None:
+                    result_date = tz_moscow.localize(result_date)
+                else:
+                    result_date = result_date.astimezone(tz_moscow)
+                
+                job_id = f"token_{token}_{result_date.isoformat()}"
+                is_scheduled = job_id in scheduled_jobs
+                
+                future_count += 1
+                status = "✅" if is_scheduled else "⚠️"
+                date_formatted = result_date.strftime("%d.%m.%Y %H:%M")
+                text += f"{status} {token} - {date_formatted} MSK\n"
+            except Exception as e:
+                logger.error(f"Error processing token {token}: {e}")
         
         if future_count == 0:
             text = "📋 Нет активных запланированных токенов (все даты прошли)"
@@ -269,6 +272,7 @@ def process_margin(message):
         user_config = get_user_config(user_id)
         user_config["margin"] = margin
         save_user_config(user_id, user_config)
+        drop_user_plans(user_id)
         
         bot.reply_to(message, f"✅ Маржа установлена: {margin} USDT")
     except ValueError:
@@ -0,0 +1,113 @@
+"""
+Смещение часов относительно сервера Bybit и точное ожидание момента Result
+"""
+import logging
+import threading
+import time
+from .sessions import get_session
+from .config import CLOCK_SYNC_SAMPLES, PRECISION_SPIN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Смещение: время биржи минус локальное время (сек), и задержка замера
+_offset = 0.0
+_rtt = None
+_lock = threading.Lock()
+
+
+def _server_time(response):
+    """Извлекает время сервера (сек) из ответа get_server_time"""
+    result = response.get("result", {})
+    if result.get("timeNano"):
+        return int(result["timeNano"]) / 1e9
+    if result.get("timeSecond"):
+        return float(result["timeSecond"])
+    return response["time"] / 1000
+
+
+def measure_offset(session=None, samples=None):
+    """
+    Измеряет смещение локальных часов относительно сервера Bybit
+
+    Делает несколько запросов get_server_time и берёт замер с наименьшей задержкой:
+    время сервера сравнивается с серединой интервала запроса.
+
+    Returns:
+        Смещение в секундах (время биржи минус локальное время)
+    """
+    global _offset, _rtt
+
+    session = session or get_session()
+    best = None
+    for _ in range(samples or CLOCK_SYNC_SAMPLES):
+        started = time.time()
+        response = session.get_server_time()
+        finished = time.time()
+        if response.get("retCode") != 0:
+            continue
+        rtt = finished - started
+        offset = _server_time(response) - (started + finished) / 2
+        if best is None or rtt < best[1]:
+            best = (offset, rtt)
+
+    if best is None:
+        logger.warning("[Clock] Не удалось получить время сервера Bybit")
+        return get_offset()
+
+    with _lock:
+        _offset, _rtt = best
+    logger.info(f"[Clock] Смещение часов относительно Bybit: {best[0] * 1000:+.1f} мс (задержка {best[1] * 1000:.1f} мс)")
+    return best[0]
+
+
+def sync():
+    """Периодическая синхронизация для планировщика: ошибки только логируются"""
+    try:
+        measure_offset()
+    except Exception as e:
+        logger.warning(f"[Clock] Ошибка синхронизации часов: {e}")
+
+
+def get_offset():
+    """Возвращает последнее измеренное смещение (сек)"""
+    with _lock:
+        return _offset
+
+
+def exchange_time():
+    """Текущее время биржи (unix timestamp, сек)"""
+    return time.time() + get_offset()
+
+
+def wait_until(target, spin=None):
+    """
+    Ждёт наступления момента target по часам биржи
+
+    Спит до target минус spin секунд, последние миллисекунды досыпает короткими паузами,
+    чтобы не зависеть от точности пробуждения потока.
+
+    Args:
+        target: datetime с часовым поясом
+        spin: Длительность финального ожидания (по умолчанию PRECISION_SPIN_SECONDS)
+
+    Returns:
+        Ошибка срабатывания в секундах: > 0 - опоздание, < 0 - раньше срока
+    """
+    spin = PRECISION_SPIN_SECONDS if spin is None else spin
+    local_target = target.timestamp() - get_offset()
+
+    remaining = local_target - time.time() - spin
+    if remaining > 0:
+        time.sleep(remaining)
+
+    while time.time() < local_target:
+        time.sleep(0)
+
+    return exchange_time() - target.timestamp()
+
+
+def clear():
+    """Сбрасывает измеренное смещение"""
+    global _offset, _rtt
+    with _lock:
+        _offset, _rtt = 0.0, None
@@ -25,14 +25,81 @@ CHANNEL = '@TokenSplashBybit'
 # Поддерживает формат: ТОКЕН\n...Result DD.MM.YYYY HH:MM (UTC) или DD.MM.YYYY HH:MM
 POST_REGEX = r'^(?P<token>\w+)\n.*?Result (?P<result_date>\d{2}\.\d{2}\.\d{4} \d{2}:\d{2})(?:\s+UTC)?'
 
-# Количество последних сообщений для проверки при запуске
+# Количество последних сообщений для проверки при первом запуске (дальше - с последнего обработанного)
 MESSAGES_HISTORY_LIMIT = 50
 
+# По сколько сообщений обрабатывать пропущенную историю после простоя (чекпоинт сохраняется после каждой пачки)
+CATCHUP_BATCH_SIZE = 100
+
 # Параметры торговли
 TP1_PCT = 3.0  # Тейк-профит 1 (%)
 TP2_PCT = 6.0  # Тейк-профит 2 (%)
 STOP_LOSS_PCT = 2.0  # Стоп-лосс (%)
 BUY_PCT = 70.0  # Процент от объёма для покупки
+# Лестница тейк-профитов: (процент от цены входа, доля купленного объёма в %)
+# Количество уровней можно менять, все TP отправляются одним batch запросом
+TP_LEVELS = [
+    (TP1_PCT, 40.0),
+    (TP2_PCT, 30.0),
+]
+
+# Параллельное исполнение
+TRADE_MAX_WORKERS = int(os.getenv("TRADE_MAX_WORKERS", "20"))  # Максимум одновременных входов в позицию
+# Процессы-шарды для входов: пользователи делятся по user_id % TRADE_WORKER_PROCESSES (0 - всё в основном процессе)
+TRADE_WORKER_PROCESSES = int(os.getenv("TRADE_WORKER_PROCESSES", "0"))
+SHARD_RESULT_TIMEOUT = 120  # Сколько секунд координатор ждёт результатов шардов
+SHARD_COMMAND_THREADS = 4  # Сколько команд (токенов) шард исполняет одновременно
+INSTRUMENTS_TTL = 600  # Время жизни кэша параметров инструментов (сек)
+SESSION_POOL_SIZE = 4  # Размер пула keep-alive соединений на одну сессию Bybit
+SESSION_IDLE_TIMEOUT = 1800  # Через сколько секунд простоя закрывать сессию
+# Адрес REST API Bybit вместо стандартного (например, локальный симулятор scripts/bybit_simulator.py)
+BYBIT_ENDPOINT = os.getenv("BYBIT_ENDPOINT", "")
+# Клиентские лимиты запросов к Bybit (с запасом до лимитов биржи: 600 запросов за 5 сек с одного IP)
+BYBIT_IP_RATE = float(os.getenv("BYBIT_IP_RATE", "100"))  # Запросов в секунду со всего процесса (0 - без ограничения)
+BYBIT_IP_BURST = 500  # Сколько запросов можно отправить разом (всплеск в момент Result)
+BYBIT_KEY_RATES = {"trade": 10, "account": 10}  # Запросов в секунду на API ключ по классам эндпоинтов
+BYBIT_PRIORITY_RESERVE = 0.3  # Доля общего бюджета, которую информационные запросы оставляют ордерам
+BREAKER_FAILURES = 5  # Ошибок биржи подряд до размыкания предохранителя ключа
+BREAKER_COOLDOWN = 5.0  # Сколько секунд запросы ключа не отправляются после размыкания
+# Кэш состояния счёта: балансы включенных пользователей обновляются в фоне и из потока wallet
+ACCOUNT_REFRESH_INTERVAL = 300  # Как часто обновлять балансы (сек)
+ACCOUNT_MAX_AGE = 360  # Сколько секунд баланс и установленное плечо считаются актуальными
+# Сопровождение открытых сделок по событиям приватного потока (positions.py)
+MOVE_SL_TO_ENTRY = True  # Переносить стоп в безубыток после исполнения TP1
+POSITION_ACTION_WORKERS = 4  # Потоков для REST запросов реакций (перенос стопа, отмена TP)
+PRICE_MAX_AGE = 2.0  # Сколько секунд общий снимок цены считается свежим
+PREARM_SECONDS = 30  # За сколько секунд до Result готовить планы ордеров (0 - отключить)
+# Точный вход: задача входа срабатывает на PRECISION_LEAD сек раньше и дожидается Result по часам биржи
+PRECISION_LEAD = 2.0  # 0 - срабатывать по локальным часам без досыпания
+PRECISION_SPIN_SECONDS = 0.02  # Последние миллисекунды ожидаются короткими паузами, а не одним sleep
+CLOCK_SYNC_INTERVAL = 300  # Как часто измерять смещение часов относительно Bybit (сек)
+CLOCK_SYNC_SAMPLES = 3  # Замеров за синхронизацию (берётся замер с наименьшей задержкой)
+# Повторы ордеров: пауза перед n-й повторной попыткой случайная в [0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^(n-1))]
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+FILL_WAIT_TIMEOUT = 3.0  # Сколько секунд ждать исполнения покупки из WebSocket до опроса позиции
+
+# Уведомления Telegram (лимиты: ~30 сообщений/сек всего, ~1 сообщение/сек в один чат)
+NOTIFY_QUEUE_SIZE = 10000  # Максимум сообщений в очереди
+NOTIFY_GLOBAL_RATE = 25  # Сообщений в секунду всего (с запасом до лимита Telegram)
+NOTIFY_CHAT_RATE = 1  # Сообщений в секунду в один чат
+NOTIFY_CHAT_BURST = 3  # Сколько сообщений подряд можно отправить в один чат
+NOTIFY_MAX_ATTEMPTS = 3  # Попыток отправки при сетевых ошибках
+
+# Метрики задержек: data/metrics.prom обновляется раз в METRICS_EXPORT_INTERVAL сек
+METRICS_EXPORT_INTERVAL = 15
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # HTTP endpoint /metrics на 127.0.0.1 (0 - отключить)
+
+# Хранилище пользователей и токенов: "json" (data/*.json) или "sqlite" (data/bot.sqlite3)
+# Перенос существующих данных: python3 scripts/migrate_json_to_sqlite.py
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+
+# Планировщик: задачи хранятся в data/jobs.sqlite3 и восстанавливаются после перезапуска
+SCHEDULER_PERSISTENT = os.getenv("SCHEDULER_PERSISTENT", "1") == "1"
+# Сколько секунд после плановой даты задача ещё выполняется (опоздавшие запуски объединяются в один)
+ENTRY_MISFIRE_GRACE = 60  # Вход в позицию: позже рынок уже ушёл
+REMINDER_MISFIRE_GRACE = 12 * 3600  # Напоминание полезно и с опозданием
+ENTRY_LATE_WARNING = 1.0  # С какого опоздания (сек) вход в позицию помечается в логе
 
 # Часовой пояс
 TIMEZONE = "Europe/Moscow"
@@ -0,0 +1,91 @@
+"""
+Параллельное исполнение входов в позицию для всех пользователей
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .config import TRADE_MAX_WORKERS
+from .metrics import observe
+
+logger = logging.getLogger(__name__)
+
+
+def _run_one(func, token, user_id, bot, trigger_time):
+    """
+    Исполняет вход для одного пользователя, изолируя ошибки
+
+    Returns:
+        dict с результатом: user_id, ok, latency (сек от триггера до подтверждения покупки), error
+    """
+    timings = {}
+    try:
+        func(token, user_id, bot, timings=timings)
+        error = None
+    except Exception as e:
+        logger.error(f"[Executor] Ошибка открытия позиции для {user_id}: {e}", exc_info=True)
+        error = str(e)
+
+    buy_ack = timings.get("buy_ack")
+    return {
+        "user_id": user_id,
+        "ok": error is None and buy_ack is not None,
+        "latency": buy_ack - trigger_time if buy_ack is not None else None,
+        "error": error,
+    }
+
+
+def run_for_users(func, token, user_ids, bot, max_workers=None, trigger_time=None, log_summary=True):
+    """
+    Запускает вход в позицию для всех пользователей параллельно
+
+    Args:
+        func: Функция входа с сигнатурой func(token, user_id, bot, timings=dict)
+        token: Символ токена
+        user_ids: Список ID пользователей
+        bot: Экземпляр Telegram бота
+        max_workers: Ограничение параллельности (по умолчанию TRADE_MAX_WORKERS)
+        trigger_time: Момент срабатывания триггера по time.monotonic()
+        log_summary: Логировать сводку задержек (шард отдаёт результаты координатору без сводки)
+
+    Returns:
+        Список результатов по каждому пользователю в порядке user_ids
+    """
+    if trigger_time is None:
+        trigger_time = time.monotonic()
+
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+
+    workers = max(1, min(max_workers or TRADE_MAX_WORKERS, len(user_ids)))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trade") as pool:
+        futures = [
+            pool.submit(_run_one, func, token, user_id, bot, trigger_time)
+            for user_id in user_ids
+        ]
+        results = [future.result() for future in futures]
+
+    if log_summary:
+        log_latency_summary(token, results)
+    return results
+
+
+def log_latency_summary(token, results):
+    """Логирует задержку от триггера до подтверждения покупки по каждому пользователю"""
+    for result in results:
+        if result["latency"] is not None:
+            observe("bot_trigger_to_buy_ack_seconds", result["latency"])
+            logger.info(f"[Executor] {token}: пользователь {result['user_id']} - покупка подтверждена через {result['latency'] * 1000:.0f} мс")
+
+    latencies = sorted(r["latency"] for r in results if r["latency"] is not None)
+    failed = sum(1 for r in results if not r["ok"])
+
+    if latencies:
+        logger.info(
+            f"[Executor] {token}: входов {len(latencies)}/{len(results)}, "
+            f"первый {latencies[0] * 1000:.0f} мс, последний {latencies[-1] * 1000:.0f} мс, "
+            f"разброс {(latencies[-1] - latencies[0]) * 1000:.0f} мс"
+        )
+    if failed:
+        logger.warning(f"[Executor] {token}: не удалось открыть позицию для {failed} пользователей")
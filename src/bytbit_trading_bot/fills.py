@@ -0,0 +1,207 @@
+"""
+Подтверждение исполнения ордеров через приватный WebSocket Bybit
+"""
+import logging
+import threading
+import time
+from pybit.unified_trading import WebSocket
+from .account import handle_wallet_message
+from . import positions, sessions
+from .config import FILL_WAIT_TIMEOUT, SESSION_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Статусы ордера, после которых позиция открыта (полностью или частично)
+FILLED_STATUSES = {"Filled", "PartiallyFilledCanceled"}
+# Статусы ордера, после которых исполнения уже не будет
+FAILED_STATUSES = {"Cancelled", "Rejected", "Deactivated"}
+
+# Сколько последних статусов ордеров хранить на один ключ
+MAX_ORDER_STATUSES = 1000
+
+# api_key -> {"ws", "api_secret", "last_used", "orders": {order_id: статус}}
+_streams = {}
+_lock = threading.Lock()
+_updated = threading.Condition(_lock)
+
+# Фабрика приватных потоков (api_key, api_secret, testnet) -> соединение с методами *_stream и exit.
+# None - pybit WebSocket; симулятор Bybit подставляет свой поток
+_stream_factory = None
+
+
+def set_stream_factory(factory):
+    """Подменяет фабрику приватных потоков (None - pybit WebSocket)"""
+    global _stream_factory
+    _stream_factory = factory
+
+
+def _connect(api_key, api_secret, testnet):
+    """Создаёт приватное соединение или None, если потока для этого адреса нет"""
+    if _stream_factory is not None:
+        return _stream_factory(api_key=api_key, api_secret=api_secret, testnet=testnet)
+    # REST направлен не на Bybit (симулятор) - поток pybit авторизовался бы на настоящей бирже
+    if sessions.BYBIT_ENDPOINT:
+        return None
+    return WebSocket(testnet=testnet, channel_type="private", api_key=api_key, api_secret=api_secret)
+
+
+def _close(ws):
+    """Закрывает WebSocket соединение"""
+    try:
+        ws.exit()
+    except Exception as e:
+        logger.warning(f"[Fills] Ошибка закрытия WebSocket: {e}")
+
+
+def handle_message(api_key, message):
+    """
+    Обрабатывает сообщение потока order и будит ожидающие потоки
+
+    Args:
+        api_key: Ключ, к потоку которого относится сообщение
+        message: Сообщение Bybit ({"topic": "order", "data": [...]})
+    """
+    if message.get("topic") != "order":
+        return
+
+    with _updated:
+        entry = _streams.get(api_key)
+        if entry is None:
+            return
+        orders = entry["orders"]
+        for order in message.get("data", []):
+            order_id = order.get("orderId")
+            if order_id:
+                orders.pop(order_id, None)
+                orders[order_id] = order.get("orderStatus")
+        # Старые статусы вытесняются в порядке поступления
+        while len(orders) > MAX_ORDER_STATUSES:
+            orders.pop(next(iter(orders)))
+        _updated.notify_all()
+
+
+def open_stream(api_key, api_secret, testnet=False):
+    """
+    Открывает приватный поток ордеров для ключа (если ещё не открыт)
+
+    Вызывается заранее (при подготовке планов), чтобы в момент Result
+    соединение уже было установлено и авторизовано.
+    """
+    with _lock:
+        entry = _streams.get(api_key)
+        if entry is not None and entry["api_secret"] == api_secret:
+            entry["last_used"] = time.monotonic()
+            return
+        replaced = _streams.pop(api_key, None)
+
+    if replaced is not None:
+        _close(replaced["ws"])
+
+    ws = _connect(api_key, api_secret, testnet)
+    if ws is None:
+        logger.debug(f"[Fills] Поток ключа {str(api_key)[:4]}*** не открыт: задан BYBIT_ENDPOINT без фабрики потоков")
+        return
+
+    with _lock:
+        _streams[api_key] = {"ws": ws, "api_secret": api_secret, "last_used": time.monotonic(), "orders": {}}
+
+    ws.order_stream(callback=lambda message: handle_message(api_key, message))
+    # По тому же соединению приходят изменения баланса для кэша состояния счёта
+    ws.wallet_stream(callback=lambda message: handle_wallet_message(api_key, message))
+    # Исполнения и позиции - для сопровождения открытых сделок (перенос стопа, отмена TP)
+    ws.execution_stream(callback=lambda message: positions.handle_message(api_key, message))
+    ws.position_stream(callback=lambda message: positions.handle_message(api_key, message))
+    logger.info(f"[Fills] Поток ордеров ключа {str(api_key)[:4]}*** открыт")
+
+
+def open_stream_in_background(api_key, api_secret):
+    """Открывает поток в отдельном потоке выполнения (подключение и авторизация WebSocket синхронные)"""
+    def run():
+        try:
+            open_stream(api_key, api_secret)
+        except Exception as e:
+            logger.warning(f"[Fills] Не удалось открыть поток ключа {str(api_key)[:4]}***: {e}")
+
+    threading.Thread(target=run, name="open-stream", daemon=True).start()
+
+
+def has_stream(api_key):
+    """Проверяет, открыт ли приватный поток ордеров для ключа"""
+    with _lock:
+        return api_key in _streams
+
+
+def wait_for_fill(api_key, order_id, timeout=None):
+    """
+    Ждёт исполнения ордера по событию из приватного потока
+
+    Returns:
+        True - ордер исполнен, False - ордер отменён или отклонён,
+        None - потока нет или событие не пришло за timeout (нужен опрос позиции)
+    """
+    timeout = FILL_WAIT_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+
+    with _updated:
+        entry = _streams.get(api_key)
+        if entry is None or not order_id:
+            return None
+        entry["last_used"] = time.monotonic()
+
+        while True:
+            status = entry["orders"].get(order_id)
+            if status in FILLED_STATUSES:
+                return True
+            if status in FAILED_STATUSES:
+                return False
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            _updated.wait(remaining)
+
+
+def close_stream(api_key):
+    """Закрывает поток ключа (например, после смены ключей через /set_api)"""
+    with _lock:
+        entry = _streams.pop(api_key, None)
+
+    if entry is not None:
+        _close(entry["ws"])
+        logger.info(f"[Fills] Поток ордеров ключа {str(api_key)[:4]}*** закрыт")
+
+
+def evict_idle(max_idle=None):
+    """
+    Закрывает потоки, не использовавшиеся дольше max_idle секунд
+
+    Потоки ключей с сопровождаемыми сделками не закрываются.
+
+    Returns:
+        Количество закрытых потоков
+    """
+    max_idle = SESSION_IDLE_TIMEOUT if max_idle is None else max_idle
+    now = time.monotonic()
+
+    with _lock:
+        keys = [
+            key for key, entry in _streams.items()
+            if now - entry["last_used"] > max_idle and not positions.has_trades(key)
+        ]
+        removed = [_streams.pop(key) for key in keys]
+
+    for entry in removed:
+        _close(entry["ws"])
+    if removed:
+        logger.info(f"[Fills] Закрыто неактивных потоков: {len(removed)}")
+    return len(removed)
+
+
+def clear():
+    """Закрывает все потоки"""
+    with _lock:
+        removed = list(_streams.values())
+        _streams.clear()
+
+    for entry in removed:
+        _close(entry["ws"])
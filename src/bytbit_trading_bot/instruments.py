@@ -0,0 +1,177 @@
+"""
+Общий кэш параметров инструментов (шаг цены, шаг и минимальный объём)
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from .sessions import get_session
+from .config import INSTRUMENTS_TTL
+
+logger = logging.getLogger(__name__)
+
+# Символ -> {"tick_size", "qty_step", "min_qty"}
+_instruments = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+# Символ -> Future идущего точечного запроса: одновременные промахи по символу делят один запрос
+_inflight = {}
+
+
+def _parse_instrument(item):
+    """Преобразует запись instruments-info в параметры инструмента"""
+    lot_size = item.get("lotSizeFilter", {})
+    tick_size = item.get("priceFilter", {}).get("tickSize") or item.get("tickSize", "0.01")
+    return {
+        "tick_size": float(tick_size),
+        "qty_step": float(lot_size.get("qtyStep", "1")),
+        "min_qty": float(lot_size.get("minQty", "1")),
+    }
+
+
+def _public_session():
+    """Возвращает публичную сессию для рыночных данных"""
+    return get_session()
+
+
+def load_all(session=None):
+    """
+    Загружает весь список linear инструментов постранично и заменяет кэш
+
+    Returns:
+        Количество загруженных инструментов
+    """
+    global _loaded_at
+
+    session = session or _public_session()
+    loaded = {}
+    cursor = None
+
+    while True:
+        params = {"category": "linear", "limit": 1000}
+        if cursor:
+            params["cursor"] = cursor
+        response = session.get_instruments_info(**params)
+
+        if response.get("retCode") != 0:
+            logger.error(f"[Instruments] Ошибка загрузки инструментов: {response.get('retMsg')}")
+            return 0
+
+        result = response.get("result", {})
+        for item in result.get("list", []):
+            if item.get("symbol"):
+                loaded[item["symbol"]] = _parse_instrument(item)
+
+        cursor = result.get("nextPageCursor")
+        if not cursor:
+            break
+
+    with _lock:
+        _instruments.clear()
+        _instruments.update(loaded)
+        _loaded_at = time.monotonic()
+
+    logger.info(f"[Instruments] Загружено инструментов: {len(loaded)}")
+    return len(loaded)
+
+
+def refresh_instruments():
+    """Фоновое обновление кэша (пропускается, если обновление уже идёт)"""
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        load_all()
+    except Exception as e:
+        logger.error(f"[Instruments] Ошибка обновления кэша: {e}", exc_info=True)
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_symbol(symbol, session=None):
+    """
+    Точечно загружает параметры одного инструмента
+
+    Returns:
+        Параметры инструмента или None, если он не найден
+    """
+    session = session or _public_session()
+    response = session.get_instruments_info(category="linear", symbol=symbol)
+
+    if response.get("retCode") != 0:
+        logger.error(f"[Instruments] Ошибка получения информации об инструменте {symbol}: {response.get('retMsg')}")
+        return None
+
+    items = response.get("result", {}).get("list") or []
+    if not items:
+        return None
+
+    instrument = _parse_instrument(items[0])
+    with _lock:
+        _instruments[symbol] = instrument
+    return instrument
+
+
+def get_instrument(symbol, session=None):
+    """
+    Возвращает параметры инструмента из памяти
+
+    Если кэш устарел, запускает фоновое обновление. Если символа нет в кэше
+    (например, листинг после последней загрузки), загружает его точечно.
+
+    Args:
+        symbol: Символ инструмента (например, LAUSDT)
+        session: Сессия для точечного запроса (по умолчанию публичная)
+    """
+    with _lock:
+        instrument = _instruments.get(symbol)
+        stale = time.monotonic() - _loaded_at > INSTRUMENTS_TTL
+
+    if stale and _loaded_at:
+        threading.Thread(target=refresh_instruments, name="instruments-refresh", daemon=True).start()
+
+    if instrument is not None:
+        return instrument
+
+    return _refresh_shared(symbol, session)
+
+
+def _refresh_shared(symbol, session):
+    """
+    Точечная загрузка символа, общая для одновременных промахов
+
+    Новый листинг, которого нет в кэше, в момент подготовки запрашивают все пользователи
+    сразу: запрос делает первый, остальные ждут его результат.
+    """
+    with _lock:
+        # Запрос мог завершиться между промахом и этой проверкой
+        instrument = _instruments.get(symbol)
+        if instrument is not None:
+            return instrument
+        future = _inflight.get(symbol)
+        owner = future is None
+        if owner:
+            future = _inflight[symbol] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        instrument = refresh_symbol(symbol, session)
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(instrument)
+        return instrument
+    finally:
+        with _lock:
+            _inflight.pop(symbol, None)
+
+
+def clear():
+    """Очищает кэш"""
+    global _loaded_at
+    with _lock:
+        _instruments.clear()
+        _loaded_at = 0.0
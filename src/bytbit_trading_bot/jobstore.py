@@ -0,0 +1,152 @@
+"""
+Хранилище задач планировщика в SQLite
+
+Задачи переживают перезапуск бота: при старте планировщик поднимает
+оставшиеся задачи из базы, а не пересобирает их из истории токенов.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apscheduler_jobs (
+    id TEXT PRIMARY KEY,
+    next_run_time REAL,
+    job_state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_next_run_time ON apscheduler_jobs (next_run_time);
+"""
+
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    Хранилище задач APScheduler на стандартном sqlite3
+
+    Повторяет поведение SQLAlchemyJobStore без зависимости от SQLAlchemy.
+    """
+
+    def __init__(self, db_path, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.db_path = db_path
+        self.pickle_protocol = pickle_protocol
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        with self._lock:
+            self._connection()
+
+    def _connection(self):
+        """Возвращает соединение, открывая его заново после shutdown (как engine.dispose в SQLAlchemy)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def lookup_job(self, job_id):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT job_state FROM apscheduler_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        timestamp = datetime_to_utc_timestamp(now)
+        return self._get_jobs("WHERE next_run_time <= ?", (timestamp,))
+
+    def get_next_run_time(self):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT next_run_time FROM apscheduler_jobs WHERE next_run_time IS NOT NULL "
+                "ORDER BY next_run_time LIMIT 1"
+            ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        with self._lock:
+            try:
+                self._connection().execute(
+                    "INSERT INTO apscheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time),
+                     pickle.dumps(job.__getstate__(), self.pickle_protocol)),
+                )
+            except sqlite3.IntegrityError:
+                raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE apscheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time),
+                 pickle.dumps(job.__getstate__(), self.pickle_protocol), job.id),
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with self._lock:
+            cursor = self._connection().execute("DELETE FROM apscheduler_jobs WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM apscheduler_jobs")
+
+    def shutdown(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, condition="", params=()):
+        jobs = []
+        failed_job_ids = []
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT id, job_state FROM apscheduler_jobs {condition} ORDER BY next_run_time",
+                params,
+            ).fetchall()
+
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                logger.exception(f"[JobStore] Не удалось восстановить задачу {job_id}, задача удалена")
+                failed_job_ids.append(job_id)
+
+        # Задачи, которые не удалось восстановить, удаляются из базы
+        if failed_job_ids:
+            with self._lock:
+                self._connection().executemany(
+                    "DELETE FROM apscheduler_jobs WHERE id = ?", [(job_id,) for job_id in failed_job_ids]
+                )
+
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (path={self.db_path})>"
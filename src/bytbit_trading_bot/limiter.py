@@ -0,0 +1,206 @@
+"""
+Клиентское ограничение частоты запросов к Bybit и предохранитель
+
+Bybit ограничивает запросы на UID (по группам эндпоинтов) и на IP, а в момент Result
+все пользователи ходят через один IP. Каждый вызов сессии проходит через:
+- корзину ключа для класса эндпоинта (торговые и аккаунтные запросы);
+- общую корзину процесса (бюджет IP), в которой информационные запросы
+  не трогают запас BYBIT_PRIORITY_RESERVE - он остаётся ордерам;
+- предохранитель ключа: после BREAKER_FAILURES ошибок биржи подряд запросы ключа
+  BREAKER_COOLDOWN секунд не отправляются, а сразу получают ответ с retCode CIRCUIT_OPEN.
+"""
+import logging
+import threading
+import time
+from .ratelimit import TokenBucket
+from .retry import exception_code
+from .metrics import observe
+from .config import (
+    BYBIT_IP_RATE, BYBIT_IP_BURST, BYBIT_KEY_RATES, BYBIT_PRIORITY_RESERVE, BREAKER_FAILURES, BREAKER_COOLDOWN
+)
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_OPEN = -1  # retCode ответа, который не отправлялся из-за разомкнутого предохранителя
+
+TRADE_METHODS = {
+    "place_order", "place_batch_order", "amend_order", "amend_batch_order",
+    "cancel_order", "cancel_batch_order", "cancel_all_orders",
+}
+MARKET_METHODS = {
+    "get_server_time", "get_tickers", "get_instruments_info", "get_kline", "get_orderbook",
+}
+
+RATE_LIMIT_CODES = {10006, 10018}  # Лимит ключа и лимит IP
+# Ошибки, говорящие о перегрузке или сбое биржи (ошибки параметров предохранитель не размыкают)
+BREAKER_CODES = RATE_LIMIT_CODES | {10000, 10016}
+RATE_LIMIT_PAUSE = 1.0  # На сколько секунд опустошать корзину после ответа о лимите
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: размыкается после failures ошибок подряд на cooldown секунд
+
+    После паузы пропускает запросы снова, но первая же ошибка размыкает его повторно.
+    """
+
+    def __init__(self, failures, cooldown):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._count = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли отправить запрос"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._opened_at = None
+            self._count = self.failures - 1
+            return True
+
+    def record(self, ok):
+        """
+        Учитывает исход запроса
+
+        Returns:
+            True, если предохранитель только что разомкнулся
+        """
+        with self._lock:
+            if ok:
+                self._count = 0
+                return False
+            self._count += 1
+            if self._count >= self.failures and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+_ip_bucket = TokenBucket(BYBIT_IP_RATE, BYBIT_IP_BURST) if BYBIT_IP_RATE else None
+_key_buckets = {}  # (api_key, класс эндпоинта) -> TokenBucket
+_breakers = {}  # api_key -> CircuitBreaker
+_lock = threading.Lock()
+
+
+def endpoint_class(method):
+    """Класс эндпоинта по имени метода pybit: trade, market или account"""
+    if method in TRADE_METHODS:
+        return "trade"
+    if method in MARKET_METHODS:
+        return "market"
+    return "account"
+
+
+def _key_bucket(api_key, kind):
+    rate = BYBIT_KEY_RATES.get(kind)
+    if not api_key or not rate:
+        return None
+    with _lock:
+        bucket = _key_buckets.get((api_key, kind))
+        if bucket is None:
+            bucket = _key_buckets[(api_key, kind)] = TokenBucket(rate)
+        return bucket
+
+
+def _breaker(api_key):
+    with _lock:
+        breaker = _breakers.get(api_key)
+        if breaker is None:
+            breaker = _breakers[api_key] = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+        return breaker
+
+
+def _acquire(api_key, kind):
+    """Ждёт токены ключа и общего бюджета, время ожидания пишется в метрики"""
+    started = time.perf_counter()
+    bucket = _key_bucket(api_key, kind)
+    if bucket is not None:
+        bucket.acquire()
+    ip_bucket = _ip_bucket
+    if ip_bucket is not None:
+        reserve = 0.0 if kind == "trade" else ip_bucket.burst * BYBIT_PRIORITY_RESERVE
+        ip_bucket.acquire(reserve=reserve)
+    waited = time.perf_counter() - started
+    if waited > 0.001:
+        observe("bot_rate_limit_wait_seconds", waited, endpoint=kind)
+
+
+def _record(api_key, kind, code, breaker):
+    """Учитывает ответ: лимит опустошает корзину, сбои биржи считаются предохранителем"""
+    if code == 10006:
+        bucket = _key_bucket(api_key, kind)
+        if bucket is not None:
+            bucket.drain(RATE_LIMIT_PAUSE)
+    elif code == 10018 and _ip_bucket is not None:
+        _ip_bucket.drain(RATE_LIMIT_PAUSE)
+
+    if breaker.record(code not in BREAKER_CODES):
+        logger.warning(
+            f"[Limiter] Предохранитель ключа {str(api_key)[:4]}*** разомкнут на {BREAKER_COOLDOWN} сек "
+            f"после {BREAKER_FAILURES} ошибок подряд (последняя: {code})"
+        )
+
+
+def call(api_key, method, func, *args, **kwargs):
+    """
+    Выполняет вызов pybit с учётом лимитов и предохранителя ключа
+
+    Returns:
+        Ответ вызова или {"retCode": CIRCUIT_OPEN, ...}, если предохранитель разомкнут
+    """
+    breaker = _breaker(api_key)
+    if not breaker.allow():
+        return {"retCode": CIRCUIT_OPEN, "retMsg": "Circuit breaker is open", "result": {}, "retExtInfo": {}}
+
+    kind = endpoint_class(method)
+    _acquire(api_key, kind)
+    try:
+        response = func(*args, **kwargs)
+    except Exception as e:
+        # Исключение без retCode - сетевой сбой, тоже считается ошибкой биржи
+        code = exception_code(e)
+        _record(api_key, kind, 10000 if code is None else code, breaker)
+        raise
+
+    _record(api_key, kind, response.get("retCode", 0) if isinstance(response, dict) else 0, breaker)
+    return response
+
+
+class LimitedSession:
+    """
+    Обёртка HTTP сессии Bybit: каждый вызов метода API проходит через лимиты и предохранитель ключа
+    """
+
+    def __init__(self, session, api_key=None):
+        self._session = session
+        self._api_key = api_key
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def limited(*args, **kwargs):
+            return call(self._api_key, name, attr, *args, **kwargs)
+        return limited
+
+
+def configure(ip_rate=None, ip_burst=None):
+    """Задаёт общий бюджет процесса (шарды делят бюджет IP между собой), 0 - без ограничения"""
+    global _ip_bucket
+
+    ip_rate = BYBIT_IP_RATE if ip_rate is None else ip_rate
+    ip_burst = BYBIT_IP_BURST if ip_burst is None else ip_burst
+    _ip_bucket = TokenBucket(ip_rate, max(1.0, ip_burst)) if ip_rate else None
+
+
+def clear():
+    """Сбрасывает корзины ключей и предохранители"""
+    with _lock:
+        _key_buckets.clear()
+        _breakers.clear()
+    configure()
@@ -7,6 +7,9 @@ import asyncio
 from .parser import start_telethon
 from .bot import start_telebot
 from .scheduler import start_scheduler
+from . import notifier
+from . import metrics
+from . import shards
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +32,15 @@ def main():
     
     logger.info("[Main] Запуск бота...")
     
+    # Процессы-шарды для входов (если задан TRADE_WORKER_PROCESSES) - до запуска остальных потоков
+    shards.start()
+    
+    # Уведомления отправляются фоновым диспетчером
+    notifier.start()
+    
+    # HTTP endpoint метрик (если задан METRICS_PORT)
+    metrics.start_http_server()
+    
     # Запускаем планировщик
     start_scheduler()
     
@@ -42,6 +54,7 @@ def main():
         asyncio.run(start_telethon())
     except KeyboardInterrupt:
         logger.info("[Main] Получен сигнал остановки")
+        shards.stop()
     except Exception as e:
         logger.error(f"[Main] Ошибка запуска Telethon: {e}", exc_info=True)
         raise
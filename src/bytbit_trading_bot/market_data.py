@@ -0,0 +1,65 @@
+"""
+Общий снимок последней цены по символу для всех пользователей
+"""
+import logging
+import threading
+import time
+from .sessions import get_session
+from .config import PRICE_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+# Символ -> (цена, time.monotonic() получения)
+_prices = {}
+_lock = threading.Lock()
+
+
+def refresh_price(symbol, session=None):
+    """
+    Запрашивает последнюю цену одним публичным запросом и сохраняет снимок
+
+    Returns:
+        Цена или None, если получить её не удалось
+    """
+    session = session or get_session()
+    ticker = session.get_tickers(category="linear", symbol=symbol)
+
+    if ticker.get("retCode") != 0 or not ticker.get("result", {}).get("list"):
+        logger.error(f"[MarketData] Ошибка получения цены для {symbol}: {ticker.get('retMsg')}")
+        return None
+
+    price = float(ticker["result"]["list"][0]["lastPrice"])
+    with _lock:
+        _prices[symbol] = (price, time.monotonic())
+    return price
+
+
+def get_snapshot(symbol, max_age=None):
+    """Возвращает цену из снимка, если он не старше max_age секунд, иначе None"""
+    max_age = PRICE_MAX_AGE if max_age is None else max_age
+    with _lock:
+        snapshot = _prices.get(symbol)
+    if snapshot is None or time.monotonic() - snapshot[1] > max_age:
+        return None
+    return snapshot[0]
+
+
+def get_last_price(symbol, session=None, max_age=None):
+    """
+    Возвращает последнюю цену: из свежего снимка или одним запросом к бирже
+
+    Args:
+        symbol: Символ инструмента
+        session: Сессия для запроса, если снимок устарел (по умолчанию публичная)
+        max_age: Допустимый возраст снимка в секундах (по умолчанию PRICE_MAX_AGE)
+    """
+    price = get_snapshot(symbol, max_age)
+    if price is not None:
+        return price
+    return refresh_price(symbol, session)
+
+
+def clear():
+    """Очищает снимки цен"""
+    with _lock:
+        _prices.clear()
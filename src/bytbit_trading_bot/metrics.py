@@ -0,0 +1,186 @@
+"""
+Замеры задержек (спаны) и их экспорт в формате Prometheus
+
+Каждый спан попадает в гистограмму bot_span_seconds с меткой span (и method для REST вызовов).
+Гистограммы пишутся в текстовый файл для textfile-коллектора node_exporter
+и, если задан METRICS_PORT, отдаются по HTTP на /metrics.
+Процессы-шарды периодически присылают координатору снимки своих гистограмм (merge),
+и экспорт координатора складывает их со своими.
+"""
+import bisect
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .config import METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+SPAN_METRIC = "bot_span_seconds"
+
+# Границы корзин гистограммы (сек): от единиц миллисекунд до минуты
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (метрика, метки) -> {"counts": [...], "sum", "count"}
+_histograms = {}
+# Источник (например, shard0) -> последний снимок его гистограмм
+_remote = {}
+_lock = threading.Lock()
+_server = None
+
+
+def observe(name, seconds, **labels):
+    """Добавляет значение в гистограмму name с метками labels"""
+    key = (name, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"counts": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+        histogram["counts"][index] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Замеряет длительность блока и записывает её в bot_span_seconds{span=name}
+
+    Пример:
+        with span("schedule_token"):
+            ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(SPAN_METRIC, time.perf_counter() - started, span=name, **labels)
+
+
+class TracedSession:
+    """
+    Обёртка HTTP сессии Bybit: каждый вызов метода API замеряется спаном rest{method}
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with span("rest", method=name):
+                return attr(*args, **kwargs)
+        return call
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def snapshot():
+    """Копия гистограмм процесса (для передачи координатору)"""
+    with _lock:
+        return {key: {"counts": list(h["counts"]), "sum": h["sum"], "count": h["count"]}
+                for key, h in _histograms.items()}
+
+
+def merge(source, histograms):
+    """
+    Запоминает снимок гистограмм другого процесса
+
+    Гистограммы накопительные, поэтому новый снимок источника заменяет предыдущий.
+    """
+    with _lock:
+        _remote[source] = histograms
+
+
+def render():
+    """Возвращает все гистограммы (свои и присланные шардами) в текстовом формате Prometheus"""
+    merged = snapshot()
+    with _lock:
+        remote = list(_remote.values())
+    for histograms in remote:
+        for key, h in histograms.items():
+            total = merged.setdefault(key, {"counts": [0] * len(h["counts"]), "sum": 0.0, "count": 0})
+            total["counts"] = [a + b for a, b in zip(total["counts"], h["counts"])]
+            total["sum"] += h["sum"]
+            total["count"] += h["count"]
+
+    lines = []
+    for name in sorted({name for name, _ in merged}):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), histogram in sorted(merged.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), histogram["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write_textfile(file_path):
+    """Атомарно записывает метрики в файл (формат textfile-коллектора node_exporter)"""
+    dir_path = os.path.dirname(file_path)
+    os.makedirs(dir_path, exist_ok=True)
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=dir_path, suffix=".tmp", delete=False) as f:
+            f.write(render())
+        # Файл читает node_exporter под своим пользователем: временный файл создаётся с 0600
+        try:
+            mode = stat.S_IMODE(os.stat(file_path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(f.name, mode)
+        os.replace(f.name, file_path)
+    except Exception as e:
+        logger.error(f"[Metrics] Ошибка записи {file_path}: {e}", exc_info=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=None):
+    """Запускает HTTP endpoint /metrics (если порт не задан - METRICS_PORT, 0 - отключено)"""
+    global _server
+
+    port = METRICS_PORT if port is None else port
+    if not port or _server is not None:
+        return _server
+    _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"[Metrics] Метрики доступны на http://127.0.0.1:{port}/metrics")
+    return _server
+
+
+def clear():
+    """Сбрасывает все гистограммы"""
+    with _lock:
+        _histograms.clear()
+        _remote.clear()
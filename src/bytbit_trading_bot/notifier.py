@@ -0,0 +1,180 @@
+"""
+Фоновая отправка уведомлений в Telegram с учётом лимитов
+
+Торговый код только ставит сообщения в очередь, а отдельный поток отправляет их,
+соблюдая общий лимит Telegram и лимит на один чат. Ответ 429 (retry_after)
+приостанавливает отправку на указанное время, сообщение отправляется повторно.
+Пока диспетчер не запущен (скрипты, тесты), сообщения отправляются сразу.
+"""
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from .ratelimit import TokenBucket
+from .config import (
+    NOTIFY_QUEUE_SIZE, NOTIFY_GLOBAL_RATE, NOTIFY_CHAT_RATE, NOTIFY_CHAT_BURST, NOTIFY_MAX_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше - раньше
+PRIORITY_TRADE = 0  # Ордера, ошибки исполнения
+PRIORITY_INFO = 1  # Новые токены
+PRIORITY_REMINDER = 2  # Напоминания
+
+_queue = queue.PriorityQueue(maxsize=NOTIFY_QUEUE_SIZE)
+_sequence = itertools.count()
+_global_bucket = TokenBucket(NOTIFY_GLOBAL_RATE)
+_chat_buckets = {}
+_dispatcher = None
+_stop = threading.Event()
+_lock = threading.Lock()
+
+
+def _chat_bucket(chat_id):
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        bucket = _chat_buckets[chat_id] = TokenBucket(NOTIFY_CHAT_RATE, NOTIFY_CHAT_BURST)
+    return bucket
+
+
+def _retry_after(error):
+    """Возвращает retry_after из ответа 429 или None для остальных ошибок"""
+    if getattr(error, "error_code", None) != 429:
+        return None
+    result_json = getattr(error, "result_json", None) or {}
+    return float(result_json.get("parameters", {}).get("retry_after", 1))
+
+
+def is_running():
+    """Проверяет, запущен ли диспетчер"""
+    return _dispatcher is not None and _dispatcher.is_alive()
+
+
+def notify(bot, chat_id, text, priority=PRIORITY_INFO, **kwargs):
+    """
+    Ставит сообщение в очередь на отправку (не блокирует)
+
+    Если диспетчер не запущен, сообщение отправляется сразу.
+
+    Returns:
+        True - сообщение принято, False - очередь переполнена
+    """
+    if not is_running():
+        bot.send_message(chat_id, text, **kwargs)
+        return True
+
+    item = (priority, next(_sequence), {"bot": bot, "chat_id": chat_id, "text": text, "kwargs": kwargs, "attempts": 0})
+    try:
+        _queue.put_nowait(item)
+        return True
+    except queue.Full:
+        logger.error(f"[Notifier] Очередь переполнена, сообщение для {chat_id} отброшено")
+        return False
+
+
+class QueuedBot:
+    """
+    Замена бота для торгового кода: send_message ставит сообщение в очередь с заданным приоритетом
+    """
+
+    def __init__(self, bot, priority=PRIORITY_TRADE):
+        self.bot = bot
+        self.priority = priority
+
+    def send_message(self, chat_id, text, **kwargs):
+        return notify(self.bot, chat_id, text, priority=self.priority, **kwargs)
+
+
+def _send(message):
+    """
+    Отправляет одно сообщение
+
+    Returns:
+        None - отправлено или отброшено, иначе через сколько секунд повторить
+    """
+    message["attempts"] += 1
+    try:
+        message["bot"].send_message(message["chat_id"], message["text"], **message["kwargs"])
+        return None
+    except Exception as e:
+        retry_after = _retry_after(e)
+        if retry_after is not None:
+            logger.warning(f"[Notifier] Лимит Telegram (429), пауза {retry_after} сек")
+            _global_bucket.drain(retry_after)
+            return retry_after
+        if message["attempts"] < NOTIFY_MAX_ATTEMPTS:
+            logger.warning(f"[Notifier] Ошибка отправки пользователю {message['chat_id']}: {e}, повтор")
+            return 1.0
+        logger.error(f"[Notifier] Ошибка отправки пользователю {message['chat_id']}: {e}", exc_info=True)
+        return None
+
+
+def _run():
+    """Цикл диспетчера: очередь с приоритетами и отложенные по лимиту чата сообщения"""
+    delayed = []  # (ready_at, priority, seq, message)
+
+    while not (_stop.is_set() and _queue.empty() and not delayed):
+        now = time.monotonic()
+
+        # Отложенные сообщения, у которых истекла пауза, возвращаются в очередь
+        while delayed and delayed[0][0] <= now:
+            try:
+                _queue.put_nowait(delayed[0][1:])
+            except queue.Full:
+                break
+            heapq.heappop(delayed)
+
+        timeout = min(0.5, delayed[0][0] - now) if delayed else 0.5
+        try:
+            priority, seq, message = _queue.get(timeout=max(timeout, 0.0))
+        except queue.Empty:
+            continue
+
+        # Чат исчерпал свой лимит - откладываем, не задерживая остальные чаты
+        wait = _chat_bucket(message["chat_id"]).try_acquire()
+        if wait > 0:
+            heapq.heappush(delayed, (now + wait, priority, seq, message))
+            continue
+
+        _global_bucket.acquire()
+        retry_in = _send(message)
+        if retry_in is not None:
+            heapq.heappush(delayed, (time.monotonic() + retry_in, priority, seq, message))
+
+
+def start(global_rate=None):
+    """
+    Запускает диспетчер уведомлений в фоновом потоке
+
+    Args:
+        global_rate: Общий лимит сообщений в секунду вместо NOTIFY_GLOBAL_RATE
+            (процессы-шарды делят лимит бота между собой)
+    """
+    global _dispatcher, _global_bucket
+
+    with _lock:
+        if is_running():
+            return
+        if global_rate:
+            _global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        _stop.clear()
+        _dispatcher = threading.Thread(target=_run, name="notifier", daemon=True)
+        _dispatcher.start()
+    logger.info("[Notifier] Диспетчер уведомлений запущен")
+
+
+def stop(timeout=5.0):
+    """Останавливает диспетчер, дожидаясь отправки очереди не дольше timeout секунд"""
+    global _dispatcher
+
+    with _lock:
+        dispatcher = _dispatcher
+        if dispatcher is None:
+            return
+        _stop.set()
+    dispatcher.join(timeout)
+    with _lock:
+        _dispatcher = None
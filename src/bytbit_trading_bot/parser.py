@@ -1,13 +1,17 @@
 """
 Парсер Telegram канала
 """
-import re
 import logging
 import asyncio
 from datetime import datetime, timezone
 from telethon import TelegramClient, events
-from .utils import parse_result_date, load_json, save_json, TOKENS_FILE, is_user_enabled, USERS_FILE
-from .config import API_ID, API_HASH, SESSION_NAME, CHANNEL, POST_REGEX, MESSAGES_HISTORY_LIMIT, TOKEN
+from .utils import (
+    parse_result_date, add_token, add_tokens, count_tokens, get_enabled_user_ids,
+    get_channel_checkpoint, set_channel_checkpoint
+)
+from .config import API_ID, API_HASH, SESSION_NAME, CHANNEL, MESSAGES_HISTORY_LIMIT, CATCHUP_BATCH_SIZE, TOKEN
+from .announcements import extract, mentions_result, get_formats
+from .metrics import span, observe
 from .scheduler import schedule_token
 import pytz
 
@@ -15,6 +19,10 @@ logger = logging.getLogger(__name__)
 
 client = None
 
+# Чекпоинт от новых сообщений двигается только после догона истории,
+# иначе при падении во время догона пропущенные сообщения были бы потеряны
+_caught_up = False
+
 
 def notify_users_about_new_token(token, result_date_str, result_date):
     """
@@ -27,8 +35,8 @@ def notify_users_about_new_token(token, result_date_str, result_date):
     """
     try:
         from .bot import bot
-        
-        users = load_json(USERS_FILE)
+        from .notifier import QueuedBot, PRIORITY_INFO
+        notifier_bot = QueuedBot(bot, PRIORITY_INFO)
         
         # Форматируем дату для сообщения
         tz_moscow = pytz.timezone("Europe/Moscow")
@@ -46,103 +54,181 @@ def notify_users_about_new_token(token, result_date_str, result_date):
             f"✅ Токен запланирован для автоматической покупки"
         )
         
-        for user_id_str, user_config in users.items():
-            user_id = int(user_id_str)
-            if is_user_enabled(user_id):
-                try:
-                    bot.send_message(user_id, message_text, parse_mode='Markdown')
-                    logger.info(f"[Parser] Уведомление отправлено пользователю {user_id} о токене {token}")
-                except Exception as e:
-                    logger.error(f"[Parser] Ошибка отправки уведомления пользователю {user_id}: {e}", exc_info=True)
+        for user_id in get_enabled_user_ids():
+            try:
+                notifier_bot.send_message(user_id, message_text, parse_mode='Markdown')
+                logger.info(f"[Parser] Уведомление для пользователя {user_id} о токене {token} поставлено в очередь")
+            except Exception as e:
+                logger.error(f"[Parser] Ошибка отправки уведомления пользователю {user_id}: {e}", exc_info=True)
     except Exception as e:
         logger.error(f"[Parser] Ошибка отправки уведомлений о новом токене: {e}", exc_info=True)
 
 
-async def process_message(message_text):
+def parse_announcement(message_text):
     """
-    Обрабатывает сообщение из канала и находит новые анонсы.
+    Разбирает сообщение канала в кандидата на добавление (без записи и планирования)
     
     Args:
         message_text: Текст сообщения
         
     Returns:
-        True если токен был обработан и запланирован, False если нет
+        Словарь {"token_key", "token", "result_date", "data"} для будущего анонса или None
     """
     if not message_text:
-        logger.debug("[Telethon] process_message: сообщение пустое")
-        return False
-    
-    logger.debug(f"[Telethon] process_message: начинаю обработку сообщения длиной {len(message_text)} символов")
+        logger.debug("[Telethon] parse_announcement: сообщение пустое")
+        return None
     
-    match = re.match(POST_REGEX, message_text, re.DOTALL | re.MULTILINE)
-    if not match:
-        match = re.search(POST_REGEX, message_text, re.DOTALL | re.MULTILINE)
+    announcement = extract(message_text)
     
-    if not match:
-        if "Result" in message_text or "result" in message_text.lower():
+    if not announcement:
+        if mentions_result(message_text):
             logger.warning(f"[Telethon] Сообщение содержит 'Result', но не соответствует паттерну: {message_text[:200]}")
-            logger.debug(f"[Telethon] Используемый паттерн: {POST_REGEX}")
-        return False
+            logger.debug(f"[Telethon] Зарегистрированные форматы: {get_formats()}")
+        return None
     
     # Извлекаем токен и дату Result
-    token = match.group("token")
-    result_date_str = match.group("result_date")
+    token = announcement["token"]
+    result_date_str = announcement["result_date"]
     
     logger.info(f"[Telethon] Найден токен: {token}, дата Result: {result_date_str}")
     
     result_date = parse_result_date(result_date_str)
     if not result_date:
         logger.error(f"[Telethon] Не удалось распарсить дату: {result_date_str}")
-        return False
+        return None
     
     now = datetime.now(result_date.tzinfo if result_date.tzinfo else timezone.utc)
     if result_date <= now:
         logger.debug(f"[Telethon] Дата {result_date_str} уже прошла, пропускаем")
-        return False
-    
-    tokens = load_json(TOKENS_FILE)
-    token_key = f"{token}_{result_date_str}"
-    
-    if token_key in tokens:
-        logger.debug(f"[Telethon] Токен {token} уже добавлен, пропускаем")
-        return False
+        return None
     
-    tokens[token_key] = {
+    return {
+        "token_key": f"{token}_{result_date_str}",
         "token": token,
-        "result_date": result_date_str,
-        "result_datetime": result_date.isoformat(),
-        "added_at": datetime.now().isoformat()
+        "result_date": result_date,
+        "data": {
+            "token": token,
+            "result_date": result_date_str,
+            "result_datetime": result_date.isoformat(),
+            "added_at": datetime.now().isoformat()
+        },
     }
-    save_json(TOKENS_FILE, tokens)
+
+
+def _activate(candidate):
+    """Планирует добавленный токен и уведомляет пользователей"""
+    token = candidate["token"]
+    result_date = candidate["result_date"]
+    
     schedule_token(token, result_date)
     
     logger.info(f"[Telethon] Токен {token} запланирован на {result_date}")
     
     # Отправляем уведомление всем включенным пользователям
-    notify_users_about_new_token(token, result_date_str, result_date)
+    notify_users_about_new_token(token, candidate["data"]["result_date"], result_date)
+
+
+async def process_message(message_text):
+    """
+    Обрабатывает сообщение из канала и находит новые анонсы.
+    
+    Args:
+        message_text: Текст сообщения
+        
+    Returns:
+        True если токен был обработан и запланирован, False если нет
+    """
+    candidate = parse_announcement(message_text)
+    if candidate is None:
+        return False
     
+    if not add_token(candidate["token_key"], candidate["data"]):
+        logger.debug(f"[Telethon] Токен {candidate['token']} уже добавлен, пропускаем")
+        return False
+    
+    _activate(candidate)
     return True
 
 
+def ingest_messages(message_texts):
+    """
+    Пакетно обрабатывает сообщения (история канала при запуске)
+    
+    Кандидаты собираются и дедуплицируются в памяти, все новые токены
+    записываются одной операцией и затем планируются за один проход.
+    
+    Args:
+        message_texts: Тексты сообщений
+        
+    Returns:
+        Количество добавленных токенов
+    """
+    candidates = {}
+    for message_text in message_texts:
+        candidate = parse_announcement(message_text)
+        if candidate is not None:
+            candidates.setdefault(candidate["token_key"], candidate)
+    
+    if not candidates:
+        return 0
+    
+    added = add_tokens({token_key: candidate["data"] for token_key, candidate in candidates.items()})
+    
+    for token_key in added:
+        try:
+            _activate(candidates[token_key])
+        except Exception as e:
+            logger.error(f"[Telethon] Ошибка планирования токена {token_key}: {e}", exc_info=True)
+    
+    return len(added)
+
+
+def _ingest_batch(messages):
+    """Обрабатывает пачку сообщений и сдвигает чекпоинт канала"""
+    tokens_found = ingest_messages([message.text for message in messages])
+    set_channel_checkpoint(CHANNEL, max(message.id for message in messages))
+    return tokens_found
+
+
 async def check_recent_messages():
     """
-    Читает последние 50 сообщений из @TokenSplashBybit при запуске.
+    Догоняет сообщения @TokenSplashBybit, пришедшие за время простоя.
     
+    Читает сообщения после последнего обработанного ID (чекпоинт в data/parser_state.json)
+    от старых к новым, пачками по CATCHUP_BATCH_SIZE. При первом запуске без чекпоинта
+    читает последние MESSAGES_HISTORY_LIMIT сообщений.
     Находит новые анонсы и ставит задачи в календарь для будущих событий.
     """
+    global _caught_up
+    
     try:
-        logger.info(f"[Telethon] Читаю последние {MESSAGES_HISTORY_LIMIT} сообщений из {CHANNEL}")
+        last_id = get_channel_checkpoint(CHANNEL)
+        if last_id:
+            logger.info(f"[Telethon] Читаю сообщения {CHANNEL} после ID {last_id}")
+            messages = client.iter_messages(CHANNEL, min_id=last_id, reverse=True)
+        else:
+            logger.info(f"[Telethon] Читаю последние {MESSAGES_HISTORY_LIMIT} сообщений из {CHANNEL}")
+            messages = client.iter_messages(CHANNEL, limit=MESSAGES_HISTORY_LIMIT)
         
         messages_processed = 0
         tokens_found = 0
+        batch = []
+        
+        # Сообщения читаются потоком, запись и планирование - пачками
+        async for message in messages:
+            batch.append(message)
+            if len(batch) >= CATCHUP_BATCH_SIZE:
+                tokens_found += _ingest_batch(batch)
+                messages_processed += len(batch)
+                batch = []
+        
+        if batch:
+            tokens_found += _ingest_batch(batch)
+            messages_processed += len(batch)
         
-        async for message in client.iter_messages(CHANNEL, limit=MESSAGES_HISTORY_LIMIT):
-            messages_processed += 1
-            if message.text and await process_message(message.text):
-                tokens_found += 1
+        _caught_up = True
         
-        tokens = load_json(TOKENS_FILE)
-        logger.info(f"[Telethon] Проверено {messages_processed} сообщений, найдено {tokens_found} новых токенов, всего в файле: {len(tokens)}")
+        logger.info(f"[Telethon] Проверено {messages_processed} сообщений, найдено {tokens_found} новых токенов, всего сохранено: {count_tokens()}")
         
     except Exception as e:
         error_msg = str(e)
@@ -178,15 +264,21 @@ async def start_telethon():
         """Обработчик новых сообщений из канала"""
         try:
             logger.info(f"[Telethon] Получено новое сообщение из канала {CHANNEL}")
+            # Задержка доставки: от публикации поста до события NewMessage
+            if event.message.date:
+                observe("bot_post_to_event_seconds", max((datetime.now(timezone.utc) - event.message.date).total_seconds(), 0.0))
             if event.message.text:
                 logger.debug(f"[Telethon] Текст сообщения: {event.message.text[:200]}")
-                processed = await process_message(event.message.text)
+                with span("process_message"):
+                    processed = await process_message(event.message.text)
                 if processed:
                     logger.info(f"[Telethon] Сообщение успешно обработано и токен запланирован")
                 else:
                     logger.debug(f"[Telethon] Сообщение не содержит подходящий анонс токена")
             else:
                 logger.debug(f"[Telethon] Сообщение не содержит текста (возможно, медиа-сообщение)")
+            if _caught_up:
+                set_channel_checkpoint(CHANNEL, event.message.id)
         except Exception as e:
             logger.error(f"[Telethon] Ошибка обработки сообщения: {e}", exc_info=True)
     
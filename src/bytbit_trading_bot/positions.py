@@ -0,0 +1,232 @@
+"""
+Сопровождение открытых сделок по событиям приватного потока Bybit
+
+Сделка (символ, orderLinkId покупки и TP ордеров) регистрируется до отправки покупки,
+поэтому ни одно исполнение не теряется. События сопоставляются по orderLinkId.
+Потоки execution и position того же WebSocket, что и подтверждение исполнения,
+вызывают реакции без опроса биржи:
+- исполнен TP1 - стоп переносится в безубыток (цена входа);
+- сработал стоп или позиция закрыта - оставшиеся TP ордера отменяются.
+REST запросы реакций выполняются в отдельном пуле, чтобы не задерживать поток сообщений.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import observe
+from .utils import round_to_tick_size
+from .config import MOVE_SL_TO_ENTRY, POSITION_ACTION_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# api_key -> {символ: сделка}
+_trades = {}
+_lock = threading.Lock()
+_actions = ThreadPoolExecutor(max_workers=POSITION_ACTION_WORKERS, thread_name_prefix="positions")
+
+
+def _submit(func, *args):
+    """Выполняет реакцию в пуле, не блокируя поток сообщений WebSocket"""
+    _actions.submit(func, *args)
+
+
+def track(api_key, user_id, symbol, session, bot, entry_price, tick_size, buy_link_id, legs):
+    """
+    Регистрирует сделку до отправки ордера покупки
+
+    Args:
+        api_key: Ключ, по потоку которого придут события
+        user_id: ID пользователя Telegram
+        symbol: Символ инструмента
+        session: HTTP сессия Bybit для реакций
+        bot: Бот для уведомлений
+        entry_price: Опорная цена входа (заменяется ценой исполнений покупки или avgPrice позиции)
+        tick_size: Шаг цены инструмента для стопа в безубыток
+        buy_link_id: orderLinkId ордера покупки
+        legs: Планируемые TP ордера {name, price, qty, link_id}
+    """
+    trade = {
+        "user_id": user_id,
+        "symbol": symbol,
+        "session": session,
+        "bot": bot,
+        "entry": entry_price,
+        "tick_size": tick_size,
+        "buy_link_id": buy_link_id,
+        "bought_qty": 0.0,
+        "bought_value": 0.0,
+        "opened": False,
+        "legs": {leg["link_id"]: {**leg, "filled_qty": 0.0, "filled": False} for leg in legs},
+        "sl_moved": False,
+    }
+    with _lock:
+        _trades.setdefault(api_key, {})[symbol] = trade
+
+
+def drop_legs(api_key, symbol, link_ids):
+    """Убирает TP ордера, которые не удалось разместить (их не нужно отменять)"""
+    with _lock:
+        trade = _trades.get(api_key, {}).get(symbol)
+        if trade is None:
+            return
+        for link_id in link_ids:
+            trade["legs"].pop(link_id, None)
+    logger.info(f"[Positions] Сопровождение {symbol} для {trade['user_id']}: TP ордеров {len(trade['legs'])}")
+
+
+def untrack(api_key, symbol):
+    """Забывает сделку (например, ордер покупки не размещён)"""
+    _pop(api_key, symbol)
+
+
+def has_trades(api_key):
+    """Есть ли у ключа сопровождаемые сделки (поток такого ключа нельзя закрывать)"""
+    with _lock:
+        return bool(_trades.get(api_key))
+
+
+def get_trade(api_key, symbol):
+    with _lock:
+        return _trades.get(api_key, {}).get(symbol)
+
+
+def _pop(api_key, symbol):
+    with _lock:
+        trades = _trades.get(api_key, {})
+        trade = trades.pop(symbol, None)
+        if not trades:
+            _trades.pop(api_key, None)
+        return trade
+
+
+def _on_execution(api_key, execution, received):
+    symbol = execution.get("symbol")
+    trade = get_trade(api_key, symbol)
+    if trade is None:
+        return
+
+    # Стоп позиции исполняется рыночным ордером с stopOrderType StopLoss
+    if execution.get("stopOrderType") == "StopLoss":
+        closed = _pop(api_key, symbol)
+        if closed is not None:
+            _submit(_close, closed, "🛑 Сработал Stop Loss", received)
+        return
+
+    qty = float(execution.get("execQty") or 0)
+    link_id = execution.get("orderLinkId")
+    move_stop = False
+
+    with _lock:
+        if link_id == trade["buy_link_id"]:
+            # Средняя цена входа по исполнениям покупки
+            trade["opened"] = True
+            trade["bought_qty"] += qty
+            trade["bought_value"] += qty * float(execution.get("execPrice") or 0)
+            if trade["bought_qty"]:
+                trade["entry"] = trade["bought_value"] / trade["bought_qty"]
+            return
+
+        leg = trade["legs"].get(link_id)
+        if leg is None or leg["filled"]:
+            return
+        leg["filled_qty"] += qty
+        leaves = execution.get("leavesQty")
+        leg["filled"] = float(leaves) == 0 if leaves not in (None, "") else leg["filled_qty"] >= leg["qty"]
+        if leg["filled"] and leg["name"] == "TP1" and MOVE_SL_TO_ENTRY and not trade["sl_moved"]:
+            trade["sl_moved"] = move_stop = True
+
+    if move_stop:
+        _submit(_move_stop, trade, received)
+
+
+def _on_position(api_key, position, received):
+    """
+    Открытая позиция уточняет цену входа (avgPrice), закрытая (стоп, последний TP
+    или вручную) завершает сопровождение
+    """
+    symbol = position.get("symbol")
+    if float(position.get("size") or 0) > 0:
+        with _lock:
+            trade = _trades.get(api_key, {}).get(symbol)
+            if trade is not None:
+                trade["opened"] = True
+                if float(position.get("avgPrice") or 0) > 0:
+                    trade["entry"] = float(position["avgPrice"])
+        return
+
+    # Нулевая позиция до исполнения покупки - ещё не открытая сделка
+    trade = get_trade(api_key, symbol)
+    if trade is None or not trade["opened"]:
+        return
+    closed = _pop(api_key, symbol)
+    if closed is not None:
+        _submit(_close, closed, "✅ Позиция закрыта", received)
+
+
+def handle_message(api_key, message):
+    """
+    Обрабатывает сообщение потоков execution и position
+
+    Args:
+        api_key: Ключ, к потоку которого относится сообщение
+        message: Сообщение Bybit ({"topic": "execution" | "position", "data": [...]})
+    """
+    received = time.perf_counter()
+    topic = message.get("topic")
+    if topic == "execution":
+        for execution in message.get("data", []):
+            _on_execution(api_key, execution, received)
+    elif topic == "position":
+        for position in message.get("data", []):
+            _on_position(api_key, position, received)
+
+
+def _move_stop(trade, received):
+    """Переносит стоп позиции в безубыток"""
+    symbol = trade["symbol"]
+    # Средняя цена исполнения может быть не кратна шагу цены - такой стоп биржа отклонит
+    entry = round_to_tick_size(trade["entry"], trade["tick_size"])
+    try:
+        result = trade["session"].set_trading_stop(
+            category="linear",
+            symbol=symbol,
+            stopLoss=str(entry),
+            positionIdx=0,
+        )
+    except Exception as e:
+        logger.error(f"[Positions] Ошибка переноса стопа {symbol} для {trade['user_id']}: {e}", exc_info=True)
+        return
+    if result.get("retCode") != 0:
+        logger.error(f"[Positions] Стоп {symbol} для {trade['user_id']} не перенесён: {result.get('retMsg')}")
+        return
+    observe("bot_position_reaction_seconds", time.perf_counter() - received, action="move_stop")
+    logger.info(f"[Positions] {symbol}: стоп пользователя {trade['user_id']} перенесён в безубыток {entry}")
+    trade["bot"].send_message(trade["user_id"], f"🛡️ TP1 {symbol} исполнен, Stop Loss перенесён в безубыток: {entry}")
+
+
+def _close(trade, reason, received):
+    """Отменяет неисполненные TP ордера закрытой позиции"""
+    symbol = trade["symbol"]
+    pending = [leg for leg in trade["legs"].values() if not leg["filled"]]
+
+    cancelled = []
+    for leg in pending:
+        try:
+            result = trade["session"].cancel_order(category="linear", symbol=symbol, orderLinkId=leg["link_id"])
+            if result.get("retCode") == 0:
+                cancelled.append(leg["name"])
+            else:
+                logger.warning(f"[Positions] {leg['name']} {symbol} не отменён: {result.get('retMsg')}")
+        except Exception as e:
+            logger.warning(f"[Positions] Ошибка отмены {leg['name']} {symbol}: {e}")
+
+    observe("bot_position_reaction_seconds", time.perf_counter() - received, action="close")
+    logger.info(f"[Positions] {symbol}: сопровождение для {trade['user_id']} завершено, отменено TP: {len(cancelled)}")
+    cancelled_info = f"\nОтменены: {', '.join(cancelled)}" if cancelled else ""
+    trade["bot"].send_message(trade["user_id"], f"{reason} {symbol}{cancelled_info}")
+
+
+def clear():
+    """Забывает все сделки"""
+    with _lock:
+        _trades.clear()
@@ -0,0 +1,164 @@
+"""
+Предварительная подготовка планов ордеров до наступления Result
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .config import TRADE_MAX_WORKERS
+from .trading import prepare_long, execute_long, long_token, to_symbol
+from .market_data import refresh_price, get_snapshot
+from .sizing import size_batch
+from .fills import open_stream
+from .utils import get_user_config
+
+logger = logging.getLogger(__name__)
+
+# Подготовленные планы: токен -> {user_id: план}
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+class _SilentBot:
+    """
+    Бот подготовки планов: сообщения об отказе не отправляются
+
+    Без плана вход в момент Result идёт полным циклом long_token и сам сообщает
+    пользователю причину, поэтому подготовка только логирует её, чтобы не дублировать.
+    """
+
+    def send_message(self, chat_id, text, **kwargs):
+        logger.info(f"[Prearm] План для {chat_id} не подготовлен: {text}")
+
+
+_silent_bot = _SilentBot()
+
+
+def _prepare_user(token, user_id, scope):
+    """Готовит план для одного пользователя, изолируя ошибки"""
+    try:
+        plan = prepare_long(token, user_id, _silent_bot, scope)
+    except Exception as e:
+        logger.error(f"[Prearm] Ошибка подготовки плана {token} для {user_id}: {e}", exc_info=True)
+        return None
+
+    # Поток ордеров открывается заранее: исполнение покупки придёт событием, без опроса
+    if plan:
+        try:
+            open_stream(plan["api_key"], get_user_config(user_id)["api_secret"])
+        except Exception as e:
+            logger.warning(f"[Prearm] Не удалось открыть поток ордеров для {user_id}: {e}")
+    return plan
+
+
+def arm_token(token, user_ids, scope=None):
+    """
+    Готовит планы ордеров для всех пользователей заранее
+
+    Проверяет ключи и баланс, получает параметры инструмента, устанавливает плечо,
+    прогревает HTTP соединение и открывает приватный поток ордеров,
+    чтобы в момент Result остались только ордера. Пользователям ничего не отправляется:
+    о причине отказа сообщит вход без плана.
+
+    Args:
+        token: Символ токена
+        user_ids: Список ID пользователей
+        scope: Область orderLinkId события (retry.event_scope)
+
+    Returns:
+        Количество подготовленных планов
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    # Один запрос цены на всех пользователей
+    try:
+        refresh_price(to_symbol(token))
+    except Exception as e:
+        logger.warning(f"[Prearm] Не удалось получить цену {token}: {e}")
+
+    workers = max(1, min(TRADE_MAX_WORKERS, len(user_ids)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prearm") as pool:
+        plans = list(pool.map(lambda user_id: _prepare_user(token, user_id, scope), user_ids))
+
+    armed = {user_id: plan for user_id, plan in zip(user_ids, plans) if plan}
+
+    with _plans_lock:
+        _plans[token] = armed
+
+    logger.info(f"[Prearm] {token}: подготовлено планов {len(armed)}/{len(user_ids)}")
+    return len(armed)
+
+
+def reprice_plans(token):
+    """
+    Пересчитывает подготовленные планы токена по текущему снимку цены одним проходом
+
+    Вызывается в момент Result после обновления снимка: execute_long получает планы
+    с актуальной ценой и не пересчитывает лестницу для каждого пользователя.
+
+    Returns:
+        Количество пересчитанных планов
+    """
+    price = get_snapshot(to_symbol(token))
+    if price is None:
+        return 0
+
+    with _plans_lock:
+        plans = _plans.get(token, {})
+        user_ids = [user_id for user_id, plan in plans.items() if plan["price"] != price]
+        if not user_ids:
+            return 0
+        # Инструмент у всех планов токена один и тот же
+        instrument = plans[user_ids[0]]["instrument"]
+        ladders = size_batch(price, instrument, [(plans[user_id]["leverage"], plans[user_id]["margin"]) for user_id in user_ids])
+        for user_id, ladder in zip(user_ids, ladders):
+            plans[user_id] = {**plans[user_id], **ladder}
+    return len(user_ids)
+
+
+def take_plan(token, user_id):
+    """Забирает подготовленный план пользователя (план используется один раз)"""
+    with _plans_lock:
+        return _plans.get(token, {}).pop(user_id, None)
+
+
+def drop_user_plans(user_id):
+    """
+    Удаляет планы пользователя по всем токенам
+
+    Вызывается при изменении конфигурации: план хранит сессию, ключи, плечо и маржу
+    на момент подготовки, и вход по нему торговал бы со старыми параметрами.
+
+    Returns:
+        Количество удалённых планов
+    """
+    with _plans_lock:
+        dropped = sum(1 for plans in _plans.values() if plans.pop(user_id, None) is not None)
+    if dropped:
+        logger.info(f"[Prearm] Планы пользователя {user_id} удалены после изменения настроек: {dropped}")
+    return dropped
+
+
+def discard_plans(token):
+    """Удаляет неиспользованные планы токена"""
+    with _plans_lock:
+        return _plans.pop(token, {})
+
+
+def enter_position(token, user_id, bot, timings=None, scope=None):
+    """
+    Открывает позицию по подготовленному плану, а если плана нет - полным циклом long_token
+
+    Сигнатура совместима с executor.run_for_users (scope передаётся через functools.partial).
+    """
+    plan = take_plan(token, user_id)
+    if plan is None:
+        long_token(token, user_id, bot, timings, scope)
+        return
+
+    try:
+        execute_long(plan, bot, timings)
+    except Exception as err:
+        logger.error(f"[Prearm] Ошибка исполнения плана {token} для {user_id}: {err}", exc_info=True)
+        bot.send_message(user_id, f"❌ Ошибка выполнения ордера для {token}: {str(err)}")
@@ -0,0 +1,57 @@
+"""
+Ограничение частоты запросов
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не более burst накопленных
+
+    Потокобезопасна. try_acquire не ждёт, а возвращает время до появления токена.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount=1.0, reserve=0.0):
+        """
+        Забирает токен, если он есть
+
+        Args:
+            amount: Сколько токенов забрать
+            reserve: Сколько токенов должно остаться после (запас для более важных запросов)
+
+        Returns:
+            0.0 - токен получен, иначе через сколько секунд он появится
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens - amount >= reserve:
+                self._tokens -= amount
+                return 0.0
+            return (amount + reserve - self._tokens) / self.rate
+
+    def acquire(self, amount=1.0, reserve=0.0):
+        """Забирает токен, при необходимости дожидаясь его"""
+        while True:
+            wait = self.try_acquire(amount, reserve)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def drain(self, seconds):
+        """Обнуляет корзину и откладывает пополнение на seconds (например, после ответа 429)"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = max(self._updated, time.monotonic() + seconds)
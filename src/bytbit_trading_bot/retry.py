@@ -0,0 +1,195 @@
+"""
+Идемпотентное размещение ордеров с повторными попытками
+
+Каждому ордеру назначается детерминированный orderLinkId по (пользователь, токен, нога),
+поэтому повторная отправка того же ордера не создаёт дубль: Bybit отклоняет её
+с кодом DUPLICATE_LINK_ID. Если попытка завершилась неизвестным исходом (таймаут,
+обрыв соединения), перед следующей проверяется, не дошёл ли ордер до биржи.
+Паузы между попытками растут экспоненциально со случайным разбросом и ограничены сверху,
+чтобы повтор одного пользователя надолго не занимал поток пула исполнения.
+"""
+import hashlib
+import logging
+import random
+import time
+import uuid
+from datetime import timezone
+from .config import RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_LINK_ID = 110072  # OrderLinkedID is duplicate - ордер с таким orderLinkId уже есть
+
+# Ошибки, которые повтор не исправит: ключи, права, IP и нехватка средств
+FATAL_CODES = {
+    10003,  # API key is invalid
+    10004,  # Error sign
+    10005,  # Permission denied
+    10007,  # User authentication failed
+    10010,  # Unmatched IP
+    33004,  # API key is expired
+    110004,  # Wallet balance is insufficient
+    110007,  # Available balance is insufficient
+    110012,  # Insufficient available balance
+}
+
+LINK_ID_LENGTH = 36  # Максимальная длина orderLinkId в Bybit
+
+
+def order_link_id(user_id, token_symbol, leg, scope=""):
+    """
+    Детерминированный orderLinkId для ноги ордера
+
+    Args:
+        user_id: ID пользователя Telegram
+        token_symbol: Символ инструмента
+        leg: Нога ордера (BUY, TP1, TP2, ...)
+        scope: Что отличает вход от других входов в тот же токен (см. event_scope)
+
+    Returns:
+        Строка вида <leg>-<hash> не длиннее LINK_ID_LENGTH
+    """
+    digest = hashlib.sha1(f"{user_id}:{token_symbol}:{leg}:{scope}".encode("utf-8")).hexdigest()
+    return f"{leg}-{digest}"[:LINK_ID_LENGTH]
+
+
+def event_scope(result_date=None):
+    """
+    Область orderLinkId для входа
+
+    Вход по событию получает область по времени Result: повторная обработка того же
+    анонса не откроет вторую позицию, а другое событие того же токена в тот же день
+    получит свои orderLinkId. Вход без события (None) получает уникальную область.
+    """
+    if result_date is None:
+        return uuid.uuid4().hex
+    if result_date.tzinfo is None:
+        result_date = result_date.replace(tzinfo=timezone.utc)
+    return result_date.astimezone(timezone.utc).strftime("%Y%m%d%H%M")
+
+
+def classify(ret_code):
+    """
+    Классифицирует retCode ответа Bybit
+
+    Returns:
+        "ok", "duplicate", "fatal" или "retry" (неизвестные коды повторяются)
+    """
+    if ret_code == 0:
+        return "ok"
+    if ret_code == DUPLICATE_LINK_ID:
+        return "duplicate"
+    if ret_code in FATAL_CODES:
+        return "fatal"
+    return "retry"
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Пауза перед попыткой attempt + 1: случайная в [0, min(cap, base * 2^attempt)]"""
+    base = RETRY_BASE_DELAY if base is None else base
+    cap = RETRY_MAX_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def find_order(session, symbol, link_id):
+    """
+    Ищет ордер по orderLinkId среди активных и в истории
+
+    Returns:
+        Словарь ордера Bybit или None, если ордер не найден или запрос не удался
+    """
+    for method in ("get_open_orders", "get_order_history"):
+        try:
+            response = getattr(session, method)(category="linear", symbol=symbol, orderLinkId=link_id)
+        except Exception as e:
+            logger.warning(f"[Retry] Ошибка поиска ордера {link_id} ({method}): {e}")
+            continue
+        if not isinstance(response, dict) or response.get("retCode") != 0:
+            continue
+        for order in response.get("result", {}).get("list", []):
+            if order.get("orderLinkId") == link_id:
+                return order
+    return None
+
+
+def exception_code(error):
+    """
+    retCode из исключения pybit: InvalidRequestError несёт retCode в status_code
+
+    Класс сравнивается по имени, чтобы не зависеть от импорта pybit.exceptions.
+    Остальные исключения (таймауты, обрывы, HTTP ошибки) - исход неизвестен, возвращается None.
+    """
+    if type(error).__name__ == "InvalidRequestError":
+        return getattr(error, "status_code", None)
+    return None
+
+
+def _already_placed(result, session, symbol, link_id):
+    """Результат для ордера, который биржа уже приняла (повтор отклонён как дубль orderLinkId)"""
+    existing = find_order(session, symbol, link_id)
+    return {**result, "ok": True, "error": None, "exception": False,
+            "order_id": existing.get("orderId") if existing else None}
+
+
+def place_order(session, link_id, max_attempts=3, **order):
+    """
+    Размещает ордер с orderLinkId, повторяя попытки при временных ошибках
+
+    Args:
+        session: HTTP сессия Bybit
+        link_id: orderLinkId (см. order_link_id); без него повтор после таймаута может создать дубль
+        max_attempts: Максимум попыток
+        **order: Параметры session.place_order
+
+    Returns:
+        Словарь {"ok", "order_id", "error", "attempts", "exception"}:
+        exception - последняя неудачная попытка завершилась исключением
+    """
+    symbol = order.get("symbol")
+    result = {"ok": False, "order_id": None, "error": None, "attempts": 0, "exception": False}
+    uncertain = False
+
+    for attempt in range(max_attempts):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1))
+
+        # Прошлая попытка могла дойти до биржи - не отправляем ордер повторно
+        if uncertain and link_id:
+            existing = find_order(session, symbol, link_id)
+            if existing is not None:
+                logger.info(f"[Retry] Ордер {link_id} уже размещён прошлой попыткой")
+                return {**result, "ok": True, "error": None, "exception": False, "order_id": existing.get("orderId")}
+
+        result["attempts"] = attempt + 1
+        try:
+            if link_id:
+                response = session.place_order(orderLinkId=link_id, **order)
+            else:
+                response = session.place_order(**order)
+        except Exception as e:
+            code = exception_code(e)
+            uncertain = code is None
+            result.update(error=str(e), exception=True)
+            logger.warning(f"[Retry] Попытка {attempt + 1} для {link_id} завершилась исключением: {e}")
+            kind = classify(code) if code is not None else "retry"
+            if kind == "duplicate":
+                return _already_placed(result, session, symbol, link_id)
+            if kind == "fatal":
+                return result
+            continue
+
+        uncertain = False
+        code = response.get("retCode")
+        kind = classify(code)
+        if kind == "ok":
+            return {**result, "ok": True, "error": None, "exception": False,
+                    "order_id": response.get("result", {}).get("orderId")}
+        if kind == "duplicate":
+            return _already_placed(result, session, symbol, link_id)
+
+        result.update(error=response.get("retMsg", "Unknown error"), exception=False)
+        logger.warning(f"[Retry] Попытка {attempt + 1} для {link_id} неудачна ({code}): {result['error']}")
+        if kind == "fatal":
+            return result
+
+    return result
@@ -2,11 +2,30 @@
 Планировщик задач
 """
 import logging
-from datetime import datetime, timedelta
+import time
+from functools import partial
+from datetime import datetime, timedelta, timezone
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
-from .utils import load_json, is_user_enabled, TOKENS_FILE, USERS_FILE
-from .trading import long_token
+from .utils import get_enabled_user_ids, get_upcoming_tokens, JOBS_FILE, METRICS_FILE
+from .executor import run_for_users
+from .instruments import refresh_instruments
+from .sessions import evict_idle
+from .fills import evict_idle as evict_idle_streams
+from .account import refresh_users as refresh_accounts
+from .market_data import refresh_price
+from .trading import to_symbol
+from .prearm import arm_token, enter_position, discard_plans, reprice_plans
+from .metrics import span, observe, write_textfile
+from .clock import wait_until, sync as sync_clock
+from .retry import event_scope
+from . import shards
+from .notifier import QueuedBot, PRIORITY_TRADE, PRIORITY_REMINDER
+from .config import (
+    PREARM_SECONDS, INSTRUMENTS_TTL, SESSION_IDLE_TIMEOUT, SCHEDULER_PERSISTENT, METRICS_EXPORT_INTERVAL,
+    ENTRY_MISFIRE_GRACE, REMINDER_MISFIRE_GRACE, ENTRY_LATE_WARNING, PRECISION_LEAD, CLOCK_SYNC_INTERVAL,
+    ACCOUNT_REFRESH_INTERVAL
+)
 from .bot import bot
 
 logger = logging.getLogger(__name__)
@@ -14,25 +33,64 @@ logger = logging.getLogger(__name__)
 scheduler = None
 
 
-def notify_all_enabled_users(token):
-    """Уведомляет всех включенных пользователей и открывает позиции"""
-    users = load_json(USERS_FILE)
+@span("prearm_token")
+def prearm_token(token, result_date=None):
+    """Заранее готовит планы ордеров для всех включенных пользователей"""
+    user_ids = get_enabled_user_ids()
+    logger.info(f"[Scheduler] Подготовка планов {token} для {len(user_ids)} пользователей")
+    # orderLinkId входа привязаны к событию, а не к календарному дню
+    scope = event_scope(result_date) if result_date is not None else None
+    # Свежее смещение часов к моменту входа
+    sync_clock()
+    if shards.is_running():
+        shards.prearm(token, user_ids, scope=scope)
+        return
+    arm_token(token, user_ids, scope=scope)
+
+
+@span("notify_all_enabled_users")
+def notify_all_enabled_users(token, result_date=None):
+    """
+    Уведомляет всех включенных пользователей и открывает позиции параллельно
+    
+    Задача срабатывает на PRECISION_LEAD сек раньше Result и дожидается его по часам биржи.
+    """
+    if result_date is not None:
+        if result_date.tzinfo is None:
+            result_date = result_date.replace(tzinfo=timezone.utc)
+        fire_error = wait_until(result_date)
+        observe("bot_trigger_lateness_seconds", max(fire_error, 0.0))
+        logger.info(f"[Scheduler] Вход в {token}: ошибка срабатывания {fire_error * 1000:+.1f} мс")
+        if fire_error > ENTRY_LATE_WARNING:
+            logger.warning(f"[Scheduler] Вход в {token} запущен с опозданием {fire_error:.1f} сек")
+    trigger_time = time.monotonic()
+    user_ids = get_enabled_user_ids()
+    scope = event_scope(result_date) if result_date is not None else None
+    logger.info(f"[Scheduler] Открытие позиций {token} для {len(user_ids)} пользователей")
+    
+    # Режим шардов: каждый процесс сам берёт снимок цены и исполняет своих пользователей
+    if shards.is_running():
+        return shards.enter(token, user_ids, QueuedBot(bot, PRIORITY_TRADE), trigger_time=trigger_time, scope=scope)
+    
+    # Общий снимок цены: объёмы и TP/SL всех планов пересчитываются от него одним проходом
+    try:
+        refresh_price(to_symbol(token))
+        reprice_plans(token)
+    except Exception as e:
+        logger.warning(f"[Scheduler] Не удалось обновить цену и планы {token}: {e}")
     
-    for user_id_str, user_config in users.items():
-        user_id = int(user_id_str)
-        if is_user_enabled(user_id):
-            try:
-                long_token(token, user_id, bot)
-            except Exception as e:
-                logger.error(f"[Scheduler] Ошибка открытия позиции для {user_id}: {e}", exc_info=True)
+    try:
+        # Сообщения только ставятся в очередь, Telegram не задерживает исполнение
+        return run_for_users(partial(enter_position, scope=scope), token, user_ids, QueuedBot(bot, PRIORITY_TRADE),
+                             trigger_time=trigger_time)
+    finally:
+        # Планы отключившихся пользователей не должны дожить до следующего события
+        discard_plans(token)
 
 
 def notify_reminder(token, result_date):
     """Отправляет напоминание всем включенным пользователям за день до события"""
-    users = load_json(USERS_FILE)
-    
     import pytz
-    from datetime import timezone
     tz_moscow = pytz.timezone("Europe/Moscow")
     if result_date.tzinfo is None:
         result_date_display = tz_moscow.localize(result_date)
@@ -47,17 +105,20 @@ def notify_reminder(token, result_date):
         f"Бот автоматически откроет позицию в указанное время."
     )
     
-    for user_id_str, user_config in users.items():
-        user_id = int(user_id_str)
-        if is_user_enabled(user_id):
-            try:
-                bot.send_message(user_id, message_text, parse_mode='Markdown')
-            except Exception as e:
-                logger.error(f"[Scheduler] Ошибка отправки напоминания пользователю {user_id}: {e}", exc_info=True)
+    notifier_bot = QueuedBot(bot, PRIORITY_REMINDER)
+    for user_id in get_enabled_user_ids():
+        try:
+            notifier_bot.send_message(user_id, message_text, parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"[Scheduler] Ошибка отправки напоминания пользователю {user_id}: {e}", exc_info=True)
 
 
+@span("schedule_token")
 def schedule_token(token, result_date):
-    """Планирует открытие позиции для токена и напоминание за день до события"""
+    """
+    Планирует открытие позиции для токена, подготовку планов за PREARM_SECONDS
+    и напоминание за день до события
+    """
     global scheduler
     
     if scheduler is None:
@@ -66,47 +127,151 @@ def schedule_token(token, result_date):
     
     scheduler.add_job(
         notify_all_enabled_users,
-        trigger=DateTrigger(run_date=result_date),
-        args=[token],
+        trigger=DateTrigger(run_date=result_date - timedelta(seconds=PRECISION_LEAD)),
+        args=[token, result_date],
         id=f"token_{token}_{result_date.isoformat()}",
+        misfire_grace_time=ENTRY_MISFIRE_GRACE,
+        coalesce=True,
         replace_existing=True
     )
     
-    reminder_date = result_date - timedelta(days=1)
-    from datetime import timezone
     now = datetime.now(result_date.tzinfo if result_date.tzinfo else timezone.utc)
     
+    prearm_date = result_date - timedelta(seconds=PREARM_SECONDS)
+    if PREARM_SECONDS > 0 and prearm_date > now:
+        scheduler.add_job(
+            prearm_token,
+            trigger=DateTrigger(run_date=prearm_date),
+            args=[token, result_date],
+            id=f"prearm_{token}_{result_date.isoformat()}",
+            # Опоздавшая подготовка ещё полезна, пока не наступил сам Result
+            misfire_grace_time=PREARM_SECONDS,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    reminder_date = result_date - timedelta(days=1)
+    
     if reminder_date > now:
         scheduler.add_job(
             notify_reminder,
             trigger=DateTrigger(run_date=reminder_date),
             args=[token, result_date],
             id=f"reminder_{token}_{result_date.isoformat()}",
+            misfire_grace_time=REMINDER_MISFIRE_GRACE,
+            coalesce=True,
             replace_existing=True
         )
 
 
+def _log_missed_job(event):
+    """Логирует задачу, пропущенную из-за простоя дольше misfire_grace_time"""
+    logger.error(f"[Scheduler] Задача {event.job_id} пропущена (плановое время {event.scheduled_run_time})")
+
+
+def _create_jobstores():
+    """
+    Хранилища задач: события токенов в SQLite (если включено), периодические задачи в памяти
+    """
+    from apscheduler.jobstores.memory import MemoryJobStore
+    
+    jobstores = {"memory": MemoryJobStore()}
+    if SCHEDULER_PERSISTENT:
+        from .jobstore import SQLiteJobStore
+        jobstores["default"] = SQLiteJobStore(JOBS_FILE)
+    return jobstores
+
+
 def start_scheduler():
-    """Запускает планировщик"""
+    """
+    Запускает планировщик
+    
+    При постоянном хранилище задачи восстанавливаются из базы, а tokens.json
+    просматривается только если сохранённых задач нет (первый запуск).
+    """
     global scheduler
     
     if scheduler is None:
-        scheduler = BackgroundScheduler()
+        from apscheduler.events import EVENT_JOB_MISSED
+        
+        scheduler = BackgroundScheduler(
+            jobstores=_create_jobstores(),
+            job_defaults={"coalesce": True, "misfire_grace_time": ENTRY_MISFIRE_GRACE}
+        )
+        scheduler.add_listener(_log_missed_job, EVENT_JOB_MISSED)
         scheduler.start()
         logger.info("[Scheduler] Планировщик запущен")
+        
+        # Кэш инструментов загружается сразу и обновляется в фоне
+        scheduler.add_job(
+            refresh_instruments,
+            trigger="interval",
+            seconds=INSTRUMENTS_TTL,
+            next_run_time=datetime.now(),
+            id="instruments_refresh",
+            jobstore="memory",
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            evict_idle,
+            trigger="interval",
+            seconds=SESSION_IDLE_TIMEOUT,
+            id="sessions_evict_idle",
+            jobstore="memory",
+            replace_existing=True
+        )
+        
+        # Смещение часов относительно Bybit для точного входа
+        scheduler.add_job(
+            sync_clock,
+            trigger="interval",
+            seconds=CLOCK_SYNC_INTERVAL,
+            next_run_time=datetime.now(),
+            id="clock_sync",
+            jobstore="memory",
+            replace_existing=True
+        )
+        
+        # Балансы включенных пользователей: проверка при входе и /balance читают их из кэша
+        scheduler.add_job(
+            refresh_accounts,
+            trigger="interval",
+            seconds=ACCOUNT_REFRESH_INTERVAL,
+            next_run_time=datetime.now(),
+            id="accounts_refresh",
+            jobstore="memory",
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            write_textfile,
+            trigger="interval",
+            seconds=METRICS_EXPORT_INTERVAL,
+            args=[METRICS_FILE],
+            id="metrics_export",
+            jobstore="memory",
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            evict_idle_streams,
+            trigger="interval",
+            seconds=SESSION_IDLE_TIMEOUT,
+            id="fill_streams_evict_idle",
+            jobstore="memory",
+            replace_existing=True
+        )
     
-    tokens = load_json(TOKENS_FILE)
+    if SCHEDULER_PERSISTENT:
+        restored = scheduler.get_jobs(jobstore="default")
+        if restored:
+            logger.info(f"[Scheduler] Восстановлено задач из хранилища: {len(restored)}")
+            return
     
-    for token_key, token_data in tokens.items():
+    for token_key, token_data in get_upcoming_tokens():
         try:
-            result_datetime_str = token_data.get("result_datetime")
-            if result_datetime_str:
-                result_date = datetime.fromisoformat(result_datetime_str)
-                from datetime import timezone
-                now = datetime.now(result_date.tzinfo if result_date.tzinfo else timezone.utc)
-                if result_date > now:
-                    token = token_data.get("token")
-                    schedule_token(token, result_date)
+            result_date = datetime.fromisoformat(token_data["result_datetime"])
+            schedule_token(token_data.get("token"), result_date)
         except Exception as e:
             logger.error(f"[Scheduler] Ошибка планирования токена {token_key}: {e}", exc_info=True)
-
@@ -0,0 +1,117 @@
+"""
+Реестр постоянных HTTP сессий Bybit с пулом соединений
+"""
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from pybit.unified_trading import HTTP
+from .config import SESSION_POOL_SIZE, SESSION_IDLE_TIMEOUT, BYBIT_ENDPOINT
+from .metrics import TracedSession
+from .limiter import LimitedSession
+
+logger = logging.getLogger(__name__)
+
+# (api_key, testnet) -> {"session", "api_secret", "last_used"}
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _configure_pool(session):
+    """Настраивает пул keep-alive соединений у requests-клиента pybit"""
+    client = getattr(session, "client", None)
+    if not isinstance(client, requests.Session):
+        return
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SESSION_POOL_SIZE)
+    client.mount("https://", adapter)
+    client.mount("http://", adapter)
+
+
+def _close(session):
+    """Закрывает соединения сессии"""
+    client = getattr(session, "client", None)
+    if isinstance(client, requests.Session):
+        client.close()
+
+
+def get_session(api_key=None, api_secret=None, testnet=False):
+    """
+    Возвращает постоянную сессию для ключа, создавая её при первом обращении
+
+    Повторные вызовы используют уже открытые соединения (keep-alive),
+    поэтому TLS-рукопожатие не повторяется на каждом запросе.
+
+    Args:
+        api_key: API ключ (None - публичная сессия)
+        api_secret: API секрет
+        testnet: Использовать тестовую сеть
+    """
+    key = (api_key, testnet)
+
+    with _lock:
+        entry = _sessions.get(key)
+        if entry is not None and entry["api_secret"] == api_secret:
+            entry["last_used"] = time.monotonic()
+            return entry["session"]
+
+    if api_key:
+        session = HTTP(testnet=testnet, api_key=api_key, api_secret=api_secret)
+    else:
+        session = HTTP(testnet=testnet)
+    if BYBIT_ENDPOINT:
+        session.endpoint = BYBIT_ENDPOINT
+    _configure_pool(session)
+    # Каждый REST вызов замеряется спаном rest{method} и проходит через лимиты ключа и IP
+    session = LimitedSession(TracedSession(session), api_key)
+
+    with _lock:
+        replaced = _sessions.get(key)
+        _sessions[key] = {"session": session, "api_secret": api_secret, "last_used": time.monotonic()}
+
+    if replaced is not None:
+        _close(replaced["session"])
+    return session
+
+
+def invalidate(api_key):
+    """Удаляет сессии ключа (например, после смены ключей через /set_api)"""
+    with _lock:
+        keys = [key for key in _sessions if key[0] == api_key]
+        removed = [_sessions.pop(key) for key in keys]
+
+    for entry in removed:
+        _close(entry["session"])
+    if removed:
+        logger.info(f"[Sessions] Сессии ключа {str(api_key)[:4]}*** удалены")
+
+
+def evict_idle(max_idle=None):
+    """
+    Закрывает сессии, не использовавшиеся дольше max_idle секунд
+
+    Returns:
+        Количество закрытых сессий
+    """
+    max_idle = SESSION_IDLE_TIMEOUT if max_idle is None else max_idle
+    now = time.monotonic()
+
+    with _lock:
+        keys = [key for key, entry in _sessions.items() if now - entry["last_used"] > max_idle]
+        removed = [_sessions.pop(key) for key in keys]
+
+    for entry in removed:
+        _close(entry["session"])
+    if removed:
+        logger.info(f"[Sessions] Закрыто неактивных сессий: {len(removed)}")
+    return len(removed)
+
+
+def clear():
+    """Закрывает все сессии"""
+    with _lock:
+        removed = list(_sessions.values())
+        _sessions.clear()
+
+    for entry in removed:
+        _close(entry["session"])
@@ -0,0 +1,333 @@
+"""
+Шардированное исполнение входов в отдельных процессах
+
+Включённые пользователи делятся между TRADE_WORKER_PROCESSES процессами по user_id % N.
+Каждый шард держит свои HTTP сессии, кэши инструментов и цен, потоки ордеров
+и подготовленные планы, поэтому входы разных шардов не делят один GIL.
+Координатор (основной процесс с Telethon, Telebot и планировщиком) рассылает
+команду всем шардам одновременно и собирает результаты.
+
+Пользователей хранит и меняет только координатор: каждая команда несёт текущие
+конфигурации своих пользователей, и шард применяет их перед исполнением.
+Сессии, кэш счёта и поток сменённых ключей в шарде закрываются.
+
+Спаны шарда (вход, REST вызовы, реакции на события позиций) раз в METRICS_EXPORT_INTERVAL
+отправляются координатору снимком гистограмм и попадают в его экспорт метрик.
+"""
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from .config import (
+    TRADE_WORKER_PROCESSES, SHARD_RESULT_TIMEOUT, SHARD_COMMAND_THREADS, SESSION_IDLE_TIMEOUT, NOTIFY_GLOBAL_RATE,
+    BYBIT_IP_RATE, BYBIT_IP_BURST, METRICS_EXPORT_INTERVAL
+)
+from .executor import run_for_users, log_latency_summary
+from .prearm import arm_token, enter_position, discard_plans, reprice_plans, drop_user_plans
+from .market_data import refresh_price
+from .trading import to_symbol
+from .utils import get_user_config, update_users_cache
+from .sessions import evict_idle, invalidate as invalidate_session
+from .fills import evict_idle as evict_idle_streams, close_stream
+from .account import invalidate as invalidate_account
+from . import limiter, metrics
+
+logger = logging.getLogger(__name__)
+
+# Шарды: [{"process", "commands"}], общая очередь результатов и ожидающие ответа запросы
+_workers = []
+_results = None
+_reader = None
+_pending = {}  # id запроса -> {индекс шарда: (результат, ошибка)}
+_lock = threading.Lock()
+_replied = threading.Condition(_lock)
+_sequence = itertools.count()
+
+
+def shard_of(user_id, count):
+    """Номер шарда пользователя"""
+    return int(user_id) % count
+
+
+def _sync_users(configs):
+    """
+    Применяет конфигурации пользователей от координатора
+
+    Args:
+        configs: user_id (str) -> конфигурация
+
+    Returns:
+        ID пользователей, чья конфигурация изменилась
+    """
+    changed = update_users_cache(configs)
+    for user_id, previous in changed.items():
+        old_key = previous.get("api_key")
+        config = configs[user_id]
+        if old_key and (old_key, previous.get("api_secret")) != (config.get("api_key"), config.get("api_secret")):
+            # Ключи сменили через /set_api в координаторе
+            invalidate_session(old_key)
+            close_stream(old_key)
+            invalidate_account(old_key)
+    if changed:
+        logger.info(f"[Shards] Обновлены конфигурации пользователей: {len(changed)}")
+    return [int(user_id) for user_id in changed]
+
+
+def _handle(command, bot):
+    """Исполняет команду координатора для пользователей шарда"""
+    token = command["token"]
+    user_ids = command["user_ids"]
+
+    # План, подготовленный со старыми ключами, плечом или маржой, не используется
+    for user_id in _sync_users(command.get("users", {})):
+        drop_user_plans(user_id)
+
+    if command["kind"] == "prearm":
+        return arm_token(token, user_ids, scope=command.get("scope"))
+
+    # Цена запрашивается один раз на шард, планы его пользователей пересчитываются от неё одним проходом
+    try:
+        refresh_price(to_symbol(token))
+        reprice_plans(token)
+    except Exception as e:
+        logger.warning(f"[Shards] Не удалось обновить цену и планы {token}: {e}")
+    try:
+        return run_for_users(partial(enter_position, scope=command.get("scope")), token, user_ids, bot,
+                             trigger_time=command["trigger_time"], log_summary=False)
+    finally:
+        discard_plans(token)
+
+
+def _run_command(command, bot, results, index):
+    try:
+        results.put((command["id"], index, _handle(command, bot), None))
+    except Exception as e:
+        logger.error(f"[Shards] Ошибка команды {command['kind']} {command['token']}: {e}", exc_info=True)
+        results.put((command["id"], index, None, str(e)))
+
+
+def _serve(index, commands, results, bot):
+    """Цикл шарда: команды исполняются в пуле, в паузах закрываются простаивающие сессии"""
+    with ThreadPoolExecutor(max_workers=SHARD_COMMAND_THREADS, thread_name_prefix=f"shard{index}") as pool:
+        while True:
+            try:
+                command = commands.get(timeout=SESSION_IDLE_TIMEOUT)
+            except queue.Empty:
+                evict_idle()
+                evict_idle_streams()
+                continue
+            if command is None:
+                return
+            pool.submit(_run_command, command, bot, results, index)
+
+
+def _export_metrics(index, results, stopped):
+    """Отправляет координатору снимок гистограмм шарда (request_id None - не ответ на команду)"""
+    while not stopped.wait(METRICS_EXPORT_INTERVAL):
+        results.put((None, index, metrics.snapshot(), None))
+
+
+def _worker_main(index, count, commands, results):
+    """Точка входа процесса-шарда"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - shard{index} - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from . import notifier
+    from .notifier import QueuedBot, PRIORITY_TRADE
+    from .bot import bot
+
+    # Лимит Telegram общий на бота, а лимит Bybit - на IP: делим их между шардами
+    notifier.start(global_rate=NOTIFY_GLOBAL_RATE / count)
+    limiter.configure(ip_rate=BYBIT_IP_RATE / count, ip_burst=BYBIT_IP_BURST / count)
+    stopped = threading.Event()
+    threading.Thread(target=_export_metrics, args=(index, results, stopped), name="shard-metrics", daemon=True).start()
+    logger.info(f"[Shards] Шард {index}/{count} запущен")
+    try:
+        _serve(index, commands, results, QueuedBot(bot, PRIORITY_TRADE))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        notifier.stop()
+
+
+def _read_results():
+    while True:
+        item = _results.get()
+        if item is None:
+            return
+        request_id, index, value, error = item
+        if request_id is None:
+            metrics.merge(f"shard{index}", value)
+            continue
+        with _replied:
+            replies = _pending.get(request_id)
+            if replies is not None:
+                replies[index] = (value, error)
+                _replied.notify_all()
+
+
+def _attach(workers, results):
+    """Подключает координатор к запущенным шардам"""
+    global _workers, _results, _reader
+
+    _workers = workers
+    _results = results
+    _reader = threading.Thread(target=_read_results, name="shard-results", daemon=True)
+    _reader.start()
+
+
+def start(count=None):
+    """
+    Запускает процессы-шарды
+
+    Процессы создаются через spawn: fork процесса с уже запущенными потоками небезопасен.
+
+    Returns:
+        Количество шардов (0 - режим шардов отключён)
+    """
+    count = TRADE_WORKER_PROCESSES if count is None else count
+    if count <= 0 or is_running():
+        return len(_workers)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = []
+    for index in range(count):
+        commands = context.Queue()
+        process = context.Process(
+            target=_worker_main,
+            args=(index, count, commands, results),
+            name=f"trade-shard-{index}",
+            daemon=True
+        )
+        process.start()
+        workers.append({"process": process, "commands": commands})
+
+    _attach(workers, results)
+    logger.info(f"[Shards] Запущено процессов-шардов: {count}")
+    return count
+
+
+def is_running():
+    """Включён ли режим шардов"""
+    return bool(_workers)
+
+
+def _dispatch(kind, token, user_ids, bot, **extra):
+    """
+    Рассылает команду шардам и ждёт ответов не дольше SHARD_RESULT_TIMEOUT
+
+    Пользователи упавшего шарда обслуживаются в основном процессе.
+
+    Returns:
+        Словарь {индекс шарда: (результат, ошибка)}, без ответа - нет в словаре
+    """
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(shard_of(user_id, len(_workers)), []).append(user_id)
+
+    request_id = next(_sequence)
+    with _replied:
+        _pending[request_id] = {}
+
+    local = {}
+    for index, group in groups.items():
+        command = {
+            "id": request_id, "kind": kind, "token": token, "user_ids": group,
+            "users": {str(user_id): get_user_config(user_id) for user_id in group}, **extra
+        }
+        worker = _workers[index]
+        if worker["process"].is_alive():
+            worker["commands"].put(command)
+        else:
+            logger.error(f"[Shards] Шард {index} не работает, {len(group)} пользователей обслуживаются в основном процессе")
+            local[index] = command
+
+    replies = {}
+    for index, command in local.items():
+        try:
+            replies[index] = (_handle(command, bot), None)
+        except Exception as e:
+            replies[index] = (None, str(e))
+
+    deadline = time.monotonic() + SHARD_RESULT_TIMEOUT
+    with _replied:
+        received = _pending[request_id]
+        while len(received) + len(local) < len(groups):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _replied.wait(remaining)
+        del _pending[request_id]
+    replies.update(received)
+
+    for index in groups:
+        if index not in replies:
+            logger.error(f"[Shards] Шард {index} не ответил на {kind} {token} за {SHARD_RESULT_TIMEOUT} сек")
+        elif replies[index][1]:
+            logger.error(f"[Shards] Шард {index}: ошибка {kind} {token}: {replies[index][1]}")
+    return replies
+
+
+def prearm(token, user_ids, scope=None):
+    """
+    Готовит планы ордеров в шардах пользователей
+
+    Returns:
+        Количество подготовленных планов
+    """
+    replies = _dispatch("prearm", token, list(user_ids), None, scope=scope)
+    return sum(value or 0 for value, _ in replies.values())
+
+
+def enter(token, user_ids, bot, trigger_time=None, scope=None):
+    """
+    Открывает позиции во всех шардах одновременно
+
+    Args:
+        token: Символ токена
+        user_ids: Список ID пользователей
+        bot: Бот для пользователей упавших шардов (исполняются в основном процессе)
+        trigger_time: Момент срабатывания по time.monotonic() (часы общие для процессов)
+        scope: Область orderLinkId события (retry.event_scope)
+
+    Returns:
+        Результаты run_for_users всех шардов в порядке user_ids
+    """
+    user_ids = list(user_ids)
+    if trigger_time is None:
+        trigger_time = time.monotonic()
+
+    replies = _dispatch("enter", token, user_ids, bot, trigger_time=trigger_time, scope=scope)
+
+    by_user = {}
+    for value, _ in replies.values():
+        for result in value or []:
+            by_user[result["user_id"]] = result
+    results = [
+        by_user.get(user_id, {"user_id": user_id, "ok": False, "latency": None, "error": "Шард не ответил"})
+        for user_id in user_ids
+    ]
+
+    log_latency_summary(token, results)
+    return results
+
+
+def stop(timeout=5.0):
+    """Останавливает шарды"""
+    global _workers
+
+    for worker in _workers:
+        worker["commands"].put(None)
+    for worker in _workers:
+        worker["process"].join(timeout)
+    if _results is not None:
+        _results.put(None)
+    _workers = []
@@ -0,0 +1,81 @@
+"""
+Расчёт объёмов и цен TP/SL для всех пользователей за один проход
+
+Опорная цена, шаги инструмента и проценты лестницы переводятся в точные рациональные
+коэффициенты один раз на событие. Для каждого пользователя остаётся целочисленная
+арифметика: плечо и маржа масштабируются до целых (USER_SCALE), объёмы считаются
+в шагах qty_step, цены - в шагах tick_size. Результат совпадает с округлением вниз
+через Decimal (utils.round_to_*), но без ошибок float в промежуточных значениях.
+"""
+from decimal import Decimal
+from .config import TP_LEVELS, STOP_LOSS_PCT, BUY_PCT
+
+# Плечо и маржа пользователей переводятся в целые с точностью до 10^-6
+USER_SCALE = 10 ** 6
+
+
+def _ratio(value):
+    """Точная дробь (числитель, знаменатель) для десятичной записи числа"""
+    return Decimal(str(value)).as_integer_ratio()
+
+
+def _floor_price(price, pct, step):
+    """Цена price * (1 + pct / 100), округлённая вниз до шага step"""
+    price_n, price_d = price
+    pct_n, pct_d = _ratio(100 + pct)
+    step_n, step_d = step
+    ticks = (price_n * pct_n * step_d) // (price_d * pct_d * 100 * step_n)
+    return ticks * step_n / step_d
+
+
+def size_batch(price, instrument, accounts):
+    """
+    Рассчитывает лестницу ордеров для всех пользователей от одной опорной цены
+
+    Args:
+        price: Опорная цена
+        instrument: Параметры инструмента (tick_size, qty_step)
+        accounts: Список (плечо, маржа) пользователей
+
+    Returns:
+        Список словарей в порядке accounts: price, qty, buy_qty, sl, tp_levels ({name, price, qty})
+        и ключи tp1, tp1_qty, tp2, tp2_qty... для каждого уровня TP_LEVELS
+    """
+    tick = _ratio(instrument["tick_size"])
+    step_n, step_d = _ratio(instrument["qty_step"])
+    if not tick[0] or not step_n:
+        raise ValueError(f"Нулевой шаг цены или объёма: {instrument}")
+
+    price_ratio = _ratio(price)
+    price_n, price_d = price_ratio
+
+    # Цены одинаковы для всех пользователей
+    sl = _floor_price(price_ratio, -STOP_LOSS_PCT, tick)
+    tp_prices = [_floor_price(price_ratio, tp_pct, tick) for tp_pct, _ in TP_LEVELS]
+
+    # qty_steps = floor(плечо * маржа / (цена * qty_step)) в целых с учётом USER_SCALE
+    qty_n = price_d * step_d
+    qty_d = USER_SCALE * USER_SCALE * price_n * step_n
+    buy_n, buy_d = _ratio(BUY_PCT / 100)
+    shares = [_ratio(share_pct / 100) for _, share_pct in TP_LEVELS]
+    names = [f"TP{index}" for index in range(1, len(TP_LEVELS) + 1)]
+
+    ladders = []
+    for leverage, margin in accounts:
+        qty_steps = round(leverage * USER_SCALE) * round(margin * USER_SCALE) * qty_n // qty_d
+        buy_steps = qty_steps * buy_n // buy_d
+
+        ladder = {
+            "price": price,
+            "qty": qty_steps * step_n / step_d,
+            "buy_qty": buy_steps * step_n / step_d,
+            "sl": sl,
+            "tp_levels": [],
+        }
+        for index, (name, tp_price, (share_n, share_d)) in enumerate(zip(names, tp_prices, shares), start=1):
+            tp_qty = (buy_steps * share_n // share_d) * step_n / step_d
+            ladder["tp_levels"].append({"name": name, "price": tp_price, "qty": tp_qty})
+            ladder[f"tp{index}"] = tp_price
+            ladder[f"tp{index}_qty"] = tp_qty
+        ladders.append(ladder)
+    return ladders
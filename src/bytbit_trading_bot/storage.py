@@ -0,0 +1,146 @@
+"""
+SQLite хранилище пользователей и токенов
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    enabled INTEGER NOT NULL DEFAULT 0,
+    config TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tokens (
+    token_key TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    result_datetime TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tokens_result_datetime ON tokens (result_datetime);
+"""
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def connect(db_path):
+    """Возвращает общее соединение с базой, создавая схему при первом обращении"""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            _connections[db_path] = conn
+        return conn
+
+
+def close_all():
+    """Закрывает все соединения"""
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+def load_users(db_path):
+    """Загружает всех пользователей: user_id (str) -> конфигурация"""
+    conn = connect(db_path)
+    with _lock:
+        rows = conn.execute("SELECT user_id, config FROM users").fetchall()
+    return {user_id: json.loads(config) for user_id, config in rows}
+
+
+def _user_rows(users):
+    return [
+        (str(user_id), 1 if config.get("enabled", False) else 0, json.dumps(config, ensure_ascii=False))
+        for user_id, config in users.items()
+    ]
+
+
+_UPSERT_USER = (
+    "INSERT INTO users (user_id, enabled, config) VALUES (?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET enabled = excluded.enabled, config = excluded.config"
+)
+
+
+def save_users(db_path, users):
+    """Сохраняет несколько пользователей одной транзакцией"""
+    conn = connect(db_path)
+    rows = _user_rows(users)
+    with _lock:
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(_UPSERT_USER, rows)
+
+
+def replace_users(db_path, users):
+    """Заменяет всех пользователей одной транзакцией (при сбое остаются прежние)"""
+    conn = connect(db_path)
+    rows = _user_rows(users)
+    with _lock:
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM users")
+            conn.executemany(_UPSERT_USER, rows)
+
+
+def load_tokens(db_path):
+    """Загружает все токены: token_key -> данные"""
+    conn = connect(db_path)
+    with _lock:
+        rows = conn.execute("SELECT token_key, data FROM tokens").fetchall()
+    return {token_key: json.loads(data) for token_key, data in rows}
+
+
+def add_tokens(db_path, tokens):
+    """
+    Добавляет токены, пропуская уже существующие
+
+    Returns:
+        Список ключей фактически добавленных токенов
+    """
+    conn = connect(db_path)
+    added = []
+    with _lock:
+        with conn:
+            conn.execute("BEGIN")
+            for token_key, data in tokens.items():
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO tokens (token_key, token, result_datetime, data) VALUES (?, ?, ?, ?)",
+                    (token_key, data.get("token", ""), data.get("result_datetime"), json.dumps(data, ensure_ascii=False)),
+                )
+                if cursor.rowcount:
+                    added.append(token_key)
+    return added
+
+
+def get_upcoming_tokens(db_path, after_iso):
+    """
+    Возвращает токены с result_datetime позже after_iso, отсортированные по дате (по индексу)
+
+    Returns:
+        Список пар (token_key, данные)
+    """
+    conn = connect(db_path)
+    with _lock:
+        rows = conn.execute(
+            "SELECT token_key, data FROM tokens WHERE result_datetime > ? ORDER BY result_datetime",
+            (after_iso,),
+        ).fetchall()
+    return [(token_key, json.loads(data)) for token_key, data in rows]
+
+
+def count_tokens(db_path):
+    """Возвращает количество токенов"""
+    conn = connect(db_path)
+    with _lock:
+        return conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
@@ -3,14 +3,21 @@
 """
 import logging
 import time
-from pybit.unified_trading import HTTP
-from .utils import get_user_config, round_to_tick_size, round_to_qty_step
-from .config import TP1_PCT, TP2_PCT, STOP_LOSS_PCT, BUY_PCT
+from . import retry
+from .utils import get_user_config
+from .sizing import size_batch
+from .sessions import get_session
+from .instruments import get_instrument
+from .market_data import get_last_price, get_snapshot
+from .fills import has_stream, wait_for_fill, open_stream_in_background
+from .positions import track as track_trade, drop_legs as drop_trade_legs, untrack as untrack_trade
+from .account import get_wallet, refresh_wallet, ensure_leverage
+from .metrics import span
 
 logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
-RETRY_DELAY = 2
+BATCH_ORDER_LIMIT = 10  # Максимум ордеров в одном запросе place_batch_order
 
 
 def get_balance(user_id, bot):
@@ -31,17 +38,10 @@ def get_balance(user_id, bot):
         api_key = user_config["api_key"]
         api_secret = user_config["api_secret"]
         
-        session = HTTP(
-            testnet=False,
-            api_key=api_key,
-            api_secret=api_secret,
-        )
+        session = get_session(api_key, api_secret)
         
-        # Получаем баланс Unified Trading Account
-        balance_response = session.get_wallet_balance(
-            accountType="UNIFIED",
-            coin="USDT",
-        )
+        # Баланс Unified Trading Account из кэша состояния счёта (при устаревании - запросом)
+        balance_response = get_wallet(api_key, session)
         
         if balance_response.get("retCode") != 0:
             error_msg = balance_response.get("retMsg", "Unknown error")
@@ -112,192 +112,325 @@ def get_balance(user_id, bot):
         bot.send_message(user_id, f"❌ Ошибка получения баланса: {str(err)}")
 
 
-def long_token(token, user_id, bot):
+def to_symbol(token):
+    """Формирует символ токена (добавляет USDT если его нет)"""
+    token = token.upper()
+    if token.endswith("USDT"):
+        return token
+    return f"{token}USDT"
+
+
+def build_ladder(price, leverage, margin, instrument):
     """
-    Открывает длинную позицию по токену
+    Рассчитывает объёмы и цены TP/SL от опорной цены для одного пользователя
     
     Args:
-        token: Символ токена (например, LAUSDT)
-        user_id: ID пользователя Telegram
-        bot: Экземпляр Telegram бота
+        price: Опорная цена
+        leverage: Плечо
+        margin: Маржа в USDT
+        instrument: Параметры инструмента (tick_size, qty_step)
+        
+    Returns:
+        Словарь с price, qty, buy_qty, sl, списком tp_levels ({name, price, qty})
+        и ключами tp1, tp1_qty, tp2, tp2_qty... для каждого уровня TP_LEVELS
     """
-    try:
-        user_config = get_user_config(user_id)
-        
-        if not user_config.get("api_key") or not user_config.get("api_secret"):
-            bot.send_message(user_id, "❌ Не настроены API ключи Bybit")
-            return
-        
-        api_key = user_config["api_key"]
-        api_secret = user_config["api_secret"]
-        leverage = float(user_config.get("leverage", 10))
-        margin = float(user_config.get("margin", 20))
-        
-        session = HTTP(
-            testnet=False,
-            api_key=api_key,
-            api_secret=api_secret,
-        )
-        
-        # Формируем символ токена (добавляем USDT если его нет)
-        token = token.upper()
-        if token.endswith("USDT"):
-            token_symbol = token
-        else:
-            token_symbol = f"{token}USDT"
-        
-        # Получаем информацию об инструменте
-        instrument_info = session.get_instruments_info(
-            category="linear",
-            symbol=token_symbol,
-        )
-        
-        if instrument_info.get("retCode") != 0:
-            bot.send_message(user_id, f"❌ Ошибка получения информации об инструменте: {instrument_info.get('retMsg')}")
-            return
-        
-        result = instrument_info.get("result", {})
-        if not result.get("list"):
-            bot.send_message(user_id, f"❌ Инструмент {token_symbol} не найден")
-            return
-        
-        instrument = result["list"][0]
-        tick_size = float(instrument.get("tickSize", "0.01"))
-        qty_step = float(instrument.get("lotSizeFilter", {}).get("qtyStep", "1"))
-        min_qty = float(instrument.get("lotSizeFilter", {}).get("minQty", "1"))
-        
-        # Получаем текущую цену
-        ticker = session.get_tickers(
+    return size_batch(price, instrument, [(leverage, margin)])[0]
+
+
+def _place_tp_sequential(session, token_symbol, legs):
+    """Размещает TP ордера по одному (запасной путь, если batch запрос не прошёл)"""
+    results = []
+    for leg in legs:
+        order = retry.place_order(
+            session,
+            leg.get("link_id"),
+            max_attempts=1,
             category="linear",
             symbol=token_symbol,
+            side="Sell",
+            orderType="Limit",
+            qty=str(round(leg["qty"], 0)),
+            price=str(leg["price"]),
+            reduceOnly=True,
+            timeInForce="GTC",
         )
+        if not order["ok"]:
+            logger.error(f"[Trading] Ошибка размещения {leg['name']}: {order['error']}")
+        results.append({**leg, "ok": order["ok"], "order_id": order["order_id"], "error": order["error"]})
+    return results
+
+
+def _place_tp_batch(session, token_symbol, legs):
+    """
+    Размещает TP ордера одним запросом place_batch_order
+    
+    Returns:
+        Список результатов по каждому уровню или None, если запрос отклонён целиком
+    """
+    response = session.place_batch_order(
+        category="linear",
+        request=[
+            {
+                "symbol": token_symbol,
+                "side": "Sell",
+                "orderType": "Limit",
+                "qty": str(round(leg["qty"], 0)),
+                "price": str(leg["price"]),
+                "reduceOnly": True,
+                "timeInForce": "GTC",
+                **({"orderLinkId": leg["link_id"]} if leg.get("link_id") else {}),
+            }
+            for leg in legs
+        ],
+    )
+    
+    if not isinstance(response, dict) or response.get("retCode") != 0:
+        error_msg = response.get("retMsg", "Unknown error") if isinstance(response, dict) else "Unknown error"
+        logger.warning(f"[Trading] Batch запрос TP для {token_symbol} отклонён: {error_msg}")
+        return None
+    
+    # Результат и статус каждого ордера приходят в порядке запроса
+    orders = response.get("result", {}).get("list", [])
+    statuses = response.get("retExtInfo", {}).get("list", [])
+    
+    results = []
+    for index, leg in enumerate(legs):
+        order = orders[index] if index < len(orders) else {}
+        status = statuses[index] if index < len(statuses) else {"code": 0}
+        ok = status.get("code") == 0 and bool(order.get("orderId"))
+        results.append({
+            **leg,
+            "ok": ok,
+            "order_id": order.get("orderId") if ok else None,
+            "error": None if ok else status.get("msg", "Unknown error"),
+        })
+    return results
+
+
+def place_tp_ladder(session, token_symbol, legs):
+    """
+    Размещает лестницу TP ордеров batch запросами (до BATCH_ORDER_LIMIT ордеров в каждом)
+    
+    Если batch запрос отклонён целиком, уровни размещаются по одному.
+    
+    Args:
+        session: HTTP сессия Bybit
+        token_symbol: Символ инструмента
+        legs: Список уровней {name, price, qty}
         
-        if ticker.get("retCode") != 0 or not ticker.get("result", {}).get("list"):
-            bot.send_message(user_id, f"❌ Ошибка получения цены для {token_symbol}")
-            return
-        
-        price = float(ticker["result"]["list"][0]["lastPrice"])
-        
-        # Рассчитываем объём
-        raw_qty = (leverage * margin) / price
-        qty = round_to_qty_step(raw_qty, qty_step)
-        
-        if qty < min_qty:
-            bot.send_message(user_id, f"❌ Рассчитанный объём {qty} меньше минимального {min_qty}")
-            return
+    Returns:
+        Список результатов по уровням: {name, price, qty, ok, order_id, error}
+    """
+    results = []
+    for start in range(0, len(legs), BATCH_ORDER_LIMIT):
+        chunk = legs[start:start + BATCH_ORDER_LIMIT]
+        try:
+            chunk_results = _place_tp_batch(session, token_symbol, chunk)
+        except Exception as e:
+            logger.warning(f"[Trading] Ошибка batch запроса TP для {token_symbol}: {e}")
+            chunk_results = None
         
-        # Проверяем баланс
-        balance = session.get_wallet_balance(
-            accountType="UNIFIED",
-            coin="USDT",
-        )
+        if chunk_results is None:
+            chunk_results = _place_tp_sequential(session, token_symbol, chunk)
+        results.extend(chunk_results)
+    return results
+
+
+def _usdt_balance(balance):
+    """Баланс USDT из ответа get_wallet_balance"""
+    wallet_balance_str = balance["result"]["list"][0]["coin"][0].get("walletBalance", "0")
+    return float(wallet_balance_str) if wallet_balance_str and wallet_balance_str != "" else 0.0
+
+
+@span("prepare_long")
+def prepare_long(token, user_id, bot, scope=None):
+    """
+    Готовит план входа в длинную позицию: проверяет ключи и баланс,
+    получает параметры инструмента и цену, рассчитывает объёмы и устанавливает плечо.
+    
+    Args:
+        token: Символ токена (например, LAUSDT)
+        user_id: ID пользователя Telegram
+        bot: Экземпляр Telegram бота
+        scope: Область orderLinkId входа (retry.event_scope), по умолчанию уникальная
         
+    Returns:
+        Словарь с готовым к отправке планом ордеров или None, если вход невозможен
+    """
+    user_config = get_user_config(user_id)
+    
+    if not user_config.get("api_key") or not user_config.get("api_secret"):
+        bot.send_message(user_id, "❌ Не настроены API ключи Bybit")
+        return
+    
+    api_key = user_config["api_key"]
+    api_secret = user_config["api_secret"]
+    leverage = float(user_config.get("leverage", 10))
+    margin = float(user_config.get("margin", 20))
+    
+    session = get_session(api_key, api_secret)
+    
+    token_symbol = to_symbol(token)
+    
+    # Получаем информацию об инструменте из общего кэша
+    instrument = get_instrument(token_symbol, session)
+    if not instrument:
+        bot.send_message(user_id, f"❌ Инструмент {token_symbol} не найден")
+        return
+    
+    min_qty = instrument["min_qty"]
+    
+    # Берём цену из общего снимка (один запрос на всех пользователей)
+    price = get_last_price(token_symbol, session)
+    if price is None:
+        bot.send_message(user_id, f"❌ Ошибка получения цены для {token_symbol}")
+        return
+    
+    ladder = build_ladder(price, leverage, margin, instrument)
+    if ladder["qty"] < min_qty:
+        bot.send_message(user_id, f"❌ Рассчитанный объём {ladder['qty']} меньше минимального {min_qty}")
+        return
+    
+    # Проверяем баланс по кэшу состояния счёта
+    balance = get_wallet(api_key, session)
+    if balance.get("retCode") != 0:
+        bot.send_message(user_id, "❌ Ошибка получения баланса")
+        return
+    available_balance = _usdt_balance(balance)
+    
+    # Кэш мог отстать от пополнения - перед отказом уточняем баланс у биржи
+    if available_balance < margin:
+        balance = refresh_wallet(api_key, session)
         if balance.get("retCode") != 0:
             bot.send_message(user_id, "❌ Ошибка получения баланса")
             return
-        
-        # Безопасное преобразование баланса
-        wallet_balance_str = balance["result"]["list"][0]["coin"][0].get("walletBalance", "0")
-        available_balance = float(wallet_balance_str) if wallet_balance_str and wallet_balance_str != "" else 0.0
-        
-        if available_balance < margin:
-            bot.send_message(user_id, f"❌ Недостаточно средств. Доступно: {available_balance} USDT, требуется: {margin} USDT")
-            return
-        
-        # Рассчитываем цены TP и SL
-        tp1 = round_to_tick_size(price * (1 + TP1_PCT / 100), tick_size)
-        tp2 = round_to_tick_size(price * (1 + TP2_PCT / 100), tick_size)
-        sl = round_to_tick_size(price * (1 - STOP_LOSS_PCT / 100), tick_size)
-        
-        # Рассчитываем объёмы
-        buy_qty = qty * (BUY_PCT / 100)
-        buy_qty = round_to_qty_step(buy_qty, qty_step)
-        
-        tp1_qty = buy_qty * 0.4  # 40% от позиции
-        tp1_qty = round_to_qty_step(tp1_qty, qty_step)
-        
-        tp2_qty = buy_qty * 0.3  # 30% от позиции
-        tp2_qty = round_to_qty_step(tp2_qty, qty_step)
-        
-        sl_qty = buy_qty * 0.3  # 30% от позиции для стоп-лосса
-        
-        # Устанавливаем плечо
-        leverage_result = session.set_leverage(
-            category="linear",
-            symbol=token_symbol,
-            buyLeverage=str(int(leverage)),
-            sellLeverage=str(int(leverage)),
-        )
-        
-        if leverage_result.get("retCode") != 0:
-            error_msg = f"❌ Ошибка установки плеча: {leverage_result.get('retMsg', 'Unknown error')}"
-            logger.error(f"[Trading] {error_msg}")
-            bot.send_message(user_id, error_msg)
-            return
-        
-        # Размещаем основной ордер покупки с повторными попытками
-        buy_order_id = None
-        buy_order_success = False
-        
-        for attempt in range(MAX_RETRIES):
-            try:
-                buy_order = session.place_order(
-                    category="linear",
-                    symbol=token_symbol,
-                    side="Buy",
-                    order_type="Market",
-                    qty=round(buy_qty, 0),
-                    reduce_only=False,
-                    time_in_force="GoodTillCancel",
-                    stopLoss=str(sl)
-                )
-                
-                if buy_order.get("retCode") == 0:
-                    buy_order_id = buy_order.get("result", {}).get("orderId")
-                    buy_order_success = True
-                    buy_msg = (
-                        f"🛒 Ордер покупки размещен\n"
-                        f"Токен: {token_symbol}\n"
-                        f"Order ID: {buy_order_id}\n"
-                        f"Цена: {price:.4f} USDT\n"
-                        f"Объём: {buy_qty:.2f}"
-                    )
-                    bot.send_message(user_id, buy_msg)
-                    break
-                else:
-                    error_msg = buy_order.get("retMsg", "Unknown error")
-                    logger.warning(f"[Trading] Попытка {attempt + 1} неудачна: {error_msg}")
-                    
-                    # Если это последняя попытка, отправляем ошибку
-                    if attempt == MAX_RETRIES - 1:
-                        error_message = f"❌ Не удалось разместить ордер покупки после {MAX_RETRIES} попыток: {error_msg}"
-                        bot.send_message(user_id, error_message)
-                        return
-                    else:
-                        time.sleep(RETRY_DELAY)
-                        
-            except Exception as e:
-                logger.error(f"[Trading] Исключение при попытке {attempt + 1}: {e}", exc_info=True)
-                if attempt == MAX_RETRIES - 1:
-                    error_message = f"❌ Критическая ошибка при размещении ордера: {str(e)}"
-                    bot.send_message(user_id, error_message)
-                    return
-                time.sleep(RETRY_DELAY)
-        
-        if not buy_order_success:
-            logger.error(f"[Trading] Не удалось разместить ордер покупки после всех попыток")
-            bot.send_message(user_id, f"❌ Не удалось разместить ордер покупки для {token_symbol}")
-            return
-        
-        # Проверяем, что позиция действительно открылась
+        available_balance = _usdt_balance(balance)
+    
+    if available_balance < margin:
+        bot.send_message(user_id, f"❌ Недостаточно средств. Доступно: {available_balance} USDT, требуется: {margin} USDT")
+        return
+    
+    # Устанавливаем плечо (запрос отправляется, только если значение изменилось)
+    leverage_result = ensure_leverage(api_key, session, token_symbol, leverage)
+    
+    if leverage_result.get("retCode") != 0:
+        error_msg = f"❌ Ошибка установки плеча: {leverage_result.get('retMsg', 'Unknown error')}"
+        logger.error(f"[Trading] {error_msg}")
+        bot.send_message(user_id, error_msg)
+        return
+    
+    return {
+        "user_id": user_id,
+        "token_symbol": token_symbol,
+        "api_key": api_key,
+        "session": session,
+        "leverage": leverage,
+        "margin": margin,
+        "instrument": instrument,
+        "min_qty": min_qty,
+        # Отличает orderLinkId этого входа от других входов в тот же токен
+        "link_scope": retry.event_scope() if scope is None else scope,
+        **ladder,
+    }
+
+
+@span("execute_long")
+def execute_long(plan, bot, timings=None):
+    """
+    Исполняет подготовленный план: размещает ордер покупки и TP ордера
+    
+    Args:
+        plan: План, полученный из prepare_long
+        bot: Экземпляр Telegram бота
+        timings: Словарь для замеров, в него пишется buy_ack (time.monotonic() подтверждения покупки)
+    """
+    user_id = plan["user_id"]
+    token_symbol = plan["token_symbol"]
+    session = plan["session"]
+    
+    # План мог быть подготовлен заранее - пересчитываем его по общему снимку цены на момент входа
+    snapshot_price = get_snapshot(token_symbol)
+    if snapshot_price is not None and snapshot_price != plan["price"]:
+        plan = {**plan, **build_ladder(snapshot_price, plan["leverage"], plan["margin"], plan["instrument"])}
+    # Объём мог уменьшиться при пересчёте по новой цене (здесь или в prearm.reprice_plans)
+    if plan["qty"] < plan["min_qty"]:
+        bot.send_message(user_id, f"❌ Рассчитанный объём {plan['qty']} меньше минимального {plan['min_qty']}")
+        return
+    
+    leverage = plan["leverage"]
+    margin = plan["margin"]
+    price = plan["price"]
+    min_qty = plan["min_qty"]
+    buy_qty = plan["buy_qty"]
+    sl = plan["sl"]
+    
+    scope = plan.get("link_scope", "")
+    buy_link_id = retry.order_link_id(user_id, token_symbol, "BUY", scope)
+    legs = [
+        {**leg, "link_id": retry.order_link_id(user_id, token_symbol, leg["name"], scope)}
+        for leg in plan["tp_levels"] if leg["qty"] >= min_qty
+    ]
+    
+    # Сделка регистрируется до покупки: события исполнения могут прийти раньше ответа на запрос
+    api_key = plan.get("api_key")
+    if api_key:
+        track_trade(api_key, user_id, token_symbol, session, bot, price,
+                    plan["instrument"]["tick_size"], buy_link_id, legs)
+    
+    # Размещаем основной ордер покупки с повторными попытками (orderLinkId защищает от дублей)
+    buy = retry.place_order(
+        session,
+        buy_link_id,
+        max_attempts=MAX_RETRIES,
+        category="linear",
+        symbol=token_symbol,
+        side="Buy",
+        orderType="Market",
+        qty=str(round(buy_qty, 0)),
+        reduceOnly=False,
+        timeInForce="GTC",
+        stopLoss=str(sl)
+    )
+    
+    if not buy["ok"]:
+        if buy["exception"]:
+            error_message = f"❌ Критическая ошибка при размещении ордера: {buy['error']}"
+        else:
+            error_message = f"❌ Не удалось разместить ордер покупки после {buy['attempts']} попыток: {buy['error']}"
+        logger.error(f"[Trading] Не удалось разместить ордер покупки {token_symbol}: {buy['error']}")
+        bot.send_message(user_id, error_message)
+        if api_key:
+            untrack_trade(api_key, token_symbol)
+        return
+    
+    if timings is not None:
+        timings["buy_ack"] = time.monotonic()
+    buy_order_id = buy["order_id"]
+    buy_msg = (
+        f"🛒 Ордер покупки размещен\n"
+        f"Токен: {token_symbol}\n"
+        f"Order ID: {buy_order_id}\n"
+        f"Цена: {price:.4f} USDT\n"
+        f"Объём: {buy_qty:.2f}"
+    )
+    bot.send_message(user_id, buy_msg)
+    
+    # Ждём исполнения по событию из приватного потока (открывается при подготовке плана),
+    # без потока - короткая пауза и опрос позиции
+    if has_stream(api_key):
+        filled = wait_for_fill(api_key, buy_order_id)
+    else:
+        filled = None
         time.sleep(1)  # Даём время на обработку ордера
-        
+    
+    # Событие не пришло или ордер не исполнен - проверяем позицию запросом
+    if not filled:
         try:
-            positions = session.get_open_positions(
+            positions = session.get_positions(
                 category="linear",
                 symbol=token_symbol,
             )
-            
+        
             if positions.get("retCode") == 0:
                 position_list = positions.get("result", {}).get("list", [])
                 position_found = any(
@@ -305,7 +438,7 @@ def long_token(token, user_id, bot):
                     float(pos.get("size", 0)) > 0 
                     for pos in position_list
                 )
-                
+            
                 if not position_found:
                     logger.warning(f"[Trading] Позиция {token_symbol} не найдена после размещения ордера")
                     bot.send_message(
@@ -315,88 +448,69 @@ def long_token(token, user_id, bot):
         except Exception as e:
             logger.error(f"[Trading] Ошибка проверки позиции: {e}", exc_info=True)
             # Не блокируем выполнение, продолжаем размещать TP ордера
-        
-        # Размещаем TP ордера
-        tp_orders_placed = []
-        
-        # TP1 limit sell 40%
-        if tp1_qty >= min_qty:
-            try:
-                tp1_order = session.place_order(
-                    category="linear",
-                    symbol=token_symbol,
-                    side="Sell",
-                    order_type="Limit",
-                    qty=round(tp1_qty, 0),
-                    price=str(tp1),
-                    reduce_only=True,
-                    time_in_force="GoodTillCancel"
-                )
-                
-                if tp1_order.get("retCode") == 0:
-                    tp1_order_id = tp1_order.get("result", {}).get("orderId", "N/A")
-                    tp_orders_placed.append(f"TP1@{tp1}")
-                    tp1_msg = (
-                        f"✅ TP1 ордер размещен\n"
-                        f"Токен: {token_symbol}\n"
-                        f"Order ID: {tp1_order_id}\n"
-                        f"Цена: {tp1:.4f} USDT\n"
-                        f"Объём: {tp1_qty:.2f}"
-                    )
-                    bot.send_message(user_id, tp1_msg)
-                else:
-                    error_msg = tp1_order.get("retMsg", "Unknown error")
-                    logger.warning(f"[Trading] TP1 ордер не размещен: {error_msg}")
-                    bot.send_message(user_id, f"❌ Ошибка размещения TP1 для {token_symbol}: {error_msg}")
-            except Exception as e:
-                logger.error(f"[Trading] Ошибка размещения TP1: {e}", exc_info=True)
-                bot.send_message(user_id, f"❌ Критическая ошибка размещения TP1 для {token_symbol}: {str(e)}")
-        
-        # TP2 limit sell 30%
-        if tp2_qty >= min_qty:
-            try:
-                tp2_order = session.place_order(
-                    category="linear",
-                    symbol=token_symbol,
-                    side="Sell",
-                    order_type="Limit",
-                    qty=round(tp2_qty, 0),
-                    price=str(tp2),
-                    reduce_only=True,
-                    time_in_force="GoodTillCancel"
+    
+    # Размещаем лестницу TP ордеров одним batch запросом
+    tp_orders_placed = []
+    tp_results = []
+    if legs:
+        tp_results = place_tp_ladder(session, token_symbol, legs)
+        
+        report_lines = []
+        for result in tp_results:
+            if result["ok"]:
+                tp_orders_placed.append(f"{result['name']}@{result['price']}")
+                report_lines.append(
+                    f"✅ {result['name']}: {result['price']:.4f} USDT × {result['qty']:.2f} (Order ID: {result['order_id']})"
                 )
-                
-                if tp2_order.get("retCode") == 0:
-                    tp2_order_id = tp2_order.get("result", {}).get("orderId", "N/A")
-                    tp_orders_placed.append(f"TP2@{tp2}")
-                    tp2_msg = (
-                        f"✅ TP2 ордер размещен\n"
-                        f"Токен: {token_symbol}\n"
-                        f"Order ID: {tp2_order_id}\n"
-                        f"Цена: {tp2:.4f} USDT\n"
-                        f"Объём: {tp2_qty:.2f}"
-                    )
-                    bot.send_message(user_id, tp2_msg)
-                else:
-                    error_msg = tp2_order.get("retMsg", "Unknown error")
-                    logger.warning(f"[Trading] TP2 ордер не размещен: {error_msg}")
-                    bot.send_message(user_id, f"❌ Ошибка размещения TP2 для {token_symbol}: {error_msg}")
-            except Exception as e:
-                logger.error(f"[Trading] Ошибка размещения TP2: {e}", exc_info=True)
-                bot.send_message(user_id, f"❌ Критическая ошибка размещения TP2 для {token_symbol}: {str(e)}")
-        
-        # Итоговое сообщение о выполнении покупки
-        tp_info = f"\n✅ Размещены TP: {', '.join(tp_orders_placed)}" if tp_orders_placed else "\n⚠️ TP ордера не размещены"
-        success_message = (
-            f"✅ Покупка {token_symbol} завершена\n\n"
-            f"💰 Цена входа: {price:.4f} USDT\n"
-            f"📊 Объём: {buy_qty:.2f} {token_symbol.replace('USDT', '')}\n"
-            f"🛡️ Stop Loss: {sl:.4f} USDT\n"
-            f"📈 Плечо: {leverage}x\n"
-            f"💵 Маржа: {margin} USDT{tp_info}"
-        )
+            else:
+                logger.warning(f"[Trading] {result['name']} ордер не размещен: {result['error']}")
+                report_lines.append(f"❌ {result['name']}: {result['error']}")
         
-        bot.send_message(user_id, success_message)
+        bot.send_message(user_id, f"📋 TP ордера {token_symbol}\n\n" + "\n".join(report_lines))
+    
+    # Дальше сделку сопровождают события приватного потока: перенос стопа после TP1, отмена TP после стопа
+    if api_key:
+        placed = {result["link_id"] for result in tp_results if result["ok"]}
+        if placed:
+            drop_trade_legs(api_key, token_symbol, [leg["link_id"] for leg in legs if leg["link_id"] not in placed])
+        else:
+            untrack_trade(api_key, token_symbol)
+    
+    # Итоговое сообщение о выполнении покупки
+    tp_info = f"\n✅ Размещены TP: {', '.join(tp_orders_placed)}" if tp_orders_placed else "\n⚠️ TP ордера не размещены"
+    success_message = (
+        f"✅ Покупка {token_symbol} завершена\n\n"
+        f"💰 Цена входа: {price:.4f} USDT\n"
+        f"📊 Объём: {buy_qty:.2f} {token_symbol.replace('USDT', '')}\n"
+        f"🛡️ Stop Loss: {sl:.4f} USDT\n"
+        f"📈 Плечо: {leverage}x\n"
+        f"💵 Маржа: {margin} USDT{tp_info}"
+    )
+    
+    bot.send_message(user_id, success_message)
+    
+    # Без подготовленного заранее потока сопровождению нужен поток: он открывается в фоне,
+    # подключение WebSocket не должно занимать поток входа
+    api_secret = get_user_config(user_id).get("api_secret")
+    if api_key and api_secret and tp_orders_placed and not has_stream(api_key):
+        open_stream_in_background(api_key, api_secret)
+
+
+def long_token(token, user_id, bot, timings=None, scope=None):
+    """
+    Открывает длинную позицию по токену
+    
+    Args:
+        token: Символ токена (например, LAUSDT)
+        user_id: ID пользователя Telegram
+        bot: Экземпляр Telegram бота
+        timings: Словарь для замеров, в него пишется buy_ack (time.monotonic() подтверждения покупки)
+        scope: Область orderLinkId входа (retry.event_scope)
+    """
+    try:
+        plan = prepare_long(token, user_id, bot, scope)
+        if plan:
+            execute_long(plan, bot, timings)
         
     except Exception as err:
         logger.error(f'Error while placing order for {token}: {err}', exc_info=True)
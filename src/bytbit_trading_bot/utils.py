@@ -3,10 +3,17 @@
 """
 import json
 import os
+import stat
+import tempfile
+import atexit
 import logging
+import threading
+import time
 from datetime import datetime
 import pytz
 from decimal import Decimal
+from . import storage
+from .config import STORAGE_BACKEND
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +22,29 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 TOKENS_FILE = os.path.join(DATA_DIR, "tokens.json")
+TOKENS_JOURNAL_FILE = os.path.join(DATA_DIR, "tokens.jsonl")
+DB_FILE = os.path.join(DATA_DIR, "bot.sqlite3")
+JOBS_FILE = os.path.join(DATA_DIR, "jobs.sqlite3")
+PARSER_STATE_FILE = os.path.join(DATA_DIR, "parser_state.json")
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.prom")
+
+# После скольких записей журнал токенов сворачивается в tokens.json
+TOKENS_COMPACT_THRESHOLD = 200
+
+# Задержка отложенной записи users.json (сек), за это время изменения объединяются
+USERS_FLUSH_DELAY = 0.5
+
+# Кэш пользователей в памяти: user_id (str) -> конфигурация
+_users = None
+_enabled_ids = set()
+_dirty_user_ids = set()
+_users_lock = threading.RLock()
+_flush_lock = threading.Lock()
+_flush_event = threading.Event()
+_flush_thread = None
+
+_tokens_lock = threading.Lock()
+_parser_state_lock = threading.Lock()
 
 
 def load_json(file_path):
@@ -29,14 +59,70 @@ def load_json(file_path):
     return {}
 
 
-def save_json(file_path, data):
-    """Сохраняет данные в JSON файл"""
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+def _fsync_dir(dir_path):
+    """Сбрасывает на диск запись каталога (переименование файла)"""
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _file_mode(file_path):
+    """Права целевого файла (для нового - 0644): временный файл создаётся с 0600"""
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return 0o644
+
+
+def _write_json(file_path, data):
+    """
+    Атомарно записывает данные в JSON файл
+
+    Данные пишутся во временный файл рядом с целевым, сбрасываются на диск
+    и переименовываются поверх него: при падении процесса остаётся либо старый,
+    либо новый файл целиком, но не обрезанный.
+
+    Returns:
+        True, если файл записан и сброшен на диск
+    """
+    dir_path = os.path.dirname(file_path)
+    os.makedirs(dir_path, exist_ok=True)
+    tmp_path = None
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
+        with tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', dir=dir_path, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
             json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        # Иначе каждая запись меняла бы права файла на 0600 и закрывала его для других читателей
+        os.chmod(tmp_path, _file_mode(file_path))
+        os.replace(tmp_path, file_path)
+        tmp_path = None
+        _fsync_dir(dir_path)
+        return True
     except Exception as e:
         logger.error(f"Error saving {file_path}: {e}", exc_info=True)
+        return False
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_json(file_path, data):
+    """Сохраняет данные в JSON файл"""
+    _write_json(file_path, data)
+    if os.path.abspath(file_path) == USERS_FILE:
+        # Файл пользователей перезаписан целиком - кэш в памяти больше не актуален
+        invalidate_users_cache()
 
 
 def parse_result_date(date_str):
@@ -75,21 +161,300 @@ def round_to_qty_step(qty, qty_step):
     return float(Decimal(str(qty)) // Decimal(str(qty_step)) * Decimal(str(qty_step)))
 
 
+def _use_sqlite():
+    """Используется ли SQLite хранилище вместо JSON файлов"""
+    return STORAGE_BACKEND == "sqlite"
+
+
+def _load_users():
+    """Возвращает кэш пользователей, при первом обращении читая хранилище (вызывать под _users_lock)"""
+    global _users, _enabled_ids
+    if _users is None:
+        _users = storage.load_users(DB_FILE) if _use_sqlite() else load_json(USERS_FILE)
+        _enabled_ids = {user_id for user_id, config in _users.items() if config.get("enabled", False)}
+    return _users
+
+
+def invalidate_users_cache():
+    """Сбрасывает кэш пользователей, следующее обращение перечитает хранилище"""
+    global _users
+    with _users_lock:
+        _users = None
+        _enabled_ids.clear()
+        _dirty_user_ids.clear()
+
+
+def flush_users():
+    """
+    Записывает изменённых пользователей в хранилище
+
+    Под _users_lock снимается только копия: запись и fsync идут без блокировки,
+    чтобы get_user_config в потоках входа не ждал диск. Записи сериализуются _flush_lock.
+    """
+    with _flush_lock:
+        with _users_lock:
+            if not _dirty_user_ids or _users is None:
+                return
+            dirty = set(_dirty_user_ids)
+            _dirty_user_ids.clear()
+            if _use_sqlite():
+                # В SQLite обновляются только изменённые строки
+                snapshot = {user_id: dict(_users[user_id]) for user_id in dirty}
+            else:
+                snapshot = {user_id: dict(config) for user_id, config in _users.items()}
+
+        try:
+            if _use_sqlite():
+                storage.save_users(DB_FILE, snapshot)
+            elif not _write_json(USERS_FILE, snapshot):
+                raise OSError(f"Не удалось записать {USERS_FILE}")
+        except Exception:
+            # Запись не удалась - изменения останутся в очереди на следующую запись
+            with _users_lock:
+                _dirty_user_ids.update(dirty)
+            raise
+
+
+def _flush_loop():
+    """Фоновый поток отложенной записи пользователей"""
+    while True:
+        _flush_event.wait()
+        # Даём накопиться соседним изменениям, чтобы записать их одним разом
+        time.sleep(USERS_FLUSH_DELAY)
+        _flush_event.clear()
+        try:
+            flush_users()
+        except Exception as e:
+            logger.error(f"Error flushing users: {e}", exc_info=True)
+
+
+def _schedule_users_flush():
+    """Запускает отложенную запись пользователей"""
+    global _flush_thread
+    if _flush_thread is None:
+        _flush_thread = threading.Thread(target=_flush_loop, name="users-flush", daemon=True)
+        _flush_thread.start()
+        atexit.register(flush_users)
+    _flush_event.set()
+
+
 def get_user_config(user_id):
-    """Получает конфигурацию пользователя"""
-    users = load_json(USERS_FILE)
-    return users.get(str(user_id), {})
+    """Получает конфигурацию пользователя (копию из кэша в памяти)"""
+    with _users_lock:
+        return dict(_load_users().get(str(user_id), {}))
 
 
 def save_user_config(user_id, config):
-    """Сохраняет конфигурацию пользователя"""
-    users = load_json(USERS_FILE)
-    users[str(user_id)] = config
-    save_json(USERS_FILE, users)
+    """Сохраняет конфигурацию пользователя в памяти и откладывает запись в хранилище"""
+    user_key = str(user_id)
+    with _users_lock:
+        users = _load_users()
+        users[user_key] = dict(config)
+        if config.get("enabled", False):
+            _enabled_ids.add(user_key)
+        else:
+            _enabled_ids.discard(user_key)
+        _dirty_user_ids.add(user_key)
+    _schedule_users_flush()
+
+
+def update_users_cache(configs):
+    """
+    Подменяет конфигурации пользователей в памяти без записи в хранилище
+
+    Используется процессами-шардами: хранилище пишет только основной процесс,
+    а шард получает актуальные конфигурации вместе с командой.
+
+    Args:
+        configs: user_id -> конфигурация
+
+    Returns:
+        Прежние конфигурации изменившихся пользователей: user_id (str) -> конфигурация
+    """
+    changed = {}
+    with _users_lock:
+        users = _load_users()
+        for user_id, config in configs.items():
+            user_key = str(user_id)
+            previous = users.get(user_key)
+            if previous == config:
+                continue
+            changed[user_key] = dict(previous or {})
+            users[user_key] = dict(config)
+            if config.get("enabled", False):
+                _enabled_ids.add(user_key)
+            else:
+                _enabled_ids.discard(user_key)
+    return changed
 
 
 def is_user_enabled(user_id):
     """Проверяет, включен ли бот для пользователя"""
-    user_config = get_user_config(user_id)
-    return user_config.get("enabled", False)
+    with _users_lock:
+        _load_users()
+        return str(user_id) in _enabled_ids
+
+
+def get_enabled_user_ids():
+    """Возвращает ID всех включенных пользователей"""
+    with _users_lock:
+        _load_users()
+        return sorted(int(user_id) for user_id in _enabled_ids)
+
+
+def _read_tokens_journal():
+    """Читает журнал добавленных токенов (повреждённая последняя строка пропускается)"""
+    entries = []
+    if not os.path.exists(TOKENS_JOURNAL_FILE):
+        return entries
+    with open(TOKENS_JOURNAL_FILE, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                entries.append((entry["key"], entry["data"]))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Skipping broken line {line_no} in {TOKENS_JOURNAL_FILE}: {e}")
+    return entries
+
+
+def _load_tokens_json():
+    """Собирает токены из tokens.json и журнала. Возвращает (токены, число записей журнала)"""
+    tokens = load_json(TOKENS_FILE)
+    entries = _read_tokens_journal()
+    for token_key, token_data in entries:
+        tokens.setdefault(token_key, token_data)
+    return tokens, len(entries)
+
+
+def _append_tokens_journal(new_tokens):
+    """Дописывает токены в журнал, по строке на токен"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(TOKENS_JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        for token_key, token_data in new_tokens.items():
+            f.write(json.dumps({"key": token_key, "data": token_data}, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def compact_tokens():
+    """Сворачивает журнал токенов в tokens.json и очищает журнал"""
+    if _use_sqlite():
+        return
+    with _tokens_lock:
+        tokens, journal_size = _load_tokens_json()
+        if not journal_size:
+            return
+        if not _write_json(TOKENS_FILE, tokens):
+            # Снимок не записан - журнал остаётся источником недостающих токенов
+            logger.error(f"Tokens journal not compacted: {TOKENS_FILE} was not written")
+            return
+        # tokens.json записан и сброшен на диск, поэтому обрезка журнала безопасна
+        with open(TOKENS_JOURNAL_FILE, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        logger.info(f"Tokens journal compacted: {journal_size} entries, {len(tokens)} tokens total")
+
+
+def load_tokens():
+    """Загружает все токены: token_key -> данные"""
+    if _use_sqlite():
+        return storage.load_tokens(DB_FILE)
+    return _load_tokens_json()[0]
+
+
+def count_tokens():
+    """Возвращает количество сохранённых токенов"""
+    if _use_sqlite():
+        return storage.count_tokens(DB_FILE)
+    return len(load_tokens())
+
+
+def add_tokens(new_tokens):
+    """
+    Сохраняет новые токены, пропуская уже существующие
+
+    В JSON режиме новые токены дописываются в журнал tokens.jsonl,
+    а tokens.json перезаписывается только при сворачивании журнала.
 
+    Args:
+        new_tokens: Словарь token_key -> данные
+
+    Returns:
+        Список ключей фактически добавленных токенов
+    """
+    if not new_tokens:
+        return []
+    if _use_sqlite():
+        return storage.add_tokens(DB_FILE, new_tokens)
+
+    with _tokens_lock:
+        tokens, journal_size = _load_tokens_json()
+        added = [token_key for token_key in new_tokens if token_key not in tokens]
+        if added:
+            _append_tokens_journal({token_key: new_tokens[token_key] for token_key in added})
+            journal_size += len(added)
+
+    if journal_size >= TOKENS_COMPACT_THRESHOLD:
+        compact_tokens()
+    return added
+
+
+def add_token(token_key, data):
+    """Сохраняет токен, если его ещё нет. Возвращает True, если токен добавлен"""
+    return bool(add_tokens({token_key: data}))
+
+
+def get_upcoming_tokens(now=None):
+    """
+    Возвращает токены с датой Result в будущем, отсортированные по дате
+
+    Returns:
+        Список пар (token_key, данные)
+    """
+    tz_moscow = pytz.timezone("Europe/Moscow")
+    now = now or datetime.now(tz_moscow)
+
+    if _use_sqlite():
+        # result_datetime хранится в ISO формате московского времени, поэтому сравнение строк корректно
+        return storage.get_upcoming_tokens(DB_FILE, now.astimezone(tz_moscow).isoformat())
+
+    upcoming = []
+    for token_key, token_data in load_tokens().items():
+        result_datetime_str = token_data.get("result_datetime")
+        if not result_datetime_str:
+            continue
+        try:
+            result_date = datetime.fromisoformat(result_datetime_str)
+            if result_date.tzinfo is None:
+                result_date = tz_moscow.localize(result_date)
+        except ValueError as e:
+            logger.error(f"Error parsing result_datetime for {token_key}: {e}")
+            continue
+        if result_date > now:
+            upcoming.append((result_date, token_key, token_data))
+
+    upcoming.sort(key=lambda item: item[0])
+    return [(token_key, token_data) for _, token_key, token_data in upcoming]
+
+
+def get_channel_checkpoint(channel):
+    """Возвращает ID последнего обработанного сообщения канала или None"""
+    with _parser_state_lock:
+        return load_json(PARSER_STATE_FILE).get(channel)
+
+
+def set_channel_checkpoint(channel, message_id):
+    """
+    Сохраняет ID последнего обработанного сообщения канала
+
+    Чекпоинт только растёт: более старый ID не перезаписывает новый.
+    """
+    with _parser_state_lock:
+        state = load_json(PARSER_STATE_FILE)
+        if message_id <= state.get(channel, 0):
+            return
+        state[channel] = message_id
+        _write_json(PARSER_STATE_FILE, state)
@@ -0,0 +1,15 @@
+"""
+Общие фикстуры для тестов
+"""
+import sys
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """Сбрасывает кэши уровня процесса, чтобы тесты не влияли друг на друга"""
+    for name in ("sessions", "instruments", "market_data", "fills", "metrics", "clock", "limiter", "account", "positions"):
+        module = sys.modules.get(f"bytbit_trading_bot.{name}")
+        if module is not None:
+            module.clear()
+    yield
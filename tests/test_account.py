@@ -0,0 +1,90 @@
+"""
+Тесты для кэша состояния счёта
+"""
+import sys
+import os
+from unittest.mock import Mock, MagicMock
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import account
+
+
+class InvalidRequestError(Exception):
+    """Повторяет исключение pybit для ответа с ненулевым retCode"""
+
+    def __init__(self, status_code):
+        super().__init__(f"ErrCode: {status_code}")
+        self.status_code = status_code
+
+
+def _wallet(balance):
+    return {"retCode": 0, "result": {"list": [{"accountType": "UNIFIED", "coin": [{"coin": "USDT", "walletBalance": balance}]}]}}
+
+
+def test_leverage_sent_only_on_change():
+    """Тест что плечо отправляется только при изменении, а 110043 считается успехом"""
+    session = Mock()
+    session.set_leverage.side_effect = InvalidRequestError(account.LEVERAGE_NOT_MODIFIED)
+
+    assert account.ensure_leverage("key", session, "TESTUSDT", 10)["retCode"] == 0
+    assert account.ensure_leverage("key", session, "TESTUSDT", 10.0)["retCode"] == 0
+    assert session.set_leverage.call_count == 1, "Неизменившееся плечо отправлено повторно"
+
+    session.set_leverage.side_effect = None
+    session.set_leverage.return_value = {"retCode": 0}
+    account.ensure_leverage("key", session, "TESTUSDT", 20)
+    account.ensure_leverage("key", session, "OTHERUSDT", 20)
+    assert session.set_leverage.call_count == 3
+
+    # Ошибка не кэшируется
+    session.set_leverage.return_value = {"retCode": 10001, "retMsg": "params error"}
+    assert account.ensure_leverage("key", session, "NEWUSDT", 5)["retCode"] == 10001
+    assert account.ensure_leverage("key", session, "NEWUSDT", 5)["retCode"] == 10001
+    assert session.set_leverage.call_count == 5
+
+    print("✅ Тест test_leverage_sent_only_on_change пройден")
+
+
+def test_wallet_cached_and_updated_from_stream():
+    """Тест что баланс читается из кэша и обновляется сообщениями потока wallet"""
+    session = Mock()
+    session.get_wallet_balance.return_value = _wallet("100")
+
+    assert account.get_wallet("key", session)["result"]["list"][0]["coin"][0]["walletBalance"] == "100"
+    assert account.get_wallet("key", session)["result"]["list"][0]["coin"][0]["walletBalance"] == "100"
+    assert session.get_wallet_balance.call_count == 1, "Баланс запрошен повторно"
+
+    account.handle_wallet_message("key", {"topic": "wallet", "data": [{
+        "accountType": "UNIFIED",
+        "coin": [{"coin": "BTC", "walletBalance": "1"}, {"coin": "USDT", "walletBalance": "250"}],
+    }]})
+    coins = account.get_wallet("key", session)["result"]["list"][0]["coin"]
+    assert coins == [{"coin": "USDT", "walletBalance": "250"}]
+    assert session.get_wallet_balance.call_count == 1
+
+    # Устаревший кэш запрашивается заново
+    account.get_wallet("key", session, max_age=0)
+    assert session.get_wallet_balance.call_count == 2
+
+    print("✅ Тест test_wallet_cached_and_updated_from_stream пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для кэша состояния счёта...")
+
+    try:
+        test_leverage_sent_only_on_change()
+        account.clear()
+        test_wallet_cached_and_updated_from_stream()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
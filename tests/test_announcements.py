@@ -0,0 +1,83 @@
+"""
+Тесты для извлечения анонсов токенов
+"""
+import sys
+import os
+import pytest
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import announcements
+
+
+def test_extract_default_format():
+    """Тест разбора анонса Token Splash"""
+    result = announcements.extract("RECALL\nStart 31.10.2025 10:00 UTC\nResult 14.11.2025 11:00 UTC")
+
+    assert result["token"] == "RECALL"
+    assert result["result_date"] == "14.11.2025 11:00"
+    assert result["format"] == announcements.DEFAULT_FORMAT
+
+    # Анонс не в начале сообщения
+    result = announcements.extract("🔥 Token Splash\nLA\nResult 31.10.2024 15:30")
+    assert result["token"] == "LA"
+
+    assert announcements.extract("Обычная новость без анонса") is None
+    assert announcements.extract("") is None
+
+    print("✅ Тест test_extract_default_format пройден")
+
+
+def test_registered_formats_and_prefilter():
+    """Тест дополнительного формата и литерального префильтра"""
+    announcements.register_format(
+        "listing",
+        r"Listing: (?P<token>\w+) at (?P<result_date>\d{2}\.\d{2}\.\d{4} \d{2}:\d{2})",
+        literal="Listing:",
+    )
+    try:
+        assert announcements.get_formats() == [announcements.DEFAULT_FORMAT, "listing"]
+
+        result = announcements.extract("Listing: ABC at 01.01.2030 10:00")
+        assert result["token"] == "ABC" and result["format"] == "listing"
+
+        # Без литерала регулярное выражение формата не запускается
+        assert announcements.extract("listing: ABC at 01.01.2030 10:00") is None
+    finally:
+        announcements.unregister_format("listing")
+
+    assert announcements.get_formats() == [announcements.DEFAULT_FORMAT]
+
+    with pytest.raises(ValueError):
+        announcements.register_format("broken", r"(?P<token>\w+)")
+
+    print("✅ Тест test_registered_formats_and_prefilter пройден")
+
+
+def test_mentions_result_any_case():
+    """Тест что упоминание Result распознаётся в любом регистре"""
+    from bytbit_trading_bot import announcements
+
+    assert announcements.mentions_result("Result: 14.11.2025 12:00")
+    assert announcements.mentions_result("результаты: result soon")
+    assert announcements.mentions_result("TOKEN SPLASH RESULT 14.11.2025")
+    assert announcements.mentions_result("ReSuLt")
+    assert not announcements.mentions_result("Token Splash: новый токен")
+
+    print("✅ Тест test_mentions_result_any_case пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для извлечения анонсов...")
+
+    try:
+        test_extract_default_format()
+        test_registered_formats_and_prefilter()
+        test_mentions_result_any_case()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,157 @@
+"""
+Тесты для бэктеста стратегии
+"""
+import sys
+import os
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+import pytest
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+np = pytest.importorskip("numpy")
+
+from bytbit_trading_bot import backtest
+
+TP_LEVELS = [(3.0, 40.0), (6.0, 30.0)]
+
+
+def _matrix(rows):
+    width = max(len(row) for row in rows)
+    return np.array([row + [np.nan] * (width - len(row)) for row in rows], dtype=float)
+
+
+def test_simulate_ladder_outcomes():
+    """Тест исходов: обе TP, SL до TP, TP и SL в одной свече, выход по последней цене"""
+    open_ = _matrix([[1.0, 1.0, 1.0], [1.0, 1.0, 1.0], [1.0, 1.0, 1.0], [1.0, 1.0]])
+    high = _matrix([[1.01, 1.04, 1.07], [1.01, 1.0, 1.05], [1.04, 1.0, 1.0], [1.01, 1.02]])
+    low = _matrix([[0.99, 1.0, 1.05], [0.97, 1.0, 1.0], [0.97, 1.0, 1.0], [0.99, 1.0]])
+    close = _matrix([[1.0, 1.03, 1.06], [0.98, 1.0, 1.04], [1.0, 1.0, 1.0], [1.0, 1.01]])
+
+    result = backtest.simulate(open_, high, low, close, TP_LEVELS, 2.0)
+
+    # Обе TP, остаток 30% закрыт по последней цене 1.06
+    assert result["tp_hits"][0].tolist() == [True, True] and not result["sl_hit"][0]
+    assert result["return_pct"][0] == pytest.approx(40 * 0.03 + 30 * 0.06 + 30 * 0.06)
+
+    # SL в первой свече раньше TP: весь объём по -2%
+    assert result["tp_hits"][1].tolist() == [False, False] and result["sl_hit"][1]
+    assert result["return_pct"][1] == pytest.approx(-2.0)
+
+    # TP1 и SL в одной свече - считается SL
+    assert result["tp_hits"][2].tolist() == [False, False]
+    assert result["return_pct"][2] == pytest.approx(-2.0)
+
+    # Ни TP, ни SL: выход по close последней доступной свечи
+    assert result["return_pct"][3] == pytest.approx(100 * 0.01)
+
+    print("✅ Тест test_simulate_ladder_outcomes пройден")
+
+
+def test_stop_moves_to_entry_after_tp1():
+    """Тест что после TP1 остаток закрывается в безубытке, а без переноса - по исходному SL"""
+    open_ = _matrix([[1.0, 1.0, 1.0]])
+    high = _matrix([[1.035, 1.0, 1.0]])
+    low = _matrix([[0.995, 0.99, 0.97]])
+    close = _matrix([[1.03, 0.99, 0.97]])
+
+    moved = backtest.simulate(open_, high, low, close, TP_LEVELS, 2.0, move_sl_to_entry=True)
+    # TP1 40% по +3%, остаток 60% по цене входа со следующей свечи
+    assert moved["tp_hits"][0].tolist() == [True, False]
+    assert moved["sl_hit"][0] and moved["breakeven"][0] and moved["sl_index"][0] == 1
+    assert moved["return_pct"][0] == pytest.approx(40 * 0.03)
+
+    fixed = backtest.simulate(open_, high, low, close, TP_LEVELS, 2.0, move_sl_to_entry=False)
+    assert fixed["sl_hit"][0] and not fixed["breakeven"][0] and fixed["sl_index"][0] == 2
+    assert fixed["return_pct"][0] == pytest.approx(40 * 0.03 - 60 * 0.02)
+
+    print("✅ Тест test_stop_moves_to_entry_after_tp1 пройден")
+
+
+def test_naive_datetimes_treated_as_utc(tmp_path):
+    """Тест что время без часового пояса считается UTC, а не вызывает TypeError"""
+    result_datetime = datetime(2025, 1, 1, 10, 0)
+    aware = result_datetime.replace(tzinfo=timezone.utc)
+    assert backtest.kline_path("TEST", result_datetime, str(tmp_path)) == backtest.kline_path("TEST", aware, str(tmp_path))
+
+    start = int(aware.timestamp() * 1000)
+    with open(backtest.kline_path("TEST", aware, str(tmp_path)), "w") as f:
+        f.write(f"{start},1.0,1.01,0.99,1.0")
+
+    tokens = {"TEST_01.01.2025 13:00": {"token": "TEST", "result_datetime": result_datetime.isoformat()}}
+    events = backtest.load_events(tokens, klines_dir=str(tmp_path), now=datetime(2025, 1, 2))
+    assert len(events) == 1 and events[0]["result_datetime"] == aware
+
+    print("✅ Тест test_naive_datetimes_treated_as_utc пройден")
+
+
+def test_events_from_klines_and_pnl(tmp_path):
+    """Тест загрузки свечей событий и расчёта PnL"""
+    result_datetime = datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc)
+    start = int(result_datetime.timestamp() * 1000)
+    rows = [
+        (start - 60000, 0.9, 0.9, 0.9, 0.9),  # Свеча до Result не используется
+        (start, 1.0, 1.035, 0.99, 1.03),
+        (start + 60000, 1.03, 1.07, 1.02, 1.06),
+    ]
+    file_path = backtest.kline_path("TEST", result_datetime, str(tmp_path))
+    with open(file_path, "w") as f:
+        f.write("\n".join(",".join(str(value) for value in row) for row in rows))
+
+    tokens = {"TEST_01.01.2025 13:00": {"token": "TEST", "result_datetime": result_datetime.isoformat()}}
+    events = backtest.load_events(tokens, klines_dir=str(tmp_path))
+    assert len(events) == 1 and events[0]["bars"][0][1] == 1.0
+
+    per_event, summary = backtest.run_backtest(events, leverage=10, margin=20, tp_levels=TP_LEVELS, stop_loss_pct=2.0)
+
+    # Купленный объём 140 USDT, доходность 40*3% + 30*6% + 30*6% = 4.8%
+    assert per_event[0]["pnl"] == pytest.approx(140 * 0.048)
+    assert summary["events"] == 1 and summary["win_rate"] == 1.0
+
+    print("✅ Тест test_events_from_klines_and_pnl пройден")
+
+
+def test_hundreds_of_events_fast():
+    """Тест что сотни событий с тысячами свечей считаются быстро"""
+    rng = np.random.default_rng(1)
+    events_count, bars = 500, 3600
+    close = np.cumprod(1 + rng.normal(0, 0.002, (events_count, bars)), axis=1)
+    high = close * 1.001
+    low = close * 0.999
+
+    started = time.perf_counter()
+    result = backtest.simulate(close, high, low, close, TP_LEVELS, 2.0)
+    elapsed = time.perf_counter() - started
+
+    assert result["return_pct"].shape == (events_count,)
+    assert elapsed < 5, f"Симуляция заняла {elapsed:.2f} сек"
+
+    print("✅ Тест test_hundreds_of_events_fast пройден")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Запуск тестов для бэктеста...")
+
+    try:
+        test_simulate_ladder_outcomes()
+        test_stop_moves_to_entry_after_tp1()
+        with tempfile.TemporaryDirectory() as tmp:
+            test_naive_datetimes_treated_as_utc(Path(tmp))
+        with tempfile.TemporaryDirectory() as tmp:
+            test_events_from_klines_and_pnl(Path(tmp))
+        test_hundreds_of_events_fast()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -32,6 +32,7 @@ from bytbit_trading_bot.utils import load_json, save_json, USERS_FILE
 def test_get_balance_success():
     """Тест успешного получения баланса"""
     import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
     
     # Создаем мок сессии
     mock_session = Mock()
@@ -72,8 +73,8 @@ def test_get_balance_success():
     save_json(USERS_FILE, users)
     
     # Мокаем создание сессии
-    original_HTTP = trading_module.HTTP
-    trading_module.HTTP = Mock(return_value=mock_session)
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
     
     try:
         trading_module.get_balance(test_user_id, mock_bot)
@@ -92,7 +93,7 @@ def test_get_balance_success():
         
         print("✅ Тест test_get_balance_success пройден")
     finally:
-        trading_module.HTTP = original_HTTP
+        sessions_module.HTTP = original_HTTP
 
 
 def test_get_balance_no_api_keys():
@@ -131,6 +132,7 @@ def test_get_balance_no_api_keys():
 def test_get_balance_api_error():
     """Тест обработки ошибки API"""
     import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
     
     mock_session = Mock()
     mock_session.get_wallet_balance.return_value = {
@@ -151,8 +153,8 @@ def test_get_balance_api_error():
     }
     save_json(USERS_FILE, users)
     
-    original_HTTP = trading_module.HTTP
-    trading_module.HTTP = Mock(return_value=mock_session)
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
     
     try:
         trading_module.get_balance(test_user_id, mock_bot)
@@ -167,7 +169,7 @@ def test_get_balance_api_error():
         
         print("✅ Тест test_get_balance_api_error пройден")
     finally:
-        trading_module.HTTP = original_HTTP
+        sessions_module.HTTP = original_HTTP
 
 
 if __name__ == "__main__":
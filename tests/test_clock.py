@@ -0,0 +1,71 @@
+"""
+Тесты для смещения часов и точного ожидания Result
+"""
+import sys
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, MagicMock
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def _server_time_response(offset):
+    now = time.time() + offset
+    return {"retCode": 0, "result": {"timeSecond": str(int(now)), "timeNano": str(int(now * 1e9))}}
+
+
+def test_measure_offset():
+    """Тест измерения смещения часов по get_server_time"""
+    import bytbit_trading_bot.clock as clock
+
+    session = Mock()
+    session.get_server_time.side_effect = lambda: _server_time_response(1.5)
+
+    offset = clock.measure_offset(session, samples=3)
+
+    assert session.get_server_time.call_count == 3
+    assert abs(offset - 1.5) < 0.01, f"Неверное смещение: {offset}"
+    assert abs(clock.exchange_time() - time.time() - 1.5) < 0.01
+
+    print("✅ Тест test_measure_offset пройден")
+
+
+def test_wait_until_exchange_time():
+    """Тест что ожидание срабатывает по часам биржи с точностью до миллисекунд"""
+    import bytbit_trading_bot.clock as clock
+
+    session = Mock()
+    session.get_server_time.side_effect = lambda: _server_time_response(-0.3)
+    clock.measure_offset(session, samples=1)
+
+    # Момент Result по часам биржи через 0.2 сек
+    target = datetime.fromtimestamp(clock.exchange_time(), timezone.utc) + timedelta(seconds=0.2)
+    fire_error = clock.wait_until(target)
+
+    assert 0 <= fire_error < 0.01, f"Ошибка срабатывания {fire_error * 1000:.1f} мс"
+
+    # Опоздавший вызов возвращается сразу и сообщает опоздание
+    late = clock.wait_until(target - timedelta(seconds=1))
+    assert late >= 1
+
+    print("✅ Тест test_wait_until_exchange_time пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для часов биржи...")
+
+    try:
+        test_measure_offset()
+        test_wait_until_exchange_time()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
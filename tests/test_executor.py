@@ -0,0 +1,87 @@
+"""
+Тесты для параллельного исполнения входов в позицию
+"""
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot.executor import run_for_users
+
+
+def test_users_run_concurrently():
+    """Тест что входы всех пользователей выполняются одновременно"""
+    user_ids = [1, 2, 3, 4, 5]
+    barrier = threading.Barrier(len(user_ids), timeout=5)
+
+    def fake_long_token(token, user_id, bot, timings=None):
+        # Барьер пройдёт только если все пользователи исполняются параллельно
+        barrier.wait()
+        timings["buy_ack"] = time.monotonic()
+
+    results = run_for_users(fake_long_token, "TEST", user_ids, Mock(), max_workers=len(user_ids))
+
+    assert [r["user_id"] for r in results] == user_ids, "Порядок результатов нарушен"
+    assert all(r["ok"] for r in results), "Не все входы успешны"
+    assert all(r["latency"] is not None and r["latency"] >= 0 for r in results), "Задержка не записана"
+
+    print("✅ Тест test_users_run_concurrently пройден")
+
+
+def test_concurrency_limit():
+    """Тест что параллельность ограничена max_workers"""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_long_token(token, user_id, bot, timings=None):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        timings["buy_ack"] = time.monotonic()
+
+    run_for_users(fake_long_token, "TEST", list(range(10)), Mock(), max_workers=3)
+
+    assert peak <= 3, f"Превышен лимит параллельности: {peak}"
+
+    print("✅ Тест test_concurrency_limit пройден")
+
+
+def test_failure_isolated_per_user():
+    """Тест что ошибка одного пользователя не мешает остальным"""
+    def fake_long_token(token, user_id, bot, timings=None):
+        if user_id == 2:
+            raise RuntimeError("boom")
+        timings["buy_ack"] = time.monotonic()
+
+    results = run_for_users(fake_long_token, "TEST", [1, 2, 3], Mock())
+    by_user = {r["user_id"]: r for r in results}
+
+    assert by_user[1]["ok"] and by_user[3]["ok"], "Ошибка повлияла на других пользователей"
+    assert not by_user[2]["ok"], "Ошибка пользователя не зафиксирована"
+    assert by_user[2]["error"] == "boom"
+
+    print("✅ Тест test_failure_isolated_per_user пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для параллельного исполнения...")
+
+    try:
+        test_users_run_concurrently()
+        test_concurrency_limit()
+        test_failure_isolated_per_user()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
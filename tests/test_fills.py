@@ -0,0 +1,200 @@
+"""
+Тесты для подтверждения исполнения через приватный WebSocket
+"""
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock, MagicMock
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Записанное сообщение потока order Bybit v5 для исполненного рыночного ордера
+FILLED_ORDER_MESSAGE = {
+    "id": "5923240c6880ab-c59f-420b-9adb-3639adc9dd90",
+    "topic": "order",
+    "creationTime": 1672364262474,
+    "data": [{
+        "symbol": "TESTUSDT",
+        "orderId": "buy-1",
+        "side": "Buy",
+        "orderType": "Market",
+        "orderStatus": "Filled",
+        "cumExecQty": "140",
+        "category": "linear",
+    }]
+}
+
+
+class FakeWebSocket:
+    """Локальная замена приватного WebSocket: выдаёт записанные сообщения из отдельного потока"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.callback = None
+        self.wallet_callback = None
+        self.execution_callback = None
+        self.position_callback = None
+        self.closed = False
+
+    def order_stream(self, callback):
+        self.callback = callback
+
+    def wallet_stream(self, callback):
+        self.wallet_callback = callback
+
+    def execution_stream(self, callback):
+        self.execution_callback = callback
+
+    def position_stream(self, callback):
+        self.position_callback = callback
+
+    def deliver(self, message, delay=0.0):
+        def run():
+            time.sleep(delay)
+            self.callback(message)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def exit(self):
+        self.closed = True
+
+
+def _open(fills):
+    sockets = []
+
+    def factory(**kwargs):
+        ws = FakeWebSocket(**kwargs)
+        sockets.append(ws)
+        return ws
+
+    fills.clear()
+    fills.WebSocket = factory
+    fills.open_stream("key", "secret")
+    return sockets[0]
+
+
+def test_fill_event_wakes_waiter():
+    """Тест что событие исполнения будит ожидание сразу, без опроса"""
+    import bytbit_trading_bot.fills as fills
+
+    original = fills.WebSocket
+    try:
+        ws = _open(fills)
+        assert ws.kwargs["channel_type"] == "private"
+
+        ws.deliver(FILLED_ORDER_MESSAGE, delay=0.05)
+        started = time.monotonic()
+        assert fills.wait_for_fill("key", "buy-1", timeout=2) is True
+        assert time.monotonic() - started < 1, "Ожидание не прервано событием"
+    finally:
+        fills.WebSocket = original
+
+    print("✅ Тест test_fill_event_wakes_waiter пройден")
+
+
+def test_wait_fallbacks():
+    """Тест отказа ордера, таймаута и отсутствия потока"""
+    import bytbit_trading_bot.fills as fills
+
+    original = fills.WebSocket
+    try:
+        ws = _open(fills)
+        rejected = {"topic": "order", "data": [{"orderId": "buy-2", "orderStatus": "Rejected"}]}
+        ws.deliver(rejected).join()
+
+        assert fills.wait_for_fill("key", "buy-2", timeout=1) is False
+        assert fills.wait_for_fill("key", "unknown", timeout=0.05) is None
+        assert fills.wait_for_fill("other-key", "buy-1", timeout=1) is None
+
+        fills.close_stream("key")
+        assert ws.closed and not fills.has_stream("key")
+    finally:
+        fills.WebSocket = original
+
+    print("✅ Тест test_wait_fallbacks пройден")
+
+
+def test_execute_long_skips_position_poll_on_fill():
+    """Тест что после события исполнения TP ставятся без паузы и опроса позиции"""
+    import bytbit_trading_bot.fills as fills
+    import bytbit_trading_bot.trading as trading_module
+
+    original = fills.WebSocket
+    try:
+        ws = _open(fills)
+        ws.deliver(FILLED_ORDER_MESSAGE, delay=0.05)
+
+        session = Mock()
+        session.place_order.return_value = {"retCode": 0, "result": {"orderId": "buy-1"}}
+        session.place_batch_order.return_value = {
+            "retCode": 0,
+            "result": {"list": [{"orderId": "tp1"}, {"orderId": "tp2"}]},
+            "retExtInfo": {"list": [{"code": 0}, {"code": 0}]}
+        }
+        plan = {
+            "user_id": 1, "token_symbol": "TESTUSDT", "api_key": "key", "session": session,
+            "leverage": 10, "margin": 20, "min_qty": 1.0,
+            "instrument": {"tick_size": 0.01, "qty_step": 1.0, "min_qty": 1.0},
+            **trading_module.build_ladder(1.0, 10, 20, {"tick_size": 0.01, "qty_step": 1.0, "min_qty": 1.0}),
+        }
+
+        started = time.monotonic()
+        trading_module.execute_long(plan, Mock())
+
+        assert time.monotonic() - started < 1, "Лишняя пауза после исполнения"
+        assert not session.get_positions.called, "Позиция опрошена несмотря на событие"
+        assert session.place_batch_order.called, "TP ордера не размещены"
+    finally:
+        fills.WebSocket = original
+
+    print("✅ Тест test_execute_long_skips_position_poll_on_fill пройден")
+
+
+def test_no_live_stream_for_overridden_endpoint():
+    """Тест что при BYBIT_ENDPOINT поток pybit не открывается, а фабрика потоков используется"""
+    import bytbit_trading_bot.fills as fills
+    from bytbit_trading_bot import sessions
+
+    original_ws, original_endpoint = fills.WebSocket, sessions.BYBIT_ENDPOINT
+    fills.WebSocket = Mock()
+    sessions.BYBIT_ENDPOINT = "http://127.0.0.1:8765"
+    try:
+        fills.clear()
+        fills.open_stream("key", "secret")
+        assert not fills.WebSocket.called, "Поток открыт на настоящей бирже"
+        assert not fills.has_stream("key")
+
+        ws = FakeWebSocket()
+        fills.set_stream_factory(lambda **kwargs: ws)
+        fills.open_stream("key", "secret")
+        assert fills.has_stream("key") and ws.callback is not None
+        assert not fills.WebSocket.called
+    finally:
+        fills.set_stream_factory(None)
+        fills.clear()
+        fills.WebSocket, sessions.BYBIT_ENDPOINT = original_ws, original_endpoint
+
+    print("✅ Тест test_no_live_stream_for_overridden_endpoint пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для подтверждения исполнения...")
+
+    try:
+        test_fill_event_wakes_waiter()
+        test_wait_fallbacks()
+        test_execute_long_skips_position_poll_on_fill()
+        test_no_live_stream_for_overridden_endpoint()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
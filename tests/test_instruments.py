@@ -0,0 +1,126 @@
+"""
+Тесты для кэша параметров инструментов
+"""
+import sys
+import os
+from unittest.mock import Mock, MagicMock
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def _instrument(symbol, tick_size, qty_step, min_qty):
+    return {
+        "symbol": symbol,
+        "priceFilter": {"tickSize": tick_size},
+        "lotSizeFilter": {"qtyStep": qty_step, "minQty": min_qty},
+    }
+
+
+def test_load_all_paginated():
+    """Тест загрузки всего списка инструментов постранично одним проходом"""
+    import bytbit_trading_bot.instruments as instruments
+
+    session = Mock()
+    session.get_instruments_info.side_effect = [
+        {"retCode": 0, "result": {"list": [_instrument("AUSDT", "0.01", "1", "1")], "nextPageCursor": "p2"}},
+        {"retCode": 0, "result": {"list": [_instrument("BUSDT", "0.0001", "10", "10")], "nextPageCursor": ""}},
+    ]
+
+    instruments.clear()
+    assert instruments.load_all(session) == 2
+
+    # Второй запрос продолжает с курсора
+    assert session.get_instruments_info.call_args_list[1][1]["cursor"] == "p2"
+
+    session.get_instruments_info.reset_mock()
+    instrument = instruments.get_instrument("BUSDT", session)
+    assert instrument == {"tick_size": 0.0001, "qty_step": 10.0, "min_qty": 10.0}
+    assert not session.get_instruments_info.called, "Запрос к бирже при наличии данных в кэше"
+
+    print("✅ Тест test_load_all_paginated пройден")
+
+
+def test_missing_symbol_triggers_targeted_refresh():
+    """Тест что отсутствующий символ загружается точечно и кэшируется"""
+    import bytbit_trading_bot.instruments as instruments
+
+    instruments.clear()
+    session = Mock()
+    session.get_instruments_info.return_value = {
+        "retCode": 0,
+        "result": {"list": [_instrument("NEWUSDT", "0.001", "0.1", "0.1")]},
+    }
+
+    instrument = instruments.get_instrument("NEWUSDT", session)
+    assert instrument["tick_size"] == 0.001
+    session.get_instruments_info.assert_called_once_with(category="linear", symbol="NEWUSDT")
+
+    instruments.get_instrument("NEWUSDT", session)
+    assert session.get_instruments_info.call_count == 1, "Повторный запрос для закэшированного символа"
+
+    print("✅ Тест test_missing_symbol_triggers_targeted_refresh пройден")
+
+
+def test_unknown_symbol():
+    """Тест что неизвестный символ возвращает None"""
+    import bytbit_trading_bot.instruments as instruments
+
+    instruments.clear()
+    session = Mock()
+    session.get_instruments_info.return_value = {"retCode": 0, "result": {"list": []}}
+
+    assert instruments.get_instrument("NONEUSDT", session) is None
+
+    print("✅ Тест test_unknown_symbol пройден")
+
+
+def test_concurrent_misses_share_one_request():
+    """Тест что одновременные промахи по новому символу делают один запрос"""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import bytbit_trading_bot.instruments as instruments
+
+    instruments.clear()
+    session = Mock()
+
+    def slow_info(**params):
+        time.sleep(0.1)
+        return {"retCode": 0, "result": {"list": [_instrument("NEWUSDT", "0.001", "1", "1")]}}
+
+    session.get_instruments_info.side_effect = slow_info
+    start = threading.Barrier(6)
+
+    def prearm_user(_):
+        start.wait()
+        return instruments.get_instrument("NEWUSDT", session)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(prearm_user, range(6)))
+
+    assert all(result == {"tick_size": 0.001, "qty_step": 1.0, "min_qty": 1.0} for result in results)
+    assert session.get_instruments_info.call_count == 1, \
+        f"Запросов instruments-info: {session.get_instruments_info.call_count}"
+
+    print("✅ Тест test_concurrent_misses_share_one_request пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для кэша инструментов...")
+
+    try:
+        test_load_all_paginated()
+        test_missing_symbol_triggers_targeted_refresh()
+        test_unknown_symbol()
+        test_concurrent_misses_share_one_request()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,116 @@
+"""
+Тесты для SQLite хранилища задач планировщика
+"""
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+
+
+def _apscheduler_modules():
+    return {name: module for name, module in sys.modules.items() if name.split('.')[0] == 'apscheduler'}
+
+
+# Другие тесты подменяют apscheduler моками, а здесь нужен настоящий пакет:
+# временно убираем моки, импортируем хранилище и возвращаем моки на место
+_mocked = _apscheduler_modules()
+for name in _mocked:
+    del sys.modules[name]
+try:
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.date import DateTrigger
+    from bytbit_trading_bot.jobstore import SQLiteJobStore
+    _real = _apscheduler_modules()
+finally:
+    sys.modules.update(_mocked)
+
+
+@pytest.fixture(autouse=True)
+def real_apscheduler():
+    """Подставляет настоящий apscheduler на время теста (нужен pickle задач)"""
+    saved = _apscheduler_modules()
+    sys.modules.update(_real)
+    yield
+    for name in _real:
+        sys.modules.pop(name, None)
+    sys.modules.update(saved)
+
+
+def _job_target(token):
+    return token
+
+
+def _start(db_path):
+    scheduler = BackgroundScheduler(jobstores={"default": SQLiteJobStore(db_path)}, timezone=timezone.utc)
+    scheduler.start(paused=True)
+    return scheduler
+
+
+def test_jobs_survive_restart(tmp_path):
+    """Тест что задачи восстанавливаются из базы после перезапуска"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    run_date = datetime.now(timezone.utc) + timedelta(hours=1)
+
+    scheduler = _start(db_path)
+    scheduler.add_job(
+        _job_target, trigger=DateTrigger(run_date=run_date), args=["TEST"],
+        id="token_TEST", misfire_grace_time=60, coalesce=True
+    )
+    scheduler.add_job(_job_target, trigger=DateTrigger(run_date=run_date + timedelta(hours=1)), args=["B"], id="token_B")
+    scheduler.shutdown(wait=False)
+
+    scheduler = _start(db_path)
+    try:
+        jobs = scheduler.get_jobs()
+        assert [job.id for job in jobs] == ["token_TEST", "token_B"], "Задачи не восстановлены по порядку"
+        assert jobs[0].args == ("TEST",)
+        assert jobs[0].misfire_grace_time == 60 and jobs[0].coalesce
+
+        scheduler.remove_job("token_B")
+        assert scheduler.get_job("token_B") is None
+    finally:
+        scheduler.shutdown(wait=False)
+
+    print("✅ Тест test_jobs_survive_restart пройден")
+
+
+def test_due_jobs_and_next_run_time(tmp_path):
+    """Тест выборки задач к исполнению и ближайшего времени запуска"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    now = datetime.now(timezone.utc)
+
+    scheduler = _start(db_path)
+    try:
+        scheduler.add_job(_job_target, trigger=DateTrigger(run_date=now + timedelta(minutes=5)), args=["A"], id="a")
+        scheduler.add_job(_job_target, trigger=DateTrigger(run_date=now + timedelta(minutes=1)), args=["B"], id="b")
+
+        store = scheduler._lookup_jobstore("default")
+        assert abs((store.get_next_run_time() - (now + timedelta(minutes=1))).total_seconds()) < 1
+        assert [job.id for job in store.get_due_jobs(now + timedelta(minutes=2))] == ["b"]
+    finally:
+        scheduler.shutdown(wait=False)
+
+    print("✅ Тест test_due_jobs_and_next_run_time пройден")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Запуск тестов для хранилища задач...")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            test_jobs_survive_restart(Path(tmp))
+        with tempfile.TemporaryDirectory() as tmp:
+            test_due_jobs_and_next_run_time(Path(tmp))
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,106 @@
+"""
+Тесты для лимитов запросов к Bybit и предохранителя
+"""
+import sys
+import os
+import time
+from unittest.mock import Mock, MagicMock, patch
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import limiter
+
+
+def test_breaker_opens_after_repeated_errors():
+    """Тест что после серии ошибок биржи запросы ключа не отправляются до паузы"""
+    session = Mock()
+    session.get_wallet_balance.return_value = {"retCode": 10016, "retMsg": "Server error"}
+    limited = limiter.LimitedSession(session, "key")
+
+    for _ in range(limiter.BREAKER_FAILURES):
+        assert limited.get_wallet_balance()["retCode"] == 10016
+
+    assert limited.get_wallet_balance()["retCode"] == limiter.CIRCUIT_OPEN
+    assert session.get_wallet_balance.call_count == limiter.BREAKER_FAILURES, "Запрос отправлен при разомкнутом предохранителе"
+
+    # Другие ключи не затронуты
+    other = Mock()
+    other.get_wallet_balance.return_value = {"retCode": 0}
+    assert limiter.LimitedSession(other, "other").get_wallet_balance()["retCode"] == 0
+
+    # После паузы пробный запрос проходит, успех замыкает предохранитель
+    session.get_wallet_balance.return_value = {"retCode": 0}
+    with patch.object(limiter.time, "monotonic", return_value=time.monotonic() + limiter.BREAKER_COOLDOWN + 1):
+        assert limited.get_wallet_balance()["retCode"] == 0
+        assert limited.get_wallet_balance()["retCode"] == 0
+
+    print("✅ Тест test_breaker_opens_after_repeated_errors пройден")
+
+
+def test_parameter_errors_do_not_open_breaker():
+    """Тест что ошибки параметров не размыкают предохранитель"""
+    session = Mock()
+    session.place_order.return_value = {"retCode": 10001, "retMsg": "params error"}
+    limited = limiter.LimitedSession(session, "key")
+
+    for _ in range(limiter.BREAKER_FAILURES + 2):
+        assert limited.place_order()["retCode"] == 10001
+
+    print("✅ Тест test_parameter_errors_do_not_open_breaker пройден")
+
+
+def test_orders_keep_priority_in_ip_budget():
+    """Тест что информационные запросы оставляют ордерам запас общего бюджета"""
+    limiter.configure(ip_rate=1, ip_burst=10)
+    session = Mock()
+    session.get_tickers.return_value = {"retCode": 0}
+    session.place_order.return_value = {"retCode": 0}
+    limited = limiter.LimitedSession(session)
+
+    reserve = 10 * limiter.BYBIT_PRIORITY_RESERVE
+    for _ in range(int(10 - reserve)):
+        limited.get_tickers()
+
+    # Информационный запрос упёрся бы в запас, а ордер проходит сразу
+    assert limiter._ip_bucket.try_acquire(reserve=reserve) > 0
+    started = time.perf_counter()
+    limited.place_order()
+    assert time.perf_counter() - started < 0.1, "Ордер ждал общий бюджет"
+
+    print("✅ Тест test_orders_keep_priority_in_ip_budget пройден")
+
+
+def test_rate_limit_response_pauses_key():
+    """Тест что ответ о лимите ключа приостанавливает его запросы этого класса"""
+    session = Mock()
+    session.place_order.return_value = {"retCode": 10006, "retMsg": "Too many visits"}
+    limiter.LimitedSession(session, "key").place_order()
+
+    assert limiter._key_bucket("key", "trade").try_acquire() > 0
+    assert limiter._key_bucket("key", "account").try_acquire() == 0
+
+    print("✅ Тест test_rate_limit_response_pauses_key пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для лимитов запросов...")
+
+    try:
+        test_breaker_opens_after_repeated_errors()
+        limiter.clear()
+        test_parameter_errors_do_not_open_breaker()
+        limiter.clear()
+        test_orders_keep_priority_in_ip_budget()
+        limiter.clear()
+        test_rate_limit_response_pauses_key()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,78 @@
+"""
+Тесты для общего снимка цены
+"""
+import sys
+import os
+from unittest.mock import Mock, MagicMock
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def _ticker(price):
+    return {"retCode": 0, "result": {"list": [{"lastPrice": str(price)}]}}
+
+
+def test_snapshot_shared_between_users():
+    """Тест что пользователи читают цену из одного снимка без повторных запросов"""
+    import bytbit_trading_bot.market_data as market_data
+
+    public_session = Mock()
+    public_session.get_tickers.return_value = _ticker(2.5)
+    assert market_data.refresh_price("TESTUSDT", public_session) == 2.5
+
+    user_sessions = [Mock() for _ in range(5)]
+    prices = [market_data.get_last_price("TESTUSDT", session) for session in user_sessions]
+
+    assert prices == [2.5] * 5, "Пользователи получили разные цены"
+    assert not any(session.get_tickers.called for session in user_sessions), "Лишние запросы цены"
+
+    print("✅ Тест test_snapshot_shared_between_users пройден")
+
+
+def test_stale_snapshot_refreshed():
+    """Тест что устаревший снимок обновляется запросом"""
+    import bytbit_trading_bot.market_data as market_data
+
+    session = Mock()
+    session.get_tickers.return_value = _ticker(1.0)
+    market_data.refresh_price("TESTUSDT", session)
+
+    session.get_tickers.return_value = _ticker(1.1)
+    assert market_data.get_last_price("TESTUSDT", session, max_age=-1) == 1.1
+    assert market_data.get_snapshot("TESTUSDT") == 1.1
+
+    print("✅ Тест test_stale_snapshot_refreshed пройден")
+
+
+def test_ladder_from_reference_price():
+    """Тест расчёта лестницы TP/SL от опорной цены"""
+    from bytbit_trading_bot.trading import build_ladder
+
+    ladder = build_ladder(1.0, 10, 20, {"tick_size": 0.01, "qty_step": 1.0, "min_qty": 1.0})
+
+    assert ladder["qty"] == 200
+    assert ladder["buy_qty"] == 140
+    assert ladder["tp1"] == 1.03 and ladder["tp2"] == 1.06 and ladder["sl"] == 0.98
+    assert ladder["tp1_qty"] == 56 and ladder["tp2_qty"] == 42
+
+    print("✅ Тест test_ladder_from_reference_price пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для снимка цены...")
+
+    try:
+        test_snapshot_shared_between_users()
+        test_stale_snapshot_refreshed()
+        test_ladder_from_reference_price()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
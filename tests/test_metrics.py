@@ -0,0 +1,68 @@
+"""
+Тесты для замеров задержек и экспорта метрик
+"""
+import sys
+import os
+from unittest.mock import Mock
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import metrics
+
+
+def test_span_histogram_rendered():
+    """Тест что спаны попадают в гистограмму и выводятся в формате Prometheus"""
+    metrics.clear()
+    metrics.observe(metrics.SPAN_METRIC, 0.003, span="schedule_token")
+    metrics.observe(metrics.SPAN_METRIC, 0.2, span="schedule_token")
+    with metrics.span("process_message"):
+        pass
+
+    text = metrics.render()
+
+    assert "# TYPE bot_span_seconds histogram" in text
+    assert 'bot_span_seconds_bucket{span="schedule_token",le="0.005"} 1' in text
+    assert 'bot_span_seconds_bucket{span="schedule_token",le="+Inf"} 2' in text
+    assert 'bot_span_seconds_count{span="schedule_token"} 2' in text
+    assert 'bot_span_seconds_count{span="process_message"} 1' in text
+
+    print("✅ Тест test_span_histogram_rendered пройден")
+
+
+def test_traced_session_records_rest_calls(tmp_path):
+    """Тест что каждый REST вызов сессии замеряется и метрики пишутся в файл"""
+    metrics.clear()
+    session = Mock()
+    session.place_order.return_value = {"retCode": 0}
+
+    traced = metrics.TracedSession(session)
+    assert traced.place_order(symbol="TESTUSDT") == {"retCode": 0}
+    session.place_order.assert_called_once_with(symbol="TESTUSDT")
+
+    file_path = str(tmp_path / "metrics.prom")
+    metrics.write_textfile(file_path)
+    with open(file_path, encoding="utf-8") as f:
+        assert 'bot_span_seconds_count{method="place_order",span="rest"} 1' in f.read()
+    # Файл доступен на чтение коллектору под другим пользователем
+    assert os.stat(file_path).st_mode & 0o777 == 0o644
+
+    print("✅ Тест test_traced_session_records_rest_calls пройден")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Запуск тестов для метрик...")
+
+    try:
+        test_span_histogram_rendered()
+        with tempfile.TemporaryDirectory() as tmp:
+            test_traced_session_records_rest_calls(Path(tmp))
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
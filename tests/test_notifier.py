@@ -0,0 +1,127 @@
+"""
+Тесты для очереди уведомлений Telegram
+"""
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import notifier
+from bytbit_trading_bot.ratelimit import TokenBucket
+
+
+class TooManyRequests(Exception):
+    """Ответ Telegram 429 в формате telebot ApiTelegramException"""
+
+    def __init__(self, retry_after):
+        super().__init__("Error code: 429. Description: Too Many Requests")
+        self.error_code = 429
+        self.result_json = {"ok": False, "error_code": 429, "parameters": {"retry_after": retry_after}}
+
+
+class RecordingBot:
+    """Бот, записывающий отправленные сообщения"""
+
+    def __init__(self, fail_first=None, hold=None):
+        self.sent = []
+        self.fail_first = fail_first
+        self.hold = hold
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **kwargs):
+        if self.hold is not None:
+            self.hold.wait(2)
+            self.hold = None
+        if self.fail_first is not None:
+            error, self.fail_first = self.fail_first, None
+            raise error
+        with self.lock:
+            self.sent.append((chat_id, text, time.monotonic()))
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_sync_fallback_without_dispatcher():
+    """Тест что без запущенного диспетчера сообщение отправляется сразу"""
+    bot = Mock()
+    assert notifier.QueuedBot(bot).send_message(1, "text", parse_mode="Markdown")
+    bot.send_message.assert_called_once_with(1, "text", parse_mode="Markdown")
+
+    print("✅ Тест test_sync_fallback_without_dispatcher пройден")
+
+
+def test_trade_alerts_go_first():
+    """Тест что торговые уведомления обгоняют напоминания в очереди"""
+    hold = threading.Event()
+    bot = RecordingBot(hold=hold)
+    notifier.start()
+    try:
+        notifier.notify(bot, 100, "first", priority=notifier.PRIORITY_REMINDER)
+        time.sleep(0.05)  # Диспетчер занят первым сообщением
+        for chat_id in range(101, 104):
+            notifier.notify(bot, chat_id, "reminder", priority=notifier.PRIORITY_REMINDER)
+        notifier.QueuedBot(bot, notifier.PRIORITY_TRADE).send_message(200, "trade")
+        hold.set()
+
+        assert _wait_for(lambda: len(bot.sent) == 5), "Не все сообщения отправлены"
+        assert [text for _, text, _ in bot.sent][:2] == ["first", "trade"]
+    finally:
+        notifier.stop()
+
+    print("✅ Тест test_trade_alerts_go_first пройден")
+
+
+def test_retry_after_429():
+    """Тест повторной отправки после ответа 429 с паузой retry_after"""
+    bot = RecordingBot(fail_first=TooManyRequests(0.3))
+    notifier.start()
+    try:
+        started = time.monotonic()
+        notifier.notify(bot, 300, "retry me", priority=notifier.PRIORITY_TRADE)
+
+        assert _wait_for(lambda: len(bot.sent) == 1), "Сообщение не отправлено повторно"
+        assert bot.sent[0][2] - started >= 0.3, "Пауза retry_after не соблюдена"
+    finally:
+        notifier.stop()
+
+    print("✅ Тест test_retry_after_429 пройден")
+
+
+def test_token_bucket_limits_rate():
+    """Тест что корзина токенов ограничивает частоту после исчерпания запаса"""
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.1, "Третий токен выдан без ожидания"
+
+    bucket.drain(0.5)
+    assert bucket.try_acquire() > 0.5
+
+    print("✅ Тест test_token_bucket_limits_rate пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для очереди уведомлений...")
+
+    try:
+        test_sync_fallback_without_dispatcher()
+        test_trade_alerts_go_first()
+        test_retry_after_429()
+        test_token_bucket_limits_rate()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
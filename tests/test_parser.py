@@ -0,0 +1,123 @@
+"""
+Тесты для пакетной обработки истории канала
+"""
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import Mock, MagicMock, patch
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Мокаем telebot
+mock_telebot = MagicMock()
+sys.modules['telebot'] = mock_telebot
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def test_history_ingested_in_one_write():
+    """Тест что история разбирается в кандидатов, дедуплицируется и записывается одной операцией"""
+    import bytbit_trading_bot.parser as parser_module
+
+    history = [
+        "NEWA\nStart 01.01.2030 10:00 UTC\nResult 14.01.2030 11:00 UTC",
+        "Обычная новость",
+        "NEWA\nStart 01.01.2030 10:00 UTC\nResult 14.01.2030 11:00 UTC",
+        "NEWB\nResult 15.01.2030 12:00",
+        "OLD\nResult 01.01.2020 12:00",
+        None,
+    ]
+
+    add_tokens = Mock(side_effect=lambda tokens: [key for key in tokens if key.startswith("NEWB")])
+    with patch.object(parser_module, "add_tokens", add_tokens), \
+            patch.object(parser_module, "add_token") as add_token, \
+            patch.object(parser_module, "schedule_token") as schedule_token, \
+            patch.object(parser_module, "notify_users_about_new_token") as notify:
+        added = parser_module.ingest_messages(history)
+
+    assert add_tokens.call_count == 1, "Токены записаны не одной операцией"
+    assert sorted(add_tokens.call_args[0][0]) == ["NEWA_14.01.2030 11:00", "NEWB_15.01.2030 12:00"]
+    assert not add_token.called, "Лишняя запись по одному токену"
+
+    # Планируются только действительно новые токены
+    assert added == 1
+    assert schedule_token.call_count == 1 and schedule_token.call_args[0][0] == "NEWB"
+    assert notify.call_count == 1
+
+    print("✅ Тест test_history_ingested_in_one_write пройден")
+
+
+class FakeClient:
+    """Клиент Telethon с историей канала в памяти"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+
+    def iter_messages(self, channel, limit=None, min_id=0, reverse=False):
+        self.calls.append({"limit": limit, "min_id": min_id, "reverse": reverse})
+        selected = [message for message in self.messages if message.id > min_id]
+        selected = selected if reverse else list(reversed(selected))
+        if limit is not None:
+            selected = selected[:limit]
+
+        async def generate():
+            for message in selected:
+                yield message
+        return generate()
+
+
+def test_catch_up_from_checkpoint(tmp_path):
+    """Тест что после перезапуска читаются только сообщения после чекпоинта"""
+    import bytbit_trading_bot.parser as parser_module
+    import bytbit_trading_bot.utils as utils_module
+
+    messages = [SimpleNamespace(id=message_id, text=f"post {message_id}") for message_id in range(1, 8)]
+    client = FakeClient(messages)
+    ingested = []
+
+    def ingest(texts):
+        ingested.append(list(texts))
+        return 0
+
+    with patch.object(utils_module, "PARSER_STATE_FILE", str(tmp_path / "parser_state.json")), \
+            patch.object(parser_module, "client", client), \
+            patch.object(parser_module, "ingest_messages", side_effect=ingest), \
+            patch.object(parser_module, "MESSAGES_HISTORY_LIMIT", 3), \
+            patch.object(parser_module, "CATCHUP_BATCH_SIZE", 2):
+        # Первый запуск: последние MESSAGES_HISTORY_LIMIT сообщений
+        asyncio.run(parser_module.check_recent_messages())
+        assert client.calls[-1]["limit"] == 3
+        assert utils_module.get_channel_checkpoint(parser_module.CHANNEL) == 7
+
+        # За время простоя пришли новые сообщения
+        messages.extend(SimpleNamespace(id=message_id, text=f"post {message_id}") for message_id in range(8, 13))
+        ingested.clear()
+        asyncio.run(parser_module.check_recent_messages())
+
+        assert client.calls[-1] == {"limit": None, "min_id": 7, "reverse": True}
+        assert ingested == [["post 8", "post 9"], ["post 10", "post 11"], ["post 12"]], "Пропуск не прочитан пачками"
+        assert utils_module.get_channel_checkpoint(parser_module.CHANNEL) == 12
+
+    print("✅ Тест test_catch_up_from_checkpoint пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для парсера...")
+
+    try:
+        test_history_ingested_in_one_write()
+        import tempfile
+        from pathlib import Path
+        with tempfile.TemporaryDirectory() as tmp:
+            test_catch_up_from_checkpoint(Path(tmp))
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
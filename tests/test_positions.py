@@ -0,0 +1,186 @@
+"""
+Тесты для сопровождения открытых сделок по событиям приватного потока
+"""
+import sys
+import os
+from unittest.mock import Mock, MagicMock, patch
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import positions
+
+
+def _legs():
+    return [
+        {"name": "TP1", "price": 1.05, "qty": 40.0, "link_id": "tp1"},
+        {"name": "TP2", "price": 1.10, "qty": 30.0, "link_id": "tp2"},
+        {"name": "TP3", "price": 1.20, "qty": 30.0, "link_id": "tp3"},
+    ]
+
+
+def _track(session, bot):
+    positions.track("key", 123, "TESTUSDT", session, bot, 1.0, 0.001, "buy", _legs())
+
+
+def _execution(link_id, qty, leaves, price="1.0", stop_order_type=""):
+    return {"topic": "execution", "data": [{
+        "symbol": "TESTUSDT", "orderId": f"id-{link_id}", "orderLinkId": link_id, "execQty": qty,
+        "leavesQty": leaves, "execPrice": price, "stopOrderType": stop_order_type,
+    }]}
+
+
+def _position(size, avg_price="0"):
+    return {"topic": "position", "data": [{"symbol": "TESTUSDT", "size": size, "avgPrice": avg_price}]}
+
+
+def _sync():
+    """Реакции выполняются сразу, а не в пуле"""
+    return patch.object(positions, "_submit", side_effect=lambda func, *args: func(*args))
+
+
+def test_tp1_fill_moves_stop_to_entry():
+    """Тест что исполнение TP1 переносит стоп на среднюю цену входа один раз"""
+    session, bot = Mock(), Mock()
+    session.set_trading_stop.return_value = {"retCode": 0}
+    _track(session, bot)
+
+    with _sync():
+        positions.handle_message("key", _execution("buy", "60", "40", price="1.01"))
+        positions.handle_message("key", _execution("buy", "40", "0", price="1.02"))
+        # Частичное исполнение TP1 стоп не трогает
+        positions.handle_message("key", _execution("tp1", "10", "30"))
+        session.set_trading_stop.assert_not_called()
+
+        positions.handle_message("key", _execution("tp1", "30", "0"))
+        positions.handle_message("key", _execution("tp2", "30", "0"))
+
+    session.set_trading_stop.assert_called_once()
+    kwargs = session.set_trading_stop.call_args[1]
+    assert kwargs["symbol"] == "TESTUSDT"
+    assert kwargs["stopLoss"] == "1.014", "Стоп должен стоять на средней цене входа"
+    assert "безубыток" in bot.send_message.call_args[0][1]
+    assert positions.has_trades("key")
+
+    print("✅ Тест test_tp1_fill_moves_stop_to_entry пройден")
+
+
+def test_stop_loss_cancels_remaining_tp():
+    """Тест что срабатывание стопа отменяет неисполненные TP и завершает сопровождение"""
+    session, bot = Mock(), Mock()
+    session.cancel_order.return_value = {"retCode": 0}
+    session.set_trading_stop.return_value = {"retCode": 0}
+    _track(session, bot)
+
+    with _sync():
+        positions.handle_message("key", _execution("tp1", "40", "0"))
+        positions.handle_message("key", _execution("sl", "60", "0", stop_order_type="StopLoss"))
+        # Закрытие позиции после стопа уже ничего не делает
+        positions.handle_message("key", {"topic": "position", "data": [{"symbol": "TESTUSDT", "size": "0"}]})
+
+    cancelled = [call[1]["orderLinkId"] for call in session.cancel_order.call_args_list]
+    assert cancelled == ["tp2", "tp3"], f"Отменены не те ордера: {cancelled}"
+    assert not positions.has_trades("key")
+    assert "Stop Loss" in bot.send_message.call_args[0][1]
+
+    print("✅ Тест test_stop_loss_cancels_remaining_tp пройден")
+
+
+def test_position_close_and_unrelated_messages():
+    """Тест что закрытие позиции завершает сопровождение, а чужие события игнорируются"""
+    session, bot = Mock(), Mock()
+    session.cancel_order.return_value = {"retCode": 0}
+    _track(session, bot)
+
+    with _sync():
+        positions.handle_message("other", _execution("tp1", "40", "0"))
+        positions.handle_message("key", {"topic": "execution", "data": [{"symbol": "OTHERUSDT", "orderLinkId": "tp1"}]})
+        positions.handle_message("key", {"topic": "order", "data": [{"symbol": "TESTUSDT", "orderLinkId": "tp1"}]})
+        # Нулевая позиция до исполнения покупки сделку не закрывает
+        positions.handle_message("key", _position("0"))
+        positions.handle_message("key", _position("60", "1.01"))
+        assert positions.has_trades("key")
+        session.set_trading_stop.assert_not_called()
+
+        positions.handle_message("key", _position("0"))
+
+    assert session.cancel_order.call_count == 3
+    assert not positions.has_trades("key")
+
+    print("✅ Тест test_position_close_and_unrelated_messages пройден")
+
+
+def test_stop_rounded_to_tick_from_position_avg_price():
+    """Тест что стоп в безубыток берётся из avgPrice позиции и округляется до шага цены"""
+    session, bot = Mock(), Mock()
+    session.set_trading_stop.return_value = {"retCode": 0}
+    _track(session, bot)
+
+    with _sync():
+        positions.handle_message("key", _position("100", "1.0137426"))
+        positions.handle_message("key", _execution("tp1", "40", "0"))
+
+    assert session.set_trading_stop.call_args[1]["stopLoss"] == "1.013"
+
+    print("✅ Тест test_stop_rounded_to_tick_from_position_avg_price пройден")
+
+
+def test_execute_long_tracks_before_buy_ack():
+    """Тест что исполнение покупки, пришедшее до ответа на запрос, учитывается в цене входа"""
+    import bytbit_trading_bot.trading as trading_module
+
+    instrument = {"tick_size": 0.001, "qty_step": 1.0, "min_qty": 1.0}
+    plan = {
+        "user_id": 1, "token_symbol": "TESTUSDT", "api_key": "key", "session": None,
+        "leverage": 10, "margin": 20, "min_qty": 1.0, "instrument": instrument,
+        **trading_module.build_ladder(1.0, 10, 20, instrument),
+    }
+    buy_link_id = trading_module.retry.order_link_id(1, "TESTUSDT", "BUY")
+
+    def place_order(**order):
+        # Событие потока приходит раньше ответа REST
+        positions.handle_message("key", {"topic": "execution", "data": [{
+            "symbol": "TESTUSDT", "orderLinkId": buy_link_id, "execQty": "140", "execPrice": "1.0021",
+        }]})
+        return {"retCode": 0, "result": {"orderId": "buy-1"}}
+
+    session = Mock()
+    session.place_order.side_effect = place_order
+    session.get_positions.return_value = {"retCode": 0, "result": {"list": [{"symbol": "TESTUSDT", "size": "140"}]}}
+    session.place_batch_order.return_value = {"retCode": 1, "retMsg": "batch disabled"}
+    plan["session"] = session
+
+    with patch.object(trading_module.time, "sleep"):
+        trading_module.execute_long(plan, Mock())
+
+    trade = positions.get_trade("key", "TESTUSDT")
+    assert trade is not None, "Сделка не сопровождается"
+    assert abs(trade["entry"] - 1.0021) < 1e-9, "Цена входа не взята из исполнения покупки"
+    assert set(trade["legs"]) == {leg["link_id"] for leg in trade["legs"].values()}
+
+    print("✅ Тест test_execute_long_tracks_before_buy_ack пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для сопровождения сделок...")
+
+    try:
+        test_tp1_fill_moves_stop_to_entry()
+        positions.clear()
+        test_stop_loss_cancels_remaining_tp()
+        positions.clear()
+        test_position_close_and_unrelated_messages()
+        positions.clear()
+        test_stop_rounded_to_tick_from_position_avg_price()
+        positions.clear()
+        test_execute_long_tracks_before_buy_ack()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
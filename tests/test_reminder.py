@@ -133,12 +133,13 @@ def test_schedule_token_with_reminder():
     finally:
         scheduler_module.scheduler = original_scheduler
     
-    # Проверяем, что были добавлены 2 задачи: открытие позиции и напоминание
-    assert mock_scheduler.add_job.call_count == 2, f"Ожидалось 2 задачи, получено {mock_scheduler.add_job.call_count}"
+    # Проверяем, что были добавлены 3 задачи: открытие позиции, подготовка планов и напоминание
+    assert mock_scheduler.add_job.call_count == 3, f"Ожидалось 3 задачи, получено {mock_scheduler.add_job.call_count}"
     
     # Проверяем что задачи были добавлены
     call_ids = [call[1]['id'] for call in mock_scheduler.add_job.call_args_list]
     assert any('token_TEST' in call_id for call_id in call_ids), "Задача открытия позиции не найдена"
+    assert any('prearm_TEST' in call_id for call_id in call_ids), "Задача подготовки планов не найдена"
     assert any('reminder_TEST' in call_id for call_id in call_ids), "Задача напоминания не найдена"
     
     print("✅ Тест schedule_token_with_reminder пройден")
@@ -0,0 +1,130 @@
+"""
+Тесты для идемпотентных повторов ордеров
+"""
+import sys
+import os
+from unittest.mock import Mock, MagicMock, patch
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import retry
+
+ORDER = {"category": "linear", "symbol": "TESTUSDT", "side": "Buy", "orderType": "Market", "qty": 10}
+
+
+class InvalidRequestError(Exception):
+    """Повторяет исключение pybit для ответа с ненулевым retCode"""
+
+    def __init__(self, status_code):
+        super().__init__(f"ErrCode: {status_code}")
+        self.status_code = status_code
+
+
+def test_link_id_is_deterministic():
+    """Тест что orderLinkId одинаков для повторов и различается по пользователю и ноге"""
+    link_id = retry.order_link_id(1, "TESTUSDT", "BUY", "20300101")
+
+    assert link_id == retry.order_link_id(1, "TESTUSDT", "BUY", "20300101")
+    assert link_id != retry.order_link_id(2, "TESTUSDT", "BUY", "20300101")
+    assert link_id != retry.order_link_id(1, "TESTUSDT", "TP1", "20300101")
+    assert link_id != retry.order_link_id(1, "TESTUSDT", "BUY", "20300102")
+    assert link_id.startswith("BUY-") and len(link_id) <= retry.LINK_ID_LENGTH
+
+    print("✅ Тест test_link_id_is_deterministic пройден")
+
+
+def test_event_scope_separates_entries():
+    """Тест что область orderLinkId задаётся событием, а не календарным днём"""
+    from datetime import datetime, timezone, timedelta
+
+    morning = datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc)
+    evening = datetime(2030, 1, 1, 18, 0, tzinfo=timezone.utc)
+    moscow = morning.astimezone(timezone(timedelta(hours=3)))
+
+    # То же событие (в любом часовом поясе) - тот же orderLinkId, другое событие того же дня - другой
+    assert retry.event_scope(morning) == retry.event_scope(moscow) == retry.event_scope(morning.replace(tzinfo=None))
+    assert retry.event_scope(morning) != retry.event_scope(evening)
+    # Вход без события не совпадает ни с каким другим
+    assert retry.event_scope() != retry.event_scope()
+
+    print("✅ Тест test_event_scope_separates_entries пройден")
+
+
+def test_timeout_does_not_duplicate_order():
+    """Тест что после таймаута ордер не отправляется повторно, если он уже дошёл до биржи"""
+    session = Mock()
+    session.place_order.side_effect = TimeoutError("Read timed out")
+    session.get_open_orders.return_value = {
+        "retCode": 0, "result": {"list": [{"orderId": "landed", "orderLinkId": "BUY-1"}]}
+    }
+
+    with patch.object(retry.time, "sleep"):
+        result = retry.place_order(session, "BUY-1", max_attempts=3, **ORDER)
+
+    assert result["ok"] and result["order_id"] == "landed"
+    assert session.place_order.call_count == 1, "Ордер отправлен повторно"
+    assert session.place_order.call_args[1]["orderLinkId"] == "BUY-1"
+
+    print("✅ Тест test_timeout_does_not_duplicate_order пройден")
+
+
+def test_retry_classification():
+    """Тест что временные ошибки повторяются, фатальные - нет, а дубль orderLinkId считается успехом"""
+    session = Mock()
+    session.place_order.side_effect = [
+        {"retCode": 10006, "retMsg": "Too many visits"},
+        {"retCode": 0, "result": {"orderId": "second"}},
+    ]
+    with patch.object(retry.time, "sleep") as sleep:
+        result = retry.place_order(session, "BUY-2", max_attempts=3, **ORDER)
+    assert result["ok"] and result["order_id"] == "second" and result["attempts"] == 2
+    assert 0 <= sleep.call_args[0][0] <= retry.RETRY_BASE_DELAY
+    assert not session.get_open_orders.called, "Лишняя проверка после явного отказа биржи"
+
+    session = Mock()
+    session.place_order.return_value = {"retCode": 110007, "retMsg": "Insufficient balance"}
+    with patch.object(retry.time, "sleep"):
+        result = retry.place_order(session, "BUY-3", max_attempts=3, **ORDER)
+    assert not result["ok"] and session.place_order.call_count == 1, "Фатальная ошибка повторена"
+
+    session = Mock()
+    session.place_order.side_effect = InvalidRequestError(retry.DUPLICATE_LINK_ID)
+    session.get_open_orders.return_value = {"retCode": 0, "result": {"list": []}}
+    session.get_order_history.return_value = {
+        "retCode": 0, "result": {"list": [{"orderId": "filled", "orderLinkId": "BUY-4"}]}
+    }
+    result = retry.place_order(session, "BUY-4", max_attempts=3, **ORDER)
+    assert result["ok"] and result["order_id"] == "filled"
+
+    print("✅ Тест test_retry_classification пройден")
+
+
+def test_backoff_is_bounded():
+    """Тест что пауза растёт экспоненциально и ограничена сверху"""
+    for attempt in range(10):
+        delay = retry.backoff_delay(attempt, base=0.2, cap=2.0)
+        assert 0 <= delay <= min(2.0, 0.2 * 2 ** attempt)
+
+    print("✅ Тест test_backoff_is_bounded пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для повторов ордеров...")
+
+    try:
+        test_link_id_is_deterministic()
+        test_event_scope_separates_entries()
+        test_timeout_does_not_duplicate_order()
+        test_retry_classification()
+        test_backoff_is_bounded()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
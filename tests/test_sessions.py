@@ -0,0 +1,89 @@
+"""
+Тесты для реестра HTTP сессий Bybit
+"""
+import sys
+import os
+from unittest.mock import Mock, MagicMock
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def test_session_reused_per_key():
+    """Тест что повторные вызовы возвращают ту же сессию"""
+    import bytbit_trading_bot.sessions as sessions_module
+
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(side_effect=lambda **kwargs: Mock())
+
+    try:
+        first = sessions_module.get_session("key_a", "secret_a")
+        second = sessions_module.get_session("key_a", "secret_a")
+        other = sessions_module.get_session("key_b", "secret_b")
+
+        assert first is second, "Сессия создана повторно"
+        assert first is not other, "Сессии разных ключей совпадают"
+        assert sessions_module.HTTP.call_count == 2
+
+        print("✅ Тест test_session_reused_per_key пройден")
+    finally:
+        sessions_module.HTTP = original_HTTP
+
+
+def test_invalidate_on_key_change():
+    """Тест что после смены ключей создаётся новая сессия"""
+    import bytbit_trading_bot.sessions as sessions_module
+
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(side_effect=lambda **kwargs: Mock())
+
+    try:
+        first = sessions_module.get_session("key_a", "secret_a")
+        sessions_module.invalidate("key_a")
+        second = sessions_module.get_session("key_a", "secret_a")
+        assert first is not second, "Сессия не удалена после invalidate"
+
+        # Смена секрета при том же ключе тоже создаёт новую сессию
+        third = sessions_module.get_session("key_a", "secret_new")
+        assert third is not second, "Сессия со старым секретом переиспользована"
+
+        print("✅ Тест test_invalidate_on_key_change пройден")
+    finally:
+        sessions_module.HTTP = original_HTTP
+
+
+def test_evict_idle():
+    """Тест закрытия неактивных сессий"""
+    import bytbit_trading_bot.sessions as sessions_module
+
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(side_effect=lambda **kwargs: Mock())
+
+    try:
+        first = sessions_module.get_session("key_a", "secret_a")
+        assert sessions_module.evict_idle(max_idle=3600) == 0, "Активная сессия закрыта"
+        assert sessions_module.evict_idle(max_idle=-1) == 1, "Неактивная сессия не закрыта"
+        assert sessions_module.get_session("key_a", "secret_a") is not first
+
+        print("✅ Тест test_evict_idle пройден")
+    finally:
+        sessions_module.HTTP = original_HTTP
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для реестра сессий...")
+
+    try:
+        test_session_reused_per_key()
+        test_invalidate_on_key_change()
+        test_evict_idle()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,192 @@
+"""
+Тесты для шардированного исполнения входов
+"""
+import sys
+import os
+import queue
+import threading
+from unittest.mock import Mock, MagicMock, patch
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import shards
+
+
+def _start_fake_shards(count, alive=None):
+    """Шарды-потоки вместо процессов: тот же цикл _serve, очереди в памяти"""
+    results = queue.Queue()
+    workers = []
+    for index in range(count):
+        commands = queue.Queue()
+        thread = threading.Thread(target=shards._serve, args=(index, commands, results, Mock()), daemon=True)
+        if alive is None or index in alive:
+            thread.start()
+        workers.append({"process": thread, "commands": commands})
+    shards._attach(workers, results)
+
+
+def _fake_handle(calls):
+    def handle(command, bot):
+        calls.append((command["kind"], command["token"], list(command["user_ids"])))
+        if command["kind"] == "prearm":
+            return len(command["user_ids"])
+        return [{"user_id": user_id, "ok": True, "latency": 0.01, "error": None} for user_id in command["user_ids"]]
+    return handle
+
+
+def test_users_dispatched_to_shards():
+    """Тест что пользователи делятся по шардам и результаты собираются в порядке user_ids"""
+    calls = []
+    user_ids = [10, 11, 12, 13, 14]
+
+    with patch.object(shards, "_handle", side_effect=_fake_handle(calls)):
+        _start_fake_shards(2)
+        try:
+            assert shards.is_running()
+            assert shards.prearm("TEST", user_ids) == 5
+            results = shards.enter("TEST", user_ids, Mock(), trigger_time=0.0)
+        finally:
+            shards.stop()
+
+    enter_calls = sorted(call[2] for call in calls if call[0] == "enter")
+    assert enter_calls == [[10, 12, 14], [11, 13]], f"Неверное распределение: {enter_calls}"
+    assert [result["user_id"] for result in results] == user_ids
+    assert all(result["ok"] for result in results)
+    assert not shards.is_running()
+
+    print("✅ Тест test_users_dispatched_to_shards пройден")
+
+
+def test_dead_shard_handled_locally():
+    """Тест что пользователи неработающего шарда обслуживаются в основном процессе"""
+    calls = []
+    threads_seen = set()
+    handle = _fake_handle(calls)
+
+    def tracking_handle(command, bot):
+        threads_seen.add(threading.current_thread().name)
+        return handle(command, bot)
+
+    with patch.object(shards, "_handle", side_effect=tracking_handle):
+        # Шард 1 не запущен
+        _start_fake_shards(2, alive={0})
+        try:
+            results = shards.enter("TEST", [1, 2, 3, 4], Mock(), trigger_time=0.0)
+        finally:
+            shards._workers[1]["process"] = Mock(is_alive=Mock(return_value=False), join=Mock())
+            shards.stop()
+
+    assert all(result["ok"] for result in results), "Пользователи упавшего шарда не обслужены"
+    assert threading.current_thread().name in threads_seen, "Упавший шард не исполнен локально"
+
+    print("✅ Тест test_dead_shard_handled_locally пройден")
+
+
+def test_shard_metrics_exported_by_coordinator():
+    """Тест что снимки гистограмм шардов попадают в экспорт метрик координатора"""
+    from bytbit_trading_bot import metrics
+
+    metrics.clear()
+    metrics.observe(metrics.SPAN_METRIC, 0.003, span="execute_long")
+    shard_histograms = metrics.snapshot()
+
+    # Шард отправляет снимок своих гистограмм по расписанию
+    sent, stopped = queue.Queue(), threading.Event()
+    with patch.object(shards, "METRICS_EXPORT_INTERVAL", 0.01):
+        thread = threading.Thread(target=shards._export_metrics, args=(1, sent, stopped), daemon=True)
+        thread.start()
+        request_id, index, value, _ = sent.get(timeout=2)
+        stopped.set()
+        thread.join(1)
+    assert request_id is None and index == 1 and value == shard_histograms
+
+    _start_fake_shards(2)
+    try:
+        # Повторный снимок того же шарда заменяет прежний, а не складывается с ним
+        for _ in range(2):
+            shards._results.put((None, 1, value, None))
+    finally:
+        shards.stop()
+        shards._reader.join(2)
+
+    text = metrics.render()
+    assert 'bot_span_seconds_count{span="execute_long"} 2' in text, text
+    metrics.clear()
+
+    print("✅ Тест test_shard_metrics_exported_by_coordinator пройден")
+
+
+def test_shard_applies_user_configs(tmp_path):
+    """Тест что шард применяет конфигурации из команды и закрывает состояние сменённых ключей"""
+    import json
+    from bytbit_trading_bot import utils
+
+    users_file = str(tmp_path / "users.json")
+    old = {"enabled": True, "api_key": "old", "api_secret": "s", "leverage": 10, "margin": 20}
+    with open(users_file, "w", encoding="utf-8") as f:
+        json.dump({"7": old}, f)
+
+    def enter(config):
+        command = {"kind": "enter", "token": "TEST", "user_ids": [7], "users": {"7": config}, "trigger_time": 0.0}
+        shards._handle(command, Mock())
+
+    with patch.object(utils, "USERS_FILE", users_file), patch.object(utils, "STORAGE_BACKEND", "json"), \
+            patch.object(shards, "invalidate_session") as invalidate_session, \
+            patch.object(shards, "close_stream") as close_stream, \
+            patch.object(shards, "invalidate_account") as invalidate_account, \
+            patch.object(shards, "drop_user_plans") as drop_user_plans, \
+            patch.object(shards, "refresh_price"), patch.object(shards, "reprice_plans"), \
+            patch.object(shards, "discard_plans"), patch.object(shards, "run_for_users", return_value=[]):
+        utils.invalidate_users_cache()
+        try:
+            assert utils.get_user_config(7)["api_key"] == "old"
+
+            # Без изменений ничего не сбрасывается
+            enter(old)
+            assert not drop_user_plans.called and not invalidate_session.called
+
+            # Изменилась только маржа - план отбрасывается, ключ остаётся
+            enter({**old, "margin": 50})
+            drop_user_plans.assert_called_once_with(7)
+            assert not invalidate_session.called
+            assert utils.get_user_config(7)["margin"] == 50
+
+            # Сменились ключи - сессия, поток и кэш счёта прежнего ключа закрываются
+            enter({**old, "margin": 50, "api_key": "new", "api_secret": "s2"})
+            invalidate_session.assert_called_once_with("old")
+            close_stream.assert_called_once_with("old")
+            invalidate_account.assert_called_once_with("old")
+            assert utils.get_user_config(7)["api_key"] == "new"
+
+            # Шард не пишет файл пользователей
+            with open(users_file, encoding="utf-8") as f:
+                assert json.load(f) == {"7": old}
+        finally:
+            utils.invalidate_users_cache()
+
+    print("✅ Тест test_shard_applies_user_configs пройден")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Запуск тестов для шардов...")
+
+    try:
+        test_users_dispatched_to_shards()
+        test_dead_shard_handled_locally()
+        test_shard_metrics_exported_by_coordinator()
+        with tempfile.TemporaryDirectory() as tmp:
+            test_shard_applies_user_configs(Path(tmp))
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
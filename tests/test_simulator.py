@@ -0,0 +1,130 @@
+"""
+Тесты для локального симулятора Bybit
+"""
+import sys
+import os
+import requests
+
+# Добавляем scripts в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import bybit_simulator
+
+
+def test_order_and_position_flow():
+    """Тест что рыночная покупка через симулятор открывает позицию"""
+    server, state, endpoint = bybit_simulator.start(price=2.0)
+    try:
+        ticker = requests.get(f"{endpoint}/v5/market/tickers", params={"category": "linear", "symbol": "SIMUSDT"}).json()
+        assert ticker["result"]["list"][0]["lastPrice"] == "2.0"
+
+        headers = {"X-BAPI-API-KEY": "key"}
+        order = requests.post(f"{endpoint}/v5/order/create", headers=headers, json={
+            "category": "linear", "symbol": "SIMUSDT", "side": "Buy", "orderType": "Market", "qty": "10"
+        }).json()
+        assert order["retCode"] == 0 and order["result"]["orderId"]
+
+        positions = requests.get(f"{endpoint}/v5/position/list", headers=headers, params={"symbol": "SIMUSDT"}).json()
+        assert positions["result"]["list"][0]["size"] == "10.0"
+
+        # Повтор с тем же orderLinkId отклоняется, ордер находится по нему
+        linked = {"category": "linear", "symbol": "SIMUSDT", "side": "Buy", "orderType": "Market", "qty": "1", "orderLinkId": "BUY-1"}
+        assert requests.post(f"{endpoint}/v5/order/create", headers=headers, json=linked).json()["retCode"] == 0
+        assert requests.post(f"{endpoint}/v5/order/create", headers=headers, json=linked).json()["retCode"] == 110072
+        found = requests.get(f"{endpoint}/v5/order/realtime", headers=headers, params={"orderLinkId": "BUY-1"}).json()
+        assert found["result"]["list"][0]["orderLinkId"] == "BUY-1"
+    finally:
+        server.shutdown()
+
+    print("✅ Тест test_order_and_position_flow пройден")
+
+
+def test_error_injection_and_rate_limit():
+    """Тест инъекции ошибок и лимита запросов на ключ"""
+    server, state, endpoint = bybit_simulator.start(error_rate=1.0, error_code=10001)
+    try:
+        response = requests.get(f"{endpoint}/v5/market/time").json()
+        assert response["retCode"] == 10001
+    finally:
+        server.shutdown()
+
+    server, state, endpoint = bybit_simulator.start(rate_limit=1, rate_burst=2)
+    try:
+        headers = {"X-BAPI-API-KEY": "key"}
+        codes = [requests.get(f"{endpoint}/v5/market/time", headers=headers).json()["retCode"] for _ in range(3)]
+        assert codes == [0, 0, 10006], f"Лимит не сработал: {codes}"
+    finally:
+        server.shutdown()
+
+    print("✅ Тест test_error_injection_and_rate_limit пройден")
+
+
+def test_required_params_validated():
+    """Тест что ордер без обязательного camelCase параметра отклоняется кодом 10001 и не открывает позицию"""
+    state = bybit_simulator.BybitState()
+    snake = {"category": "linear", "symbol": "SIMUSDT", "side": "Buy", "order_type": "Market", "qty": "10"}
+    response = bybit_simulator.handle(state, "POST", "/v5/order/create", snake, "key")
+    assert response["retCode"] == 10001 and "orderType" in response["retMsg"]
+    assert not state.orders and not state.positions
+
+    limit = {"category": "linear", "symbol": "SIMUSDT", "side": "Sell", "orderType": "Limit", "qty": "5"}
+    assert bybit_simulator.handle(state, "POST", "/v5/order/create", limit, "key")["retCode"] == 10001
+
+    batch = bybit_simulator.handle(state, "POST", "/v5/order/create-batch", {"category": "linear", "request": [
+        {**limit, "price": "1.1"},
+        {"symbol": "SIMUSDT", "side": "Sell", "order_type": "Limit", "qty": "5", "price": "1.2"},
+    ]}, "key")
+    assert batch["retCode"] == 0
+    assert [status["code"] for status in batch["retExtInfo"]["list"]] == [0, 10001]
+    assert len(state.orders) == 1
+
+    print("✅ Тест test_required_params_validated пройден")
+
+
+def test_stream_emits_fill_events():
+    """Тест что поток симулятора присылает исполнение рыночной покупки"""
+    import threading
+
+    state = bybit_simulator.BybitState(price=2.0)
+    stream = state.stream("key")
+    received = {}
+    done = threading.Event()
+
+    def callback(message):
+        received[message["topic"]] = message["data"][0]
+        if len(received) == 3:
+            done.set()
+
+    stream.order_stream(callback)
+    stream.execution_stream(callback)
+    stream.position_stream(callback)
+
+    order = {"category": "linear", "symbol": "SIMUSDT", "side": "Buy", "orderType": "Market", "qty": "10", "orderLinkId": "BUY-1"}
+    response = bybit_simulator.handle(state, "POST", "/v5/order/create", order, "key")
+    assert done.wait(2), f"События не пришли: {received}"
+    assert received["order"]["orderId"] == response["result"]["orderId"]
+    assert received["order"]["orderStatus"] == "Filled"
+    assert received["execution"]["orderLinkId"] == "BUY-1" and received["execution"]["execPrice"] == "2.0"
+    assert received["position"]["size"] == "10.0"
+
+    # Закрытый поток событий не получает
+    stream.exit()
+    assert not state.streams["key"]
+
+    print("✅ Тест test_stream_emits_fill_events пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для симулятора Bybit...")
+
+    try:
+        test_order_and_position_flow()
+        test_error_injection_and_rate_limit()
+        test_required_params_validated()
+        test_stream_emits_fill_events()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,84 @@
+"""
+Тесты для пакетного расчёта объёмов и цен
+"""
+import sys
+import os
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+# Мокаем pybit
+sys.modules['pybit'] = MagicMock()
+sys.modules['pybit.unified_trading'] = MagicMock()
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import sizing
+
+INSTRUMENT = {"tick_size": 0.0001, "qty_step": 0.01, "min_qty": 0.01}
+
+
+def _floor(value, step):
+    return float(Decimal(value) // Decimal(step) * Decimal(step))
+
+
+def test_batch_is_exact():
+    """Тест что цены и объёмы округляются вниз точно, без ошибок float"""
+    # 205.23 * 0.98 во float даёт 201.12539999..., точное значение 201.1254
+    ladder = sizing.size_batch(205.23, INSTRUMENT, [(10, 33.33)])[0]
+    assert ladder["sl"] == 201.1254
+
+    qty = _floor(Decimal("333.3") / Decimal("205.23"), "0.01")
+    buy_qty = _floor(Decimal(str(qty)) * Decimal("0.7"), "0.01")
+    assert ladder["qty"] == qty and ladder["buy_qty"] == buy_qty
+    assert ladder["tp1"] == _floor(Decimal("205.23") * Decimal("1.03"), "0.0001")
+    assert ladder["tp1_qty"] == _floor(Decimal(str(buy_qty)) * Decimal("0.4"), "0.01")
+    assert [leg["name"] for leg in ladder["tp_levels"]] == ["TP1", "TP2"]
+
+    print("✅ Тест test_batch_is_exact пройден")
+
+
+def test_batch_matches_single_user():
+    """Тест что пакетный расчёт совпадает с расчётом для каждого пользователя отдельно"""
+    accounts = [(10, 20), (5, 100), (12.5, 33.33), (1, 5)]
+    batch = sizing.size_batch(0.1234, INSTRUMENT, accounts)
+    assert batch == [sizing.size_batch(0.1234, INSTRUMENT, [account])[0] for account in accounts]
+
+    print("✅ Тест test_batch_matches_single_user пройден")
+
+
+def test_plans_repriced_in_one_pass():
+    """Тест что подготовленные планы пересчитываются по снимку цены"""
+    import bytbit_trading_bot.prearm as prearm_module
+
+    instrument = {"tick_size": 0.01, "qty_step": 1.0, "min_qty": 1.0}
+    old = sizing.size_batch(1.0, instrument, [(10, 20)])[0]
+    plans = {
+        1: {"leverage": 10, "margin": 20, "instrument": instrument, **old},
+        2: {"leverage": 5, "margin": 50, "instrument": instrument, **old},
+    }
+    with patch.dict(prearm_module._plans, {"TEST": plans}), \
+            patch.object(prearm_module, "get_snapshot", return_value=2.0):
+        assert prearm_module.reprice_plans("TEST") == 2
+        repriced = dict(prearm_module._plans["TEST"])
+
+    assert repriced[1]["price"] == 2.0 and repriced[1]["qty"] == 100.0
+    assert repriced[2]["qty"] == 125.0
+    assert repriced[1]["tp1"] == 2.06
+
+    print("✅ Тест test_plans_repriced_in_one_pass пройден")
+
+
+if __name__ == "__main__":
+    print("Запуск тестов для расчёта объёмов...")
+
+    try:
+        test_batch_is_exact()
+        test_batch_matches_single_user()
+        test_plans_repriced_in_one_pass()
+
+        print("\n✅ Все тесты пройдены успешно!")
+    except Exception as e:
+        print(f"\n❌ Ошибка в тестах: {e}")
+        import traceback
+        traceback.print_exc()
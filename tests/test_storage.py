@@ -0,0 +1,91 @@
+"""
+Тесты для SQLite хранилища
+"""
+import sys
+import os
+
+# Добавляем src в путь
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bytbit_trading_bot import storage
+
+
+def _token(token, result_datetime):
+    return {"token": token, "result_date": "", "result_datetime": result_datetime, "added_at": ""}
+
+
+def test_users_roundtrip_and_enabled_column(tmp_path):
+    """Тест сохранения пользователей и признака enabled"""
+    db_path = str(tmp_path / "bot.sqlite3")
+
+    storage.save_users(db_path, {
+        "1": {"enabled": True, "api_key": "a"},
+        "2": {"enabled": False, "api_key": "b"},
+    })
+    storage.save_users(db_path, {"2": {"enabled": True, "api_key": "b2"}})
+
+    users = storage.load_users(db_path)
+    assert users["2"]["api_key"] == "b2", "Обновление пользователя не сохранено"
+    rows = storage.connect(db_path).execute("SELECT user_id FROM users WHERE enabled = 1").fetchall()
+    assert sorted(user_id for (user_id,) in rows) == ["1", "2"]
+
+    storage.close_all()
+
+
+def test_replace_users_is_atomic(tmp_path):
+    """Тест что при сбое замены пользователей остаются прежние"""
+    from unittest.mock import patch
+
+    db_path = str(tmp_path / "bot.sqlite3")
+    storage.save_users(db_path, {"1": {"enabled": True, "api_key": "a"}})
+
+    with patch.object(storage, "_UPSERT_USER", "INSERT INTO missing_table VALUES (?, ?, ?)"):
+        try:
+            storage.replace_users(db_path, {"2": {"enabled": True, "api_key": "b"}})
+            assert False, "Ошибка вставки не поднята"
+        except Exception as e:
+            assert "missing_table" in str(e)
+    assert set(storage.load_users(db_path)) == {"1"}, "Пользователи удалены без вставки новых"
+
+    storage.replace_users(db_path, {"2": {"enabled": True, "api_key": "b"}})
+    assert set(storage.load_users(db_path)) == {"2"}
+
+    storage.close_all()
+
+
+def test_tokens_deduplicated_and_upcoming_sorted(tmp_path):
+    """Тест добавления токенов без дублей и выборки будущих по дате"""
+    db_path = str(tmp_path / "bot.sqlite3")
+
+    added = storage.add_tokens(db_path, {
+        "B_1": _token("B", "2030-01-02T12:00:00+03:00"),
+        "A_1": _token("A", "2030-01-01T12:00:00+03:00"),
+        "OLD_1": _token("OLD", "2020-01-01T12:00:00+03:00"),
+    })
+    assert sorted(added) == ["A_1", "B_1", "OLD_1"]
+
+    # Повторное добавление существующего токена пропускается
+    assert storage.add_tokens(db_path, {"A_1": _token("A", "2030-01-01T12:00:00+03:00")}) == []
+    assert storage.count_tokens(db_path) == 3
+
+    upcoming = storage.get_upcoming_tokens(db_path, "2025-01-01T00:00:00+03:00")
+    assert [token_key for token_key, _ in upcoming] == ["A_1", "B_1"]
+
+    storage.close_all()
+
+
+def test_schema_has_indexes(tmp_path):
+    """Тест наличия индекса по result_datetime"""
+    db_path = str(tmp_path / "bot.sqlite3")
+    conn = storage.connect(db_path)
+
+    indexes = {row[1] for row in conn.execute("SELECT type, name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_tokens_result_datetime" in indexes
+
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT token_key FROM tokens WHERE result_datetime > ? ORDER BY result_datetime",
+        ("2025",),
+    ).fetchall()
+    assert any("idx_tokens_result_datetime" in row[-1] for row in plan), "Запрос не использует индекс"
+
+    storage.close_all()
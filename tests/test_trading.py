@@ -32,6 +32,7 @@ from bytbit_trading_bot.utils import load_json, save_json, USERS_FILE
 def test_order_retry_on_failure():
     """Тест повторных попыток при неудачном размещении ордера"""
     import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
     
     # Создаем мок сессии
     mock_session = Mock()
@@ -55,7 +56,7 @@ def test_order_retry_on_failure():
         "retCode": 0,
         "result": {"list": [{"coin": [{"walletBalance": "100"}]}]}
     }
-    mock_session.get_open_positions.return_value = {
+    mock_session.get_positions.return_value = {
         "retCode": 0,
         "result": {"list": [{"symbol": "TESTUSDT", "size": "100"}]}
     }
@@ -66,7 +67,7 @@ def test_order_retry_on_failure():
     def place_order_side_effect(*args, **kwargs):
         nonlocal buy_order_calls
         # Проверяем, это ордер покупки (Market Buy) или TP (Limit Sell)
-        if kwargs.get("order_type") == "Market" and kwargs.get("side") == "Buy":
+        if kwargs.get("orderType") == "Market" and kwargs.get("side") == "Buy":
             buy_order_calls += 1
             if buy_order_calls == 1:
                 return {"retCode": 10001, "retMsg": "Insufficient balance"}
@@ -97,15 +98,15 @@ def test_order_retry_on_failure():
     save_json(USERS_FILE, users)
     
     # Мокаем создание сессии
-    original_HTTP = trading_module.HTTP
-    trading_module.HTTP = Mock(return_value=mock_session)
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
     
     try:
         trading_module.long_token("TEST", test_user_id, mock_bot)
         
         # Проверяем, что было 3 попытки покупки (плюс TP ордера)
         buy_calls = [call for call in mock_session.place_order.call_args_list 
-                    if call[1].get("order_type") == "Market" and call[1].get("side") == "Buy"]
+                    if call[1].get("orderType") == "Market" and call[1].get("side") == "Buy"]
         assert len(buy_calls) == 3, f"Ожидалось 3 попытки покупки, получено {len(buy_calls)}"
         
         # Проверяем, что в итоге отправилось успешное сообщение
@@ -115,12 +116,13 @@ def test_order_retry_on_failure():
         
         print("✅ Тест test_order_retry_on_failure пройден")
     finally:
-        trading_module.HTTP = original_HTTP
+        sessions_module.HTTP = original_HTTP
 
 
 def test_order_check_result():
     """Тест проверки результата размещения ордера"""
     import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
     
     mock_session = Mock()
     mock_session.set_leverage.return_value = {"retCode": 0}
@@ -136,7 +138,7 @@ def test_order_check_result():
         "retCode": 0,
         "result": {"list": [{"coin": [{"walletBalance": "100"}]}]}
     }
-    mock_session.get_open_positions.return_value = {
+    mock_session.get_positions.return_value = {
         "retCode": 0,
         "result": {"list": [{"symbol": "TESTUSDT", "size": "100"}]}
     }
@@ -162,8 +164,8 @@ def test_order_check_result():
     }
     save_json(USERS_FILE, users)
     
-    original_HTTP = trading_module.HTTP
-    trading_module.HTTP = Mock(return_value=mock_session)
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
     
     try:
         trading_module.long_token("TEST", test_user_id, mock_bot)
@@ -178,12 +180,13 @@ def test_order_check_result():
         
         print("✅ Тест test_order_check_result пройден")
     finally:
-        trading_module.HTTP = original_HTTP
+        sessions_module.HTTP = original_HTTP
 
 
 def test_order_failure_after_all_retries():
     """Тест что при всех неудачных попытках отправляется ошибка"""
     import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
     
     mock_session = Mock()
     mock_session.set_leverage.return_value = {"retCode": 0}
@@ -221,8 +224,8 @@ def test_order_failure_after_all_retries():
     }
     save_json(USERS_FILE, users)
     
-    original_HTTP = trading_module.HTTP
-    trading_module.HTTP = Mock(return_value=mock_session)
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
     
     try:
         trading_module.long_token("TEST", test_user_id, mock_bot)
@@ -238,12 +241,13 @@ def test_order_failure_after_all_retries():
         
         print("✅ Тест test_order_failure_after_all_retries пройден")
     finally:
-        trading_module.HTTP = original_HTTP
+        sessions_module.HTTP = original_HTTP
 
 
 def test_position_verification():
     """Тест проверки открытой позиции после размещения ордера"""
     import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
     
     mock_session = Mock()
     mock_session.set_leverage.return_value = {"retCode": 0}
@@ -265,7 +269,7 @@ def test_position_verification():
     }
     
     # Позиция не найдена
-    mock_session.get_open_positions.return_value = {
+    mock_session.get_positions.return_value = {
         "retCode": 0,
         "result": {"list": []}  # Нет позиций
     }
@@ -285,14 +289,14 @@ def test_position_verification():
     }
     save_json(USERS_FILE, users)
     
-    original_HTTP = trading_module.HTTP
-    trading_module.HTTP = Mock(return_value=mock_session)
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
     
     try:
         trading_module.long_token("TEST", test_user_id, mock_bot)
         
         # Проверяем, что была вызвана проверка позиции
-        assert mock_session.get_open_positions.called, "Проверка позиции не была вызвана"
+        assert mock_session.get_positions.called, "Проверка позиции не была вызвана"
         
         # Проверяем, что было отправлено предупреждение
         warning_calls = [call for call in mock_bot.send_message.call_args_list 
@@ -301,7 +305,173 @@ def test_position_verification():
         
         print("✅ Тест test_position_verification пройден")
     finally:
-        trading_module.HTTP = original_HTTP
+        sessions_module.HTTP = original_HTTP
+
+
+def test_prearmed_plan_only_places_orders():
+    """Тест что по подготовленному плану в момент Result отправляются только ордера"""
+    import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.sessions as sessions_module
+    import bytbit_trading_bot.prearm as prearm_module
+    
+    mock_session = Mock()
+    mock_session.set_leverage.return_value = {"retCode": 0}
+    mock_session.get_instruments_info.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"tickSize": "0.01", "lotSizeFilter": {"qtyStep": "1", "minQty": "1"}}]}
+    }
+    mock_session.get_tickers.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"lastPrice": "1.0"}]}
+    }
+    mock_session.get_wallet_balance.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"coin": [{"walletBalance": "100"}]}]}
+    }
+    mock_session.get_positions.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"symbol": "TESTUSDT", "size": "100"}]}
+    }
+    mock_session.place_order.return_value = {
+        "retCode": 0,
+        "result": {"orderId": "12345"}
+    }
+    
+    mock_bot = Mock()
+    mock_bot.send_message = Mock()
+    
+    test_user_id = 99995
+    users = {
+        str(test_user_id): {
+            "enabled": True,
+            "api_key": "test_key",
+            "api_secret": "test_secret",
+            "leverage": 10,
+            "margin": 20
+        }
+    }
+    save_json(USERS_FILE, users)
+    
+    original_HTTP = sessions_module.HTTP
+    sessions_module.HTTP = Mock(return_value=mock_session)
+    
+    try:
+        armed = prearm_module.arm_token("TEST", [test_user_id])
+        assert armed == 1, "План не подготовлен"
+        assert mock_session.set_leverage.called, "Плечо не установлено при подготовке"
+        assert not mock_session.place_order.called, "Ордер отправлен до Result"
+        
+        mock_session.get_instruments_info.reset_mock()
+        mock_session.get_wallet_balance.reset_mock()
+        mock_session.set_leverage.reset_mock()
+        
+        timings = {}
+        prearm_module.enter_position("TEST", test_user_id, mock_bot, timings=timings)
+        
+        assert mock_session.place_order.called, "Ордер покупки не отправлен"
+        assert "buy_ack" in timings, "Время подтверждения покупки не записано"
+        assert not mock_session.get_instruments_info.called, "Информация об инструменте запрошена повторно"
+        assert not mock_session.get_wallet_balance.called, "Баланс запрошен повторно"
+        assert not mock_session.set_leverage.called, "Плечо установлено повторно"
+        
+        # План одноразовый
+        assert prearm_module.take_plan("TEST", test_user_id) is None, "План не удалён после использования"
+        
+        print("✅ Тест test_prearmed_plan_only_places_orders пройден")
+    finally:
+        sessions_module.HTTP = original_HTTP
+
+
+def test_prearm_failure_reported_once():
+    """Тест что об отказе подготовки плана пользователь узнаёт один раз - при входе"""
+    import bytbit_trading_bot.trading as trading_module
+    import bytbit_trading_bot.prearm as prearm_module
+    
+    mock_bot = Mock()
+    
+    with patch.object(trading_module, "get_user_config", return_value={}):
+        assert prearm_module.arm_token("TEST", [99996]) == 0
+        prearm_module.enter_position("TEST", 99996, mock_bot)
+    
+    messages = [call[0][1] for call in mock_bot.send_message.call_args_list]
+    assert messages == ["❌ Не настроены API ключи Bybit"], f"Неверные уведомления: {messages}"
+    
+    print("✅ Тест test_prearm_failure_reported_once пройден")
+
+
+def test_config_change_drops_armed_plans():
+    """Тест что смена ключей или маржи удаляет подготовленные планы пользователя по всем токенам"""
+    import bytbit_trading_bot.prearm as prearm_module
+    import bytbit_trading_bot.bot as bot_module
+    
+    config = {"enabled": True, "api_key": "old_key", "api_secret": "old_secret", "leverage": 10, "margin": 20}
+    plans = {"AAA": {99995: {"api_key": "old_key"}, 1: {}}, "BBB": {99995: {"api_key": "old_key"}}}
+    
+    def message(text):
+        return Mock(text=text, from_user=Mock(id=99995))
+    
+    with patch.dict(prearm_module._plans, plans, clear=True), \
+            patch.object(bot_module, "get_user_config", side_effect=lambda user_id: dict(config)), \
+            patch.object(bot_module, "save_user_config"), \
+            patch.object(bot_module, "invalidate_session"), patch.object(bot_module, "close_stream"), \
+            patch.object(bot_module, "invalidate_account"):
+        bot_module.process_api_keys(message("new_key new_secret"))
+        assert prearm_module.take_plan("AAA", 99995) is None
+        assert prearm_module.take_plan("BBB", 99995) is None
+        assert 1 in prearm_module._plans["AAA"], "Удалён план другого пользователя"
+        
+        prearm_module._plans["AAA"][99995] = {"margin": 20}
+        bot_module.process_margin(message("50"))
+        assert prearm_module.take_plan("AAA", 99995) is None
+    
+    print("✅ Тест test_config_change_drops_armed_plans пройден")
+
+
+def test_tp_ladder_single_batch_request():
+    """Тест что лестница TP отправляется одним batch запросом с отчётом по каждому уровню"""
+    from bytbit_trading_bot.trading import place_tp_ladder
+    
+    mock_session = Mock()
+    mock_session.place_batch_order.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"orderId": "tp1-id"}, {"orderId": ""}]},
+        "retExtInfo": {"list": [{"code": 0, "msg": "OK"}, {"code": 110017, "msg": "reduce-only rejected"}]}
+    }
+    legs = [
+        {"name": "TP1", "price": 1.03, "qty": 56},
+        {"name": "TP2", "price": 1.06, "qty": 42},
+    ]
+    
+    results = place_tp_ladder(mock_session, "TESTUSDT", legs)
+    
+    assert mock_session.place_batch_order.call_count == 1, "TP отправлены не одним запросом"
+    assert len(mock_session.place_batch_order.call_args.kwargs["request"]) == 2
+    assert not mock_session.place_order.called, "Лишние одиночные ордера"
+    assert results[0]["ok"] and results[0]["order_id"] == "tp1-id"
+    assert not results[1]["ok"] and results[1]["error"] == "reduce-only rejected"
+    
+    print("✅ Тест test_tp_ladder_single_batch_request пройден")
+
+
+def test_tp_ladder_falls_back_to_single_orders():
+    """Тест что при отказе batch запроса TP размещаются по одному"""
+    from bytbit_trading_bot.trading import place_tp_ladder
+    
+    mock_session = Mock()
+    mock_session.place_batch_order.return_value = {"retCode": 10001, "retMsg": "batch not supported"}
+    mock_session.place_order.return_value = {"retCode": 0, "result": {"orderId": "single"}}
+    legs = [
+        {"name": "TP1", "price": 1.03, "qty": 56},
+        {"name": "TP2", "price": 1.06, "qty": 42},
+        {"name": "TP3", "price": 1.1, "qty": 20},
+    ]
+    
+    results = place_tp_ladder(mock_session, "TESTUSDT", legs)
+    
+    assert mock_session.place_order.call_count == 3
+    assert all(result["ok"] for result in results)
+    
+    print("✅ Тест test_tp_ladder_falls_back_to_single_orders пройден")
 
 
 if __name__ == "__main__":
@@ -315,6 +485,11 @@ if __name__ == "__main__":
         test_order_check_result()
         test_order_failure_after_all_retries()
         test_position_verification()
+        test_prearmed_plan_only_places_orders()
+        test_prearm_failure_reported_once()
+        test_config_change_drops_armed_plans()
+        test_tp_ladder_single_batch_request()
+        test_tp_ladder_falls_back_to_single_orders()
         
         print("\n✅ Все тесты пройдены успешно!")
     except Exception as e:
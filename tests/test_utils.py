@@ -32,3 +32,138 @@ def test_round_to_qty_step():
     assert round_to_qty_step(100.7, 1) == 100.0
     assert round_to_qty_step(100.3, 1) == 100.0
 
+
+
+def test_user_store_in_memory(tmp_path):
+    """Тест что конфигурация пользователей читается из памяти, а изменения пишутся на диск"""
+    from unittest.mock import patch
+    import bytbit_trading_bot.utils as utils
+
+    users_file = str(tmp_path / "users.json")
+
+    with patch.object(utils, "USERS_FILE", users_file), patch.object(utils, "STORAGE_BACKEND", "json"):
+        try:
+            utils.save_json(users_file, {
+                "1": {"enabled": True, "api_key": "a"},
+                "2": {"enabled": False, "api_key": "b"},
+            })
+
+            assert utils.get_enabled_user_ids() == [1]
+
+            # Повторные обращения не читают файл
+            with patch.object(utils, "load_json", side_effect=AssertionError("users.json прочитан повторно")):
+                assert utils.is_user_enabled(1)
+                assert not utils.is_user_enabled(2)
+                config = utils.get_user_config(2)
+                config["enabled"] = True
+                assert not utils.is_user_enabled(2), "Изменение копии затронуло кэш"
+
+                utils.save_user_config(2, config)
+                assert utils.get_enabled_user_ids() == [1, 2]
+
+            utils.flush_users()
+            assert utils.load_json(users_file)["2"]["enabled"] is True
+        finally:
+            # Кэш из временного файла не должен достаться другим тестам
+            utils.invalidate_users_cache()
+
+
+def test_flush_users_does_not_block_readers(tmp_path):
+    """Тест что запись пользователей на диск идёт без блокировки кэша"""
+    import threading
+    from unittest.mock import patch
+    import bytbit_trading_bot.utils as utils
+
+    users_file = str(tmp_path / "users.json")
+    writing = threading.Event()
+    release = threading.Event()
+
+    def slow_write(file_path, data):
+        writing.set()
+        release.wait(5)
+        return True
+
+    with patch.object(utils, "USERS_FILE", users_file), patch.object(utils, "STORAGE_BACKEND", "json"):
+        try:
+            utils.save_json(users_file, {"1": {"enabled": True, "api_key": "a"}})
+            with patch.object(utils, "_write_json", side_effect=slow_write):
+                utils.save_user_config(1, {"enabled": True, "api_key": "b"})
+                flusher = threading.Thread(target=utils.flush_users)
+                flusher.start()
+                assert writing.wait(5)
+
+                reader = threading.Thread(target=utils.get_user_config, args=(1,))
+                reader.start()
+                reader.join(1)
+                assert not reader.is_alive(), "Чтение конфигурации ждёт записи на диск"
+
+                release.set()
+                flusher.join(5)
+        finally:
+            release.set()
+            utils.invalidate_users_cache()
+
+
+def test_save_json_atomic(tmp_path):
+    """Тест что при ошибке записи исходный файл остаётся целым"""
+    import bytbit_trading_bot.utils as utils
+
+    file_path = str(tmp_path / "data.json")
+    utils.save_json(file_path, {"a": 1})
+
+    # Несериализуемые данные - запись падает на середине
+    utils.save_json(file_path, {"a": 2, "b": object()})
+
+    assert utils.load_json(file_path) == {"a": 1}, "Исходный файл повреждён"
+    assert os.listdir(tmp_path) == ["data.json"], "Временный файл не удалён"
+
+
+def test_save_json_keeps_file_mode(tmp_path):
+    """Тест что атомарная запись сохраняет права файла, а новый файл получает 0644"""
+    import stat
+    import bytbit_trading_bot.utils as utils
+
+    file_path = str(tmp_path / "data.json")
+    utils.save_json(file_path, {"a": 1})
+    assert stat.S_IMODE(os.stat(file_path).st_mode) == 0o644
+
+    os.chmod(file_path, 0o640)
+    utils.save_json(file_path, {"a": 2})
+    assert stat.S_IMODE(os.stat(file_path).st_mode) == 0o640, "Права файла изменены записью"
+    assert utils.load_json(file_path) == {"a": 2}
+
+
+def test_tokens_journal(tmp_path):
+    """Тест что токены дописываются в журнал и сворачиваются в tokens.json"""
+    from unittest.mock import patch
+    import bytbit_trading_bot.utils as utils
+
+    tokens_file = str(tmp_path / "tokens.json")
+    journal_file = str(tmp_path / "tokens.jsonl")
+
+    with patch.object(utils, "TOKENS_FILE", tokens_file), \
+            patch.object(utils, "TOKENS_JOURNAL_FILE", journal_file), \
+            patch.object(utils, "DATA_DIR", str(tmp_path)):
+        assert utils.add_token("A_1", {"token": "A"})
+        assert not utils.add_token("A_1", {"token": "A"}), "Дубликат токена добавлен"
+        assert utils.add_token("B_1", {"token": "B"})
+
+        assert not os.path.exists(tokens_file), "tokens.json перезаписан при добавлении токена"
+        with open(journal_file, encoding="utf-8") as f:
+            assert len(f.readlines()) == 2
+
+        # Оборванная последняя строка (падение во время записи) пропускается
+        with open(journal_file, "a", encoding="utf-8") as f:
+            f.write('{"key": "C_1", "da')
+        assert set(utils.load_tokens()) == {"A_1", "B_1"}
+
+        # Снимок не записан - журнал не обрезается
+        with patch.object(utils, "_write_json", return_value=False):
+            utils.compact_tokens()
+        assert not os.path.exists(tokens_file)
+        assert set(utils.load_tokens()) == {"A_1", "B_1"}, "Токены журнала потеряны"
+
+        utils.compact_tokens()
+        assert set(utils.load_json(tokens_file)) == {"A_1", "B_1"}
+        assert os.path.getsize(journal_file) == 0, "Журнал не очищен после сворачивания"
+        assert utils.count_tokens() == 2